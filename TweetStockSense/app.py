@@ -1,4 +1,5 @@
 import os
+import sys
 import logging
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
@@ -32,12 +33,17 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 # initialize the app with the extension
 db.init_app(app)
 
-# Create all tables
+# Under `python app.py` this module is __main__; register it as 'app' as well so
+# models' `from app import db` reuses it instead of loading a second copy
+sys.modules.setdefault('app', sys.modules[__name__])
+
+# Import models first (without circular imports) so create_all sees every table
+import models  # noqa: E402
+
+# Create all tables, then add any columns introduced since they were created
 with app.app_context():
     db.create_all()
-
-# Import models first (without circular imports)
-from models import *  # noqa: F401
+    models.upgrade_schema()
 
 # Initialize Twitter service
 try:
@@ -54,6 +60,12 @@ except Exception as e:
     logging.error(f"Error importing routes: {str(e)}")
     logging.warning("Continuing with minimal functionality")
 
+# Register 'flask backtest' and the other CLI commands
+try:
+    import cli  # noqa: F401
+except Exception as e:
+    logging.error(f"Error importing CLI commands: {str(e)}")
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
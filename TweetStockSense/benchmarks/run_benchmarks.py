@@ -0,0 +1,288 @@
+"""Benchmarks for the indicator, prediction, sentiment and accuracy hot paths
+
+Runs offline against synthetic prices and tweets in a throwaway database,
+sweeping history length, symbol count and row count. Each case records
+median/min wall time, throughput and peak traced memory.
+
+Run from the TweetStockSense directory:
+
+    python benchmarks/run_benchmarks.py                        # full sweep
+    python benchmarks/run_benchmarks.py --quick --only indicators
+    python benchmarks/run_benchmarks.py --save benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json --threshold 0.25
+
+--compare exits with status 1 when a case's median is slower than the
+baseline by more than the threshold.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Isolate every store the services touch before any of them are imported
+WORK_DIR = tempfile.mkdtemp(prefix='tweetstocksense-bench-')
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORK_DIR, 'bench.db')}"
+os.environ['CACHE_BACKEND'] = 'memory'
+os.environ['PRICE_STORE_PATH'] = os.path.join(WORK_DIR, 'price_store')
+os.environ['PREDICTION_MODEL_PATH'] = os.path.join(WORK_DIR, 'models')
+os.environ['TWITTER_BEARER_TOKEN'] = ''
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import numpy as np  # noqa: E402
+import synthetic  # noqa: E402
+
+SIZES = {
+    'indicators': (250, 2500, 25000),  # Bars of history
+    'predict_price': (60, 250, 2500),  # Bars of history
+    'batch_predict': (10, 100, 500),  # Symbols, 250 bars each
+    'sentiment': (100, 1000, 10000),  # Tweets
+    'prediction_accuracy': (50, 500, 2000),  # Stored predictions for one symbol
+}
+QUICK_SIZES = {suite: sizes[:2] for suite, sizes in SIZES.items()}
+
+
+def measure(fn, repeat, setup=None):
+    """Median and min seconds per call over repeat timed calls, and the peak traced bytes of one call"""
+    if setup:
+        setup()
+    fn()  # Warm caches and lazy imports
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), min(times), peak
+
+
+class BenchmarkRunner:
+    """Collects one result per (suite, case, size)"""
+
+    def __init__(self, repeat=5):
+        self.repeat = repeat
+        self.results = {}
+
+    def run(self, suite, case, size, items, unit, fn, setup=None):
+        median, best, peak = measure(fn, self.repeat, setup)
+        key = f'{suite}.{case}[{size}]'
+        self.results[key] = {
+            'suite': suite,
+            'case': case,
+            'size': size,
+            'median_ms': round(median * 1000, 4),
+            'min_ms': round(best * 1000, 4),
+            'throughput': round(items / median, 1) if median else None,
+            'unit': unit,
+            'peak_kib': round(peak / 1024, 1)
+        }
+        result = self.results[key]
+        print(f"{key:<55} {result['median_ms']:>11.3f} ms {result['throughput']:>14,.0f} {unit:<8} "
+              f"{result['peak_kib']:>10,.1f} KiB", flush=True)
+
+
+def bench_indicators(runner, sizes):
+    from services.prediction_service import PredictionService
+    service = PredictionService(synthetic.SyntheticStockService())
+
+    for size in sizes:
+        history = synthetic.price_history('INDICATORS', size)
+        prices = history['close'].tolist()
+        cases = {
+            'moving_average': lambda: service.calculate_moving_average(prices, 20),
+            'exponential_moving_average': lambda: service.calculate_exponential_moving_average(prices, 12),
+            'rsi': lambda: service.calculate_rsi(prices),
+            'macd': lambda: service.calculate_macd(prices),
+            'bollinger_bands': lambda: service.calculate_bollinger_bands(prices),
+            'volatility': lambda: service.calculate_volatility(prices),
+            'support_resistance': lambda: service.calculate_support_resistance(
+                history['close'], history['high'], history['low']),
+        }
+        for case, fn in cases.items():
+            runner.run('indicators', case, size, size, 'bars/s', fn)
+
+
+def bench_predict_price(runner, sizes):
+    from services.prediction_service import PredictionService
+
+    for size in sizes:
+        service = PredictionService(synthetic.SyntheticStockService(size))
+        current_data = service.stock_service.get_stock_data('BENCH')
+        history = service.stock_service.get_history_arrays('BENCH')
+
+        def predict():
+            service.predict_price('BENCH', current_data, 62.5, history=history)
+
+        def forget_state():
+            service.indicator_states.clear()
+
+        # cold replays the whole history into fresh indicator state; warm finds it already current
+        runner.run('predict_price', 'cold', size, 1, 'calls/s', predict, setup=forget_state)
+        runner.run('predict_price', 'warm', size, 1, 'calls/s', predict)
+        runner.run('predict_price', 'forecast', size, 1, 'calls/s',
+                   lambda: service.forecast('BENCH', current_data['price'], history=history))
+
+
+def bench_batch_predict(runner, sizes):
+    from services.prediction_service import PredictionService
+    service = PredictionService(synthetic.SyntheticStockService(250))
+
+    for size in sizes:
+        symbols = [f'SYM{i}' for i in range(size)]
+        sentiments = {symbol: 40 + i % 20 for i, symbol in enumerate(symbols)}
+        runner.run('batch_predict', 'matrix', size, size, 'symbols/s',
+                   lambda: service.batch_predict(symbols, sentiments))
+
+
+def bench_sentiment(runner, sizes):
+    try:
+        from services.twitter_service import TwitterService
+    except ImportError as e:
+        logging.warning(f"Skipping sentiment benchmarks: {e}")
+        return
+    service = TwitterService()
+
+    for size in sizes:
+        texts = synthetic.tweets(size)
+        runner.run('sentiment', 'analyze_sentiment', size, size, 'tweets/s',
+                   lambda: [service.analyze_sentiment(text) for text in texts])
+
+
+def bench_prediction_accuracy(runner, sizes):
+    import app
+    from app import db
+    from models import Stock, StockPrice, Prediction
+    from services.database_service import DatabaseService
+    logging.getLogger().setLevel(logging.WARNING)  # app.py configures DEBUG logging
+    service = DatabaseService()
+
+    with app.app.app_context():
+        for size in sizes:
+            symbol = f'ACC{size}'
+            stock = Stock(symbol=symbol, name=symbol)
+            db.session.add(stock)
+            db.session.flush()
+
+            history = synthetic.price_history(symbol, 45)
+            first = datetime.utcnow() - timedelta(days=40)
+            db.session.execute(StockPrice.__table__.insert(), [
+                {
+                    'stock_id': stock.id, 'open_price': float(history['open'][i]),
+                    'high_price': float(history['high'][i]), 'low_price': float(history['low'][i]),
+                    'close_price': float(history['close'][i]), 'volume': int(history['volume'][i]),
+                    'timestamp': first + timedelta(days=i)
+                }
+                for i in range(45)
+            ])
+            db.session.execute(Prediction.__table__.insert(), [
+                {
+                    'stock_id': stock.id, 'symbol': symbol, 'predicted_price': predicted,
+                    'current_price': current, 'prediction_date': prediction_date
+                }
+                for prediction_date, current, predicted in synthetic.prediction_rows(size)
+            ])
+            db.session.commit()
+
+            runner.run('prediction_accuracy', 'get_prediction_accuracy', size, size, 'rows/s',
+                       lambda: service.get_prediction_accuracy(symbol, days=30))
+
+
+SUITES = {
+    'indicators': bench_indicators,
+    'predict_price': bench_predict_price,
+    'batch_predict': bench_batch_predict,
+    'sentiment': bench_sentiment,
+    'prediction_accuracy': bench_prediction_accuracy,
+}
+
+
+def compare(results, baseline_path, threshold):
+    """Print each case's change against the baseline; returns the keys that regressed"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+
+    regressions = []
+    print(f"\nCompared with {baseline_path} (regression threshold {threshold:.0%}):")
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if not previous or not previous['median_ms']:
+            print(f"{key:<55} new")
+            continue
+        ratio = result['median_ms'] / previous['median_ms']
+        memory = result['peak_kib'] / previous['peak_kib'] if previous['peak_kib'] else 1.0
+        flag = 'REGRESSION' if ratio > 1 + threshold else ''
+        print(f"{key:<55} time x{ratio:6.2f}  memory x{memory:6.2f}  {flag}")
+        if flag:
+            regressions.append(key)
+    for key in baseline:
+        if key not in results:
+            print(f"{key:<55} not run")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', help='Comma-separated suites: ' + ', '.join(SUITES))
+    parser.add_argument('--quick', action='store_true', help='Run only the smaller sizes')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed calls per case')
+    parser.add_argument('--save', metavar='PATH', help='Write results as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='Compare against a saved baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed median slowdown before failing')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    suites = [s.strip() for s in args.only.split(',')] if args.only else list(SUITES)
+    unknown = [suite for suite in suites if suite not in SUITES]
+    if unknown:
+        parser.error(f"Unknown suites: {', '.join(unknown)}")
+
+    sizes = QUICK_SIZES if args.quick else SIZES
+    runner = BenchmarkRunner(repeat=args.repeat)
+    print(f"{'case':<55} {'median':>14} {'throughput':>14} {'':<8} {'peak memory':>14}")
+    for suite in suites:
+        SUITES[suite](runner, sizes[suite])
+
+    if args.save:
+        report = {
+            'created_at': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'results': runner.results
+        }
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved {len(runner.results)} results to {args.save}")
+
+    if args.compare:
+        regressions = compare(runner.results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import zlib
+from datetime import datetime, timedelta
+import numpy as np
+
+# Deterministic synthetic market data, so benchmark runs are comparable offline
+
+START_DAY = 18262  # 2020-01-01 as days since the epoch
+
+POSITIVE = ['bullish', 'strong results', 'great quarter', 'buying more', 'record profit', 'breakout']
+NEGATIVE = ['bearish', 'weak guidance', 'terrible quarter', 'selling', 'heavy losses', 'breakdown']
+NEUTRAL = ['results today', 'watching', 'volume', 'board meeting', 'trading flat', 'ex-dividend']
+
+
+def _rng(key):
+    return np.random.default_rng(zlib.crc32(str(key).encode()))
+
+
+def price_history(symbol, length):
+    """Daily OHLCV column arrays following a random walk, as StockService.get_history_arrays returns"""
+    rng = _rng(f'{symbol}|{length}')
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, length)))
+    spread = np.abs(rng.normal(0, 0.008, length))
+    return {
+        'timestamp': np.arange(START_DAY, START_DAY + length, dtype=np.int64),
+        'open': close * (1 + rng.normal(0, 0.004, length)),
+        'high': close * (1 + spread),
+        'low': close * (1 - spread),
+        'close': close,
+        'volume': rng.integers(50_000, 5_000_000, length).astype(np.float64)
+    }
+
+
+def tweets(count, symbols=('RELIANCE', 'TCS', 'INFY', 'HDFCBANK')):
+    """Tweet texts with tickers, mentions, hashtags and links, like the ones sentiment analysis cleans"""
+    rng = _rng(f'tweets|{count}')
+    phrases = POSITIVE + NEGATIVE + NEUTRAL
+    texts = []
+    for i in range(count):
+        words = [phrases[j] for j in rng.integers(0, len(phrases), 3)]
+        symbol = symbols[i % len(symbols)]
+        texts.append(f"${symbol} {' and '.join(words)} @trader{i % 97} #{symbol}Stock https://t.co/{i:08x}")
+    return texts
+
+
+def prediction_rows(count, days=30):
+    """(prediction_date, current_price, predicted_price) spread over the last days"""
+    rng = _rng(f'predictions|{count}')
+    now = datetime.utcnow()
+    current = 100 * np.exp(rng.normal(0, 0.05, count))
+    predicted = current * (1 + rng.normal(0, 0.02, count))
+    offsets = np.sort(rng.uniform(0, days * 86400, count))[::-1]
+    return [
+        (now - timedelta(seconds=float(offset)), float(c), float(p))
+        for offset, c, p in zip(offsets, current, predicted)
+    ]
+
+
+class SyntheticStockService:
+    """Stands in for StockService when benchmarking: serves synthetic history without network access"""
+
+    def __init__(self, length=250):
+        self.length = length
+        self.indian_stocks = {}
+        self._histories = {}
+
+    def get_history_arrays(self, symbol, period='1mo', retries=3):
+        history = self._histories.get(symbol)
+        if history is None:
+            history = self._histories[symbol] = price_history(symbol, self.length)
+        return history
+
+    def get_stock_data(self, symbol, **kwargs):
+        close = self.get_history_arrays(symbol)['close']
+        return {'symbol': symbol, 'name': symbol, 'price': float(close[-1])}
+
+    def get_batch_stock_data(self, symbols, **kwargs):
+        return {symbol: self.get_stock_data(symbol) for symbol in symbols}
@@ -0,0 +1,125 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import click
+import models
+from app import app
+from routes import backtest_service, prediction_service, database_service, stock_service, parse_weights
+from services.price_store import to_day
+
+
+@app.cli.command('backtest')
+@click.option('--symbols', default='', help='Comma-separated symbols; defaults to every stored symbol')
+@click.option('--source', type=click.Choice(['db', 'store']), default='db', help='StockPrice rows or the local price store')
+@click.option('--horizon', type=int, default=None, help='Trading days between recommendation and outcome')
+@click.option('--window-days', type=int, default=None, help='Calendar days per walk-forward window')
+@click.option('--weights', default='', help="Override weights, e.g. 'trend:0.4,sentiment:0.3'")
+@click.option('--sentiment', type=click.FloatRange(0, 100), default=None,
+              help='Sentiment score replayed on every bar; defaults to neutral 50')
+@click.option('--json', 'as_json', is_flag=True, help='Print the full report as JSON')
+def backtest(symbols, source, horizon, window_days, weights, sentiment, as_json):
+    """Replay the prediction weighting over stored history"""
+    symbols = [s.strip() for s in symbols.split(',') if s.strip()] or None
+    report = backtest_service.run(symbols, source=source, horizon=horizon, window_days=window_days,
+                                  weights=parse_weights(weights), sentiment_score=sentiment)
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+        return
+
+    overall = report['overall']
+    click.echo(f"{report['symbols']} symbols, horizon {report['horizon']} days, "
+               f"sentiment {report['sentiment_score']}, {report['elapsed_ms']} ms")
+    if not overall:
+        click.echo("No symbols with enough history")
+        return
+    click.echo(f"Overall: {overall['trades']} trades, hit rate {overall['hit_rate']}%, "
+               f"MAE {overall['mae']}, P&L {overall['total_return_percent']}%")
+    for window in report['windows']:
+        click.echo(f"  {window['start']} .. {window['end']}: {window['trades']} trades, "
+                   f"hit rate {window['hit_rate']}%, MAE {window['mae']}, P&L {window['total_return_percent']}%")
+
+
+@app.cli.command('train-model')
+@click.option('--horizon', type=int, default=5, help='Trading days ahead the model predicts')
+@click.option('--validation-fraction', type=float, default=0.2, help='Most recent share of days held out')
+@click.option('--version', default=None, help='Artifact version; defaults to a UTC timestamp')
+@click.option('--no-refit', is_flag=True,
+              help='Save the model fitted before the validation days, keeping them out of sample for backtests')
+def train_model(horizon, validation_fraction, version, no_refit):
+    """Train the prediction model from stored prices and tweet sentiment"""
+    # Imported here so scikit-learn is only loaded for training
+    from services.model_training import train_model as run_training
+
+    result = run_training(prediction_service, database_service, horizon=horizon,
+                          validation_fraction=validation_fraction, version=version, refit=not no_refit)
+    validation = result['metrics']['validation']
+    window = result['training_window']
+    click.echo(f"Model {result['version']} trained on {result['samples']} rows from {result['symbols']} symbols, "
+               f"{window['start']} to {window['end']}")
+    click.echo(f"Validation: R2 {validation['r2']}, MAE {validation['mae']}, "
+               f"direction accuracy {validation['direction_accuracy']}%")
+    click.echo(f"Saved to {result['path']}; restart the app or set PREDICTION_MODEL_VERSION to serve it")
+
+
+@app.cli.command('ingest-prices')
+@click.option('--symbols', default='', help='Comma-separated symbols; defaults to the tracked universe')
+@click.option('--period', default='5y', help='History to load, e.g. 1y, 5y, max')
+@click.option('--no-fetch', is_flag=True, help='Load only what the local price store already holds')
+@click.option('--io-workers', type=int, default=8, help='Concurrent history fetches')
+def ingest_prices(symbols, period, no_fetch, io_workers):
+    """Bulk load daily bars into StockPrice from the price store, fetching missing history first"""
+    symbols = [s.strip() for s in symbols.split(',') if s.strip()] or list(stock_service.indian_stocks)
+    started = time.perf_counter()
+
+    def load(symbol):
+        try:
+            if no_fetch:
+                return stock_service.price_store.read(symbol, start=to_day(stock_service._period_start(period)))
+            return stock_service.get_history_arrays(symbol, period=period)
+        except Exception as e:
+            click.echo(f"{symbol}: {e}", err=True)
+            return None
+
+    total = 0
+    with ThreadPoolExecutor(max_workers=io_workers) as pool:
+        for symbol, columns in zip(symbols, pool.map(load, symbols)):
+            if columns is not None and len(columns['timestamp']):
+                total += database_service.save_stock_prices(symbol, columns)
+    click.echo(f"Saved {total} bars for {len(symbols)} symbols in {time.perf_counter() - started:.1f}s")
+
+
+@app.cli.command('check-indexes')
+def check_indexes():
+    """EXPLAIN the statements the hot time-series reads issue and fail if any scans a whole table"""
+    plans = database_service.query_plans()
+    for result in plans:
+        click.echo(f"{'index' if result['uses_index'] else 'SCAN ':<6} {result['name']}")
+        for line in result['plan']:
+            click.echo(f"         {line}")
+    scans = [result['name'] for result in plans if not result['uses_index']]
+    if scans:
+        click.echo(f"{len(scans)} queries scan a whole table: {', '.join(scans)}; run the app once to create indexes")
+        raise SystemExit(1)
+
+
+@app.cli.command('rebuild-rollups')
+@click.option('--symbols', default='', help='Comma-separated symbols; defaults to every stored symbol')
+@click.option('--interval', default='1d', help="Interval of the stored bars, e.g. '1m' or '1d'")
+def rebuild_rollups(symbols, interval):
+    """Recompute the downsampled PriceRollup bars from StockPrice"""
+    symbols = [s.strip() for s in symbols.split(',') if s.strip()] or None
+    started = time.perf_counter()
+    written = database_service.rebuild_rollups(symbols, interval=interval)
+    click.echo(f"Wrote {written} rollup bars in {time.perf_counter() - started:.1f}s")
+
+
+@app.cli.command('upgrade-schema')
+@click.option('--remove-duplicates', is_flag=True,
+              help='Delete rows duplicating a unique index key, keeping the latest, so the index can be built')
+def upgrade_schema(remove_duplicates):
+    """Add missing columns and indexes to existing tables, as startup does"""
+    skipped = models.upgrade_schema(remove_duplicates=remove_duplicates)
+    if skipped:
+        click.echo(f"Left out {', '.join(skipped)}: duplicate rows remain; rerun with --remove-duplicates")
+        raise SystemExit(1)
+    click.echo("Schema is up to date")
@@ -1,5 +1,7 @@
+import logging
 from app import db
 from datetime import datetime
+from sqlalchemy import inspect, text
 
 class Stock(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -11,6 +13,8 @@ class Stock(db.Model):
     day_high = db.Column(db.Float)
     day_low = db.Column(db.Float)
     pe_ratio = db.Column(db.Float)
+    indicator_state = db.Column(db.Text)  # JSON IndicatorState, so indicators resume after a restart
+    metadata_updated = db.Column(db.DateTime)  # When name/market cap/P-E last came from Ticker.info; None until then
     last_updated = db.Column(db.DateTime, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -26,8 +30,36 @@ class StockPrice(db.Model):
     price_change_percent = db.Column(db.Float)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # One bar per symbol and time, the conflict target for bulk upserts. Also serves
+    # per-symbol range scans; covering on PostgreSQL so history reads skip the heap
+    __table_args__ = (
+        db.Index('uq_stock_price_stock_id_timestamp', 'stock_id', 'timestamp', unique=True,
+                 postgresql_include=['open_price', 'high_price', 'low_price', 'close_price', 'volume']),
+    )
+    
     stock = db.relationship('Stock', backref=db.backref('prices', lazy=True, order_by='StockPrice.timestamp.desc()'))
 
+# StockPrice bars downsampled to coarser resolutions, maintained by DatabaseService.save_stock_prices
+class PriceRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    stock_id = db.Column(db.Integer, db.ForeignKey('stock.id'), nullable=False)
+    resolution = db.Column(db.String(4), nullable=False)  # '1m', '1h', '1d' or '1w'
+    bucket = db.Column(db.DateTime, nullable=False)  # Start of the bucket, in the bars' wall time
+    open_price = db.Column(db.Float, nullable=False)
+    high_price = db.Column(db.Float, nullable=False)
+    low_price = db.Column(db.Float, nullable=False)
+    close_price = db.Column(db.Float, nullable=False)
+    volume = db.Column(db.BigInteger)
+    bar_count = db.Column(db.Integer, nullable=False)  # StockPrice bars aggregated into the bucket
+    
+    # Per-symbol range scans at one resolution; covering on PostgreSQL like StockPrice's
+    __table_args__ = (
+        db.Index('uq_price_rollup_stock_id_resolution_bucket', 'stock_id', 'resolution', 'bucket', unique=True,
+                 postgresql_include=['open_price', 'high_price', 'low_price', 'close_price', 'volume']),
+    )
+    
+    stock = db.relationship('Stock', backref=db.backref('rollups', lazy=True))
+
 class Tweet(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     tweet_id = db.Column(db.String(50), unique=True, nullable=False)
@@ -44,6 +76,10 @@ class Tweet(db.Model):
     tweet_created_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_tweet_created_at', 'created_at'),
+    )
+    
 class Prediction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     stock_id = db.Column(db.Integer, db.ForeignKey('stock.id'), nullable=False)
@@ -78,6 +114,14 @@ class Prediction(db.Model):
     
     prediction_date = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Per-symbol prediction windows, covering the prices accuracy checks compare; the
+    # second serves the all-symbols accuracy report's time window
+    __table_args__ = (
+        db.Index('ix_prediction_stock_id_prediction_date', 'stock_id', 'prediction_date',
+                 postgresql_include=['current_price', 'predicted_price']),
+        db.Index('ix_prediction_prediction_date', 'prediction_date'),
+    )
+    
     stock = db.relationship('Stock', backref=db.backref('predictions', lazy=True, order_by='Prediction.prediction_date.desc()'))
 
 class UserWatchlist(db.Model):
@@ -97,3 +141,65 @@ class MarketSentiment(db.Model):
     negative_tweets = db.Column(db.Integer)
     neutral_tweets = db.Column(db.Integer)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_market_sentiment_timestamp', 'timestamp'),
+    )
+
+def upgrade_schema(remove_duplicates=False):
+    """Add model columns and indexes missing from existing tables; create_all only creates new tables
+    
+    Indexes are built with a plain CREATE INDEX, which blocks writes to the
+    table while it runs; on a large PostgreSQL table, create them with
+    CREATE INDEX CONCURRENTLY beforehand and this finds them already present.
+    A unique index is left out, with a warning, while rows duplicate its key.
+    remove_duplicates deletes those rows first, keeping the most recently
+    inserted one; startup never does, 'flask upgrade-schema
+    --remove-duplicates' does on request.
+    
+    Returns the names of the unique indexes left out.
+    """
+    inspector = inspect(db.session.connection())  # Same connection as the DDL below, so SQLite cannot lock itself out
+    preparer = db.engine.dialect.identifier_preparer
+    skipped = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(
+                f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN {preparer.quote(column.name)} {column_type}"
+            ))
+            logging.info(f"Added column {table.name}.{column.name}")
+        
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            if index.unique:
+                table_name = preparer.quote(table.name)
+                key = preparer.quote(table.primary_key.columns.values()[0].name)
+                columns = ', '.join(preparer.quote(column.name) for column in index.columns)
+                # Every row but the latest of each key
+                duplicates = f"FROM {table_name} WHERE {key} NOT IN " \
+                             f"(SELECT MAX({key}) FROM {table_name} GROUP BY {columns})"
+                if remove_duplicates:
+                    removed = db.session.execute(text(f"DELETE {duplicates}")).rowcount
+                    if removed:
+                        logging.info(f"Removed {removed} duplicate rows from {table.name} before indexing")
+                else:
+                    count = db.session.execute(text(f"SELECT COUNT(*) {duplicates}")).scalar()
+                    if count:
+                        logging.warning(
+                            f"Not creating unique index {index.name}: {count} rows of {table.name} duplicate "
+                            f"its key; run 'flask upgrade-schema --remove-duplicates' to delete them"
+                        )
+                        skipped.append(index.name)
+                        continue
+            index.create(bind=db.session.connection())
+            logging.info(f"Created index {index.name} on {table.name}")
+    db.session.commit()
+    return skipped
@@ -1,17 +1,55 @@
 from flask import render_template, jsonify, request
 from app import app, db
 from models import Stock, StockPrice, Tweet, Prediction
-from services.stock_service import StockService
+from services.stock_service import StockService, PERIOD_DAYS
 from services.prediction_service import PredictionService
-from services.database_service import DatabaseService
+from services.database_service import DatabaseService, ACCURACY_HORIZONS
+from services.backtest_service import BacktestService
+from services.batch_executor import BatchPredictExecutor
+from services.rate_limiter import get_rate_limiter_stats
+from services.cache import get_cache_stats
+from services.background import get_refresher_stats
+from services.single_flight import get_single_flight_stats
+from services.circuit_breaker import get_circuit_breaker_stats
 import logging
 import time
+from datetime import datetime
+import numpy as np
+
+# Periods accepted by the stock-data endpoint
+HISTORY_PERIODS = set(PERIOD_DAYS) | {'ytd', 'max'}
 
 # Initialize services once at the top
 stock_service = StockService()
-prediction_service = PredictionService()
+prediction_service = PredictionService(stock_service)
 database_service = DatabaseService()
 
+# Persist symbol metadata and warm its cache so quotes never wait on Ticker.info
+stock_service.database_service = database_service
+try:
+    with app.app_context():
+        stock_service.load_metadata(database_service.get_stock_metadata())
+except Exception as e:
+    logging.error(f"Error loading symbol metadata: {str(e)}")
+
+# Persist running indicator state so predictions resume without a full recompute
+prediction_service.database_service = database_service
+backtest_service = BacktestService(prediction_service, database_service)
+batch_executor = BatchPredictExecutor(prediction_service)  # Workers from BATCH_PREDICT_WORKERS
+
+
+def parse_weights(value):
+    """Parse 'trend:0.3,momentum:0.2,...' into a weights dict overriding the defaults"""
+    if not value:
+        return None
+    weights = dict(prediction_service.weights)
+    for item in value.split(','):
+        name, _, weight = item.partition(':')
+        if name.strip() not in weights:
+            raise ValueError(f"Unknown weight: {name.strip()}")
+        weights[name.strip()] = float(weight)
+    return weights
+
 # Initialize Twitter service with error handling
 twitter_service = None
 try:
@@ -74,7 +112,7 @@ def get_dashboard_data():
                     'price': float(i['price']),
                     'change': float(i['change']),
                     'change_percent': float(i['change_percent'])
-                } for i in indices]
+                } for i in indices.values()]
         except Exception as e:
             logging.error(f"Error fetching market indices: {str(e)}")
             market_indices = []
@@ -140,14 +178,22 @@ def get_stock_data(symbol):
         if not symbol or not isinstance(symbol, str):
             raise ValueError("Invalid symbol")
             
+        # Chart period and response shape; 'columns' returns dates[], open[], ... arrays
+        period = request.args.get('period', '1mo')
+        orient = request.args.get('format', 'records')
+        if period not in HISTORY_PERIODS:
+            raise ValueError(f"Unsupported period: {period}")
+        if orient not in ('records', 'columns'):
+            raise ValueError(f"Unsupported format: {orient}")
+            
         # Get current and historical data
         current_data = stock_service.get_stock_data(symbol)
         historical_data = []
         
         if current_data:
             try:
-                historical_data = stock_service.get_historical_data(symbol, period='1mo')
-                if not isinstance(historical_data, list):
+                historical_data = stock_service.get_historical_data(symbol, period=period, orient=orient)
+                if not isinstance(historical_data, (list, dict)):
                     raise ValueError("Invalid historical data format")
             except Exception as e:
                 logging.error(f"Error fetching historical data for {symbol}: {str(e)}", exc_info=True)
@@ -190,9 +236,12 @@ def get_trending_tweets_data():
         # Try to get fresh tweets from Twitter API
         tweets = twitter_service.get_financial_tweets()
         
-        # Save tweets to database for future reference
-        for tweet_data in tweets:
-            database_service.save_tweet(tweet_data)
+        # Save tweets to database for future reference, in one transaction
+        if tweets:
+            saved = database_service.save_tweets(tweets)
+            if saved['failed']:
+                logging.warning(f"Failed to save {saved['failed']} tweets")
+            logging.debug(f"Saved tweets: {saved}")
         
         # If no fresh tweets (due to rate limits), get recent ones from database
         if not tweets:
@@ -238,16 +287,14 @@ def get_predictions_data(symbol):
         if not isinstance(current_data, dict) or 'price' not in current_data:
             raise ValueError("Invalid stock data format")
             
-        # Get or create stock in database
+        # Get or create stock in database; name, market cap and P/E are left to
+        # the metadata refresh, since the quote holds zeros until that arrives
         try:
             stock = database_service.get_or_create_stock(
                 symbol=symbol,
-                name=current_data.get('name', symbol),
                 current_price=current_data.get('price', 0),
                 day_high=current_data.get('day_high', 0),
-                day_low=current_data.get('day_low', 0),
-                pe_ratio=current_data.get('pe_ratio', 0),
-                market_cap=current_data.get('market_cap', 0)
+                day_low=current_data.get('day_low', 0)
             )
         except Exception as e:
             logging.error(f"Error creating stock record for {symbol}: {str(e)}", exc_info=True)
@@ -265,7 +312,8 @@ def get_predictions_data(symbol):
         # Generate prediction
         prediction = None
         try:
-            prediction = prediction_service.predict_price(symbol, current_data, sentiment_score)
+            # Unchanged inputs return the memoized prediction, which is already saved
+            prediction, cached = prediction_service.get_prediction(symbol, current_data, sentiment_score)
             if not prediction:
                 raise ValueError("Prediction generation failed")
                 
@@ -274,7 +322,7 @@ def get_predictions_data(symbol):
                 raise ValueError("Invalid prediction format")
                 
             # Save prediction to database if we have a stock record
-            if stock:
+            if stock and not cached:
                 try:
                     database_service.save_prediction(stock, prediction)
                 except Exception as e:
@@ -288,6 +336,14 @@ def get_predictions_data(symbol):
                 'prediction': prediction
             }
             
+            # Optional Monte Carlo price distribution (?forecast=true)
+            if request.args.get('forecast', '').lower() in ('1', 'true', 'yes'):
+                try:
+                    response['forecast'] = prediction_service.forecast(symbol, current_data['price'])
+                except Exception as e:
+                    logging.error(f"Error forecasting {symbol}: {str(e)}", exc_info=True)
+                    response['forecast'] = None
+            
             return jsonify(response)
             
         except Exception as e:
@@ -303,6 +359,28 @@ def get_predictions_data(symbol):
             'symbol': symbol
         }), 500
 
+@app.route('/api/batch-predictions')
+def get_batch_predictions():
+    """Score many stocks at once; defaults to the whole tracked universe"""
+    try:
+        symbols = [s.strip() for s in request.args.get('symbols', '').split(',') if s.strip()]
+        if not symbols:
+            symbols = list(stock_service.indian_stocks)
+
+        result = batch_executor.run(symbols)
+        return jsonify({
+            'success': True,
+            'data': result['predictions'],
+            'workers': result['workers'],
+            'timings': result['timings']
+        })
+    except Exception as e:
+        logging.error(f"Error in get_batch_predictions: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
 @app.route('/api/search-stocks')
 def search_stocks():
     """Search for Indian stocks"""
@@ -373,6 +451,78 @@ def get_prediction_accuracy(symbol):
             'error': 'Internal server error'
         }), 500
 
+@app.route('/api/prediction-accuracy')
+def get_accuracy_report():
+    """Prediction accuracy for many symbols, with per-horizon breakdowns"""
+    try:
+        symbols = [s.strip() for s in request.args.get('symbols', '').split(',') if s.strip()] or None
+        days = request.args.get('days', 30, type=int)
+        horizons = request.args.get('horizons', '')
+        try:
+            horizons = tuple(int(h) for h in horizons.split(',') if h.strip()) or ACCURACY_HORIZONS
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Horizons must be comma-separated whole days'
+            }), 400
+
+        return jsonify({
+            'success': True,
+            'data': database_service.get_accuracy_report(symbols, days=days, horizons=horizons)
+        })
+    except Exception as e:
+        logging.error(f"Error in get_accuracy_report: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+@app.route('/api/price-bars/<symbol>')
+def get_price_bars(symbol):
+    """Stored OHLCV bars over a date range, downsampled to about the requested point count"""
+    try:
+        points = request.args.get('points', 500, type=int)
+        try:
+            start = datetime.fromisoformat(request.args['start']) if request.args.get('start') else None
+            end = datetime.fromisoformat(request.args['end']) if request.args.get('end') else None
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'start and end must be ISO dates'
+            }), 400
+        if not 1 <= points <= 10000:
+            return jsonify({
+                'success': False,
+                'error': 'points must be between 1 and 10000'
+            }), 400
+
+        bars = database_service.get_price_bars(symbol, start=start, end=end, points=points)
+        if not bars or not len(bars['timestamp']):
+            return jsonify({
+                'success': False,
+                'error': 'No stored prices found'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'symbol': symbol,
+                'resolution': bars['resolution'],
+                'timestamps': np.datetime_as_string(bars['timestamp'], unit='s').tolist(),
+                'open': np.round(bars['open'], 2).tolist(),
+                'high': np.round(bars['high'], 2).tolist(),
+                'low': np.round(bars['low'], 2).tolist(),
+                'close': np.round(bars['close'], 2).tolist(),
+                'volume': bars['volume'].tolist()
+            }
+        })
+    except Exception as e:
+        logging.error(f"Error in get_price_bars: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
 @app.route('/api/market-sentiment-history')
 def get_market_sentiment_history():
     try:
@@ -393,3 +543,66 @@ def get_market_sentiment_history():
             'success': False,
             'error': 'Internal server error'
         }), 500
+
+@app.route('/api/backtest')
+def get_backtest():
+    """Replay the prediction weighting over stored history"""
+    try:
+        symbols = [s.strip() for s in request.args.get('symbols', '').split(',') if s.strip()] or None
+        source = request.args.get('source', 'db')
+        horizon = request.args.get('horizon', type=int)
+        window_days = request.args.get('window_days', type=int)
+        sentiment_score = request.args.get('sentiment', type=float)
+        if sentiment_score is not None and not 0 <= sentiment_score <= 100:
+            return jsonify({
+                'success': False,
+                'error': 'Sentiment must be between 0 and 100'
+            }), 400
+        try:
+            weights = parse_weights(request.args.get('weights'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        if source not in ('db', 'store'):
+            return jsonify({
+                'success': False,
+                'error': f'Unsupported source: {source}'
+            }), 400
+
+        report = backtest_service.run(symbols, source=source, horizon=horizon, window_days=window_days,
+                                      weights=weights, sentiment_score=sentiment_score)
+        return jsonify({
+            'success': True,
+            'data': report
+        })
+    except Exception as e:
+        logging.error(f"Error in get_backtest: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+@app.route('/api/service-stats')
+def get_service_stats():
+    """Upstream client stats for monitoring"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': {
+                'rate_limiters': get_rate_limiter_stats(),
+                'caches': get_cache_stats(),
+                'background_refreshers': get_refresher_stats(),
+                'single_flight': get_single_flight_stats(),
+                'circuit_breakers': get_circuit_breaker_stats(),
+                'batch_predict': batch_executor.stats(),
+                'prediction_model': prediction_service.model.stats() if prediction_service.model else None
+            }
+        })
+    except Exception as e:
+        logging.error(f"Error in get_service_stats: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
@@ -0,0 +1,93 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundRefresher:
+    """Runs cache refreshes off the request thread, at most one in flight per key"""
+
+    def __init__(self, name, max_workers=2):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"refresh-{name}")
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+        # Stats
+        self.scheduled = 0
+        self.skipped = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, keys, fn, *args, **kwargs):
+        """Schedule fn(claimed_keys, *args, **kwargs) for the keys not already being refreshed
+
+        Returns the claimed keys; an empty list means every key already had a
+        refresh in flight and nothing was scheduled.
+        """
+        with self._lock:
+            claimed = [key for key in keys if key not in self._in_flight]
+            self._in_flight.update(claimed)
+            if not claimed:
+                self.skipped += 1
+                return []
+            self.scheduled += 1
+
+        try:
+            self._executor.submit(self._run, claimed, fn, args, kwargs)
+        except RuntimeError as e:
+            # Executor already shut down (interpreter exit)
+            logging.warning(f"Background refresh {self.name} not scheduled: {e}")
+            self._release(claimed)
+            return []
+        return claimed
+
+    def _run(self, claimed, fn, args, kwargs):
+        try:
+            fn(claimed, *args, **kwargs)
+            with self._lock:
+                self.completed += 1
+        except Exception as e:
+            logging.error(f"Background refresh {self.name} failed for {claimed}: {str(e)}", exc_info=True)
+            with self._lock:
+                self.failed += 1
+        finally:
+            self._release(claimed)
+
+    def _release(self, claimed):
+        with self._lock:
+            self._in_flight.difference_update(claimed)
+
+    def is_refreshing(self, key):
+        with self._lock:
+            return key in self._in_flight
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._in_flight),
+                'scheduled': self.scheduled,
+                'skipped': self.skipped,
+                'completed': self.completed,
+                'failed': self.failed
+            }
+
+
+_refreshers = {}
+_refreshers_lock = threading.Lock()
+
+
+def get_refresher(name, max_workers=2):
+    """Get the process-wide refresher for a name, creating it on first use"""
+    with _refreshers_lock:
+        refresher = _refreshers.get(name)
+        if refresher is None:
+            refresher = BackgroundRefresher(name, max_workers=max_workers)
+            _refreshers[name] = refresher
+        return refresher
+
+
+def get_refresher_stats():
+    """Return stats for every registered refresher keyed by name"""
+    with _refreshers_lock:
+        refreshers = list(_refreshers.items())
+    return {name: refresher.stats() for name, refresher in refreshers}
@@ -0,0 +1,190 @@
+import logging
+import time
+import numpy as np
+from services import indicators
+from services.price_store import from_day
+
+
+class BacktestService:
+    """Replays PredictionService scoring over stored daily history
+
+    Every bar of every series is scored at once: indicators are causal (bar t
+    only sees bars up to t), so one vectorized pass per symbol is equivalent
+    to re-running predict_price on each day. Results are grouped into
+    consecutive calendar windows to show how the weighting holds up over time.
+
+    Sentiment is not stored per bar, so every bar is replayed with one fixed
+    sentiment score. At the neutral default of 50 the sentiment factor is
+    zero and the sentiment signals never fire, so the sentiment weight has
+    no effect on the results; pass sentiment_score to replay another reading.
+
+    When the trained model is scored, only bars after its training window
+    are evaluated, so the report never measures the model on the days it
+    was fitted to.
+    """
+
+    def __init__(self, prediction_service, database_service=None):
+        self.prediction_service = prediction_service
+        self.database_service = database_service
+        self.horizon = 5  # Trading days between a recommendation and its outcome
+        self.window_days = 91  # Calendar days per walk-forward window
+        self.sentiment_score = 50  # No historical sentiment, so replay with neutral sentiment
+        self.flat_threshold = 0.001  # Predicted moves within +/-0.1% stay flat
+
+    def load_history(self, symbols=None, source='db'):
+        """Daily bars as {symbol: column arrays} from StockPrice rows ('db') or the local price store ('store')"""
+        if source == 'db':
+            if self.database_service is None:
+                raise ValueError("Backtesting from the database needs a database_service")
+            return self.database_service.get_price_history(symbols)
+        if source == 'store':
+            store = self.prediction_service.stock_service.price_store
+            symbols = symbols or list(self.prediction_service.stock_service.indian_stocks)
+            history = {symbol: store.read(symbol) for symbol in symbols}
+            return {symbol: columns for symbol, columns in history.items() if len(columns['timestamp'])}
+        raise ValueError(f"Unsupported backtest source: {source}")
+
+    def evaluate(self, columns, horizon=None, weights=None, sentiment_score=None, after_day=None):
+        """Score every bar of one series against its close horizon bars later
+
+        Each bar goes long when its predicted change is above flat_threshold,
+        short when below -flat_threshold, and stays flat otherwise, so the
+        positions follow the same prediction the weights or model produce.
+        Returns per-bar arrays for the bars that have both enough history and
+        a known outcome, and fall after after_day (an epoch day) when given.
+        """
+        horizon = horizon or self.horizon
+        sentiment_score = self.sentiment_score if sentiment_score is None else sentiment_score
+        close = np.asarray(columns['close'], dtype=np.float64)
+        n = len(close)
+        warmup = self.prediction_service.min_data_points
+        if n <= warmup + horizon:
+            return None
+
+        series = indicators.compute_indicators(close, columns['volume'], columns['high'], columns['low'])
+        scored = self.prediction_service.score(
+            series, sentiment_score, data_points=np.arange(1, n + 1), weights=weights
+        )
+
+        rows = slice(warmup - 1, n - horizon)
+        entry = close[rows]
+        outcome = close[warmup - 1 + horizon:]
+        predicted_change = np.broadcast_to(scored['predicted_change'], close.shape)[rows]
+        result = {
+            'day': np.asarray(columns['timestamp'])[rows],
+            'predicted': entry * (1 + predicted_change),
+            'actual': outcome,
+            'realized': outcome / entry - 1,
+            'position': np.where(np.abs(predicted_change) > self.flat_threshold, np.sign(predicted_change), 0.0)
+        }
+        if after_day is not None:
+            keep = result['day'] > after_day
+            result = {field: values[keep] for field, values in result.items()}
+        return result
+
+    def _trained_through(self, weights):
+        """Epoch day of the last bar the scoring model was fitted on; None when scoring fixed weights"""
+        model = self.prediction_service.model
+        if weights or model is None:
+            return None
+        if model.trained_through is None:
+            logging.warning(f"Model {model.version} does not record its training window; "
+                            f"backtest results include the days it was fitted on")
+        return model.trained_through
+
+    def _metrics(self, groups, group_count, rows):
+        """Aggregate per-bar rows into hit rate, MAE and P&L for each group"""
+        position = rows['position']
+        traded = position != 0
+        hit = traded & (position * rows['realized'] > 0)
+        pnl = np.where(traded, position * rows['realized'], 0.0)
+        abs_error = np.abs(rows['predicted'] - rows['actual'])
+        pct_error = abs_error / rows['actual']
+
+        def total(values):
+            return np.bincount(groups, weights=values, minlength=group_count)
+
+        bars = np.bincount(groups, minlength=group_count)
+        trades = total(traded)
+        hits = total(hit)
+        pnl_total = total(pnl)
+        mae = total(abs_error)
+        mape = total(pct_error)
+        buys = total(position > 0)
+        sells = total(position < 0)
+
+        results = []
+        for g in range(group_count):
+            results.append({
+                'bars': int(bars[g]),
+                'trades': int(trades[g]),
+                'buy_trades': int(buys[g]),
+                'sell_trades': int(sells[g]),
+                'hit_rate': round(float(hits[g] / trades[g]) * 100, 2) if trades[g] else None,
+                'mae': round(float(mae[g] / bars[g]), 4) if bars[g] else None,
+                'mape': round(float(mape[g] / bars[g]) * 100, 2) if bars[g] else None,
+                'total_return_percent': round(float(pnl_total[g]) * 100, 2),
+                'avg_trade_return_percent': round(float(pnl_total[g] / trades[g]) * 100, 4) if trades[g] else None
+            })
+        return results
+
+    def run(self, symbols=None, source='db', horizon=None, window_days=None, weights=None, sentiment_score=None):
+        """Backtest the recommendation weighting over stored history for the given symbols"""
+        started = time.perf_counter()
+        horizon = horizon or self.horizon
+        window_days = window_days or self.window_days
+        sentiment_score = self.sentiment_score if sentiment_score is None else sentiment_score
+        after_day = self._trained_through(weights)
+
+        history = self.load_history(symbols, source)
+        evaluated = {}
+        for symbol, columns in history.items():
+            try:
+                result = self.evaluate(columns, horizon=horizon, weights=weights, sentiment_score=sentiment_score,
+                                       after_day=after_day)
+            except Exception as e:
+                logging.warning(f"Backtest skipped {symbol}: {e}")
+                continue
+            if result is not None and len(result['day']):
+                evaluated[symbol] = result
+
+        report = {
+            'source': source,
+            'horizon': horizon,
+            'window_days': window_days,
+            # Explicit weights override the trained model, if any
+            'weights': weights or self.prediction_service.weights,
+            'model_version': None if weights else self.prediction_service.model_version,
+            'sentiment_score': sentiment_score,
+            'flat_threshold': self.flat_threshold,
+            # Bars up to the model's training window are left out
+            'evaluated_after': from_day(after_day).isoformat() if after_day is not None else None,
+            'symbols': len(evaluated),
+            'overall': None,
+            'windows': [],
+            'per_symbol': {}
+        }
+        if not evaluated:
+            report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            return report
+
+        names = list(evaluated)
+        rows = {field: np.concatenate([evaluated[symbol][field] for symbol in names]) for field in evaluated[names[0]]}
+        symbol_ids = np.repeat(np.arange(len(names)), [len(evaluated[symbol]['day']) for symbol in names])
+
+        report['overall'] = self._metrics(np.zeros(len(symbol_ids), dtype=np.int64), 1, rows)[0]
+
+        # Walk-forward: consecutive calendar windows over the test period
+        first_day = int(rows['day'].min())
+        window_ids = (rows['day'] - first_day) // window_days
+        window_count = int(window_ids.max()) + 1
+        for window_id, metrics in enumerate(self._metrics(window_ids, window_count, rows)):
+            if metrics['bars']:
+                start = first_day + window_id * window_days
+                metrics['start'] = from_day(start).isoformat()
+                metrics['end'] = from_day(start + window_days - 1).isoformat()
+                report['windows'].append(metrics)
+
+        report['per_symbol'] = dict(zip(names, self._metrics(symbol_ids, len(names), rows)))
+        report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return report
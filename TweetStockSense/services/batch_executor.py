@@ -0,0 +1,250 @@
+import logging
+import os
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from services import indicators
+
+# Planes of the shared (field, day, symbol) price block
+FIELDS = ('close', 'volume', 'high', 'low')
+
+# Imported once by the fork server and inherited by the workers it forks, so they
+# start with the scoring code loaded. Nothing else is shared this way
+WORKER_PRELOAD = ['services.batch_executor', 'services.prediction_service']
+
+
+def _attach(name):
+    """Attach to a shared block owned by the parent without adopting it for cleanup"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # Pool workers share the parent's resource tracker, so the registration is a no-op
+        return shared_memory.SharedMemory(name=name)
+
+
+def _score_columns(name, shape, start, end, current_prices, sentiments, weights, prediction_window, length,
+                   model=None):
+    """Process-pool task: score symbols start:end straight from the shared price block
+
+    Their histories are length bars long and fill the block's last length days.
+    """
+    from services.prediction_service import score_indicators
+
+    block = _attach(name)
+    try:
+        prices = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+        close, volume, high, low = (prices[i, -length:, start:end] for i in range(len(FIELDS)))
+        series = indicators.compute_indicators(close, volume, high, low)
+        latest = {field: values[-1] for field, values in series.items()}
+        scored = score_indicators(latest, np.asarray(sentiments), weights, prediction_window,
+                                  current_price=np.asarray(current_prices), data_points=length, model=model)
+        result = (
+            {field: values.tolist() for field, values in latest.items()},
+            {field: np.asarray(values).tolist() for field, values in scored.items()}
+        )
+        del prices, close, volume, high, low, series, latest
+        return result
+    finally:
+        block.close()
+
+
+class BatchPredictExecutor:
+    """Parallel batch_predict: I/O threads fetch quotes and history, a process pool scores them
+
+    Histories are packed once into a shared memory block, so each worker
+    task only receives the block's name and its column range, and reads
+    prices without pickling.
+
+    Workers are started through a fork server (spawn where there is none),
+    never forked from the Flask process itself: forking a multithreaded
+    process can copy locks held by other threads, such as the cache and
+    rate limiter locks, and deadlock the child. Only WORKER_PRELOAD is
+    imported once, by the fork server: each worker still re-imports the
+    main module while it starts, so under `python app.py` the app's setup
+    runs again in every worker.
+    """
+
+    def __init__(self, prediction_service, workers=None, io_workers=8):
+        self.prediction_service = prediction_service
+        self.workers = workers or int(os.environ.get('BATCH_PREDICT_WORKERS', 0)) or os.cpu_count() or 1
+        self.io_workers = io_workers
+        default_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.start_method = os.environ.get('BATCH_PREDICT_START_METHOD', default_method)
+        self.quote_chunk_size = 50  # Symbols per multi-ticker quote call
+        self.min_symbols_per_worker = 32  # Smaller batches are scored in-process
+        self._io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='batch-io')
+        self._process_pool = None
+        self._lock = threading.Lock()
+
+        # Stats
+        self.runs = 0
+        self.last_run = None
+
+    def _get_process_pool(self):
+        with self._lock:
+            if self._process_pool is None:
+                context = multiprocessing.get_context(self.start_method)
+                if self.start_method == 'forkserver':
+                    context.set_forkserver_preload(WORKER_PRELOAD)
+                self._process_pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._process_pool
+
+    def _fetch_quotes(self, symbols):
+        stock_service = self.prediction_service.stock_service
+        chunks = [symbols[i:i + self.quote_chunk_size] for i in range(0, len(symbols), self.quote_chunk_size)]
+        quotes = {}
+        for result in self._io_pool.map(stock_service.get_batch_stock_data, chunks):
+            quotes.update(result)
+        return quotes
+
+    def _fetch_history(self, symbol):
+        try:
+            service = self.prediction_service
+            history = service.stock_service.get_history_arrays(symbol, period=service.history_period)
+            if len(history['close']) < service.min_data_points:
+                logging.warning(f"Failed to generate prediction for {symbol}: not enough historical data")
+                return None
+            return history
+        except Exception as e:
+            logging.warning(f"Failed to generate prediction for {symbol}: {e}")
+            return None
+
+    def _score(self, block, shape, groups, current_prices, sentiments):
+        """Score every column of the shared block, in worker processes when the batch is large enough
+
+        groups lists (start, end, length) column ranges whose histories share a
+        length; each task stays within one range.
+        """
+        service = self.prediction_service
+        workers = min(self.workers, shape[2] // self.min_symbols_per_worker)
+        tasks = []
+        for group_start, group_end, length in groups:
+            chunks = max(1, min(workers, (group_end - group_start) // self.min_symbols_per_worker))
+            bounds = np.linspace(group_start, group_end, chunks + 1).astype(int)
+            tasks.extend(
+                (block.name, shape, int(start), int(end), current_prices[start:end], sentiments[start:end],
+                 service.weights, service.default_prediction_window, length, service.model)
+                for start, end in zip(bounds[:-1], bounds[1:])
+            )
+        if workers <= 1:
+            results = [_score_columns(*task) for task in tasks]
+        else:
+            pool = self._get_process_pool()
+            results = list(pool.map(_score_columns, *zip(*tasks)))
+
+        latest = {field: [] for field in results[0][0]}
+        scored = {field: [] for field in results[0][1]}
+        for chunk_latest, chunk_scored in results:
+            for field, values in chunk_latest.items():
+                latest[field].extend(values)
+            for field, values in chunk_scored.items():
+                scored[field].extend(values)
+        return latest, scored
+
+    def run(self, symbols, sentiment_scores=None):
+        """Predict for many symbols; returns {'predictions': [...], 'timings': {...}}"""
+        service = self.prediction_service
+        sentiment_scores = sentiment_scores or {}
+        symbols = list(symbols)
+        timings = {}
+        started = time.perf_counter()
+
+        def stage(name, since):
+            now = time.perf_counter()
+            timings[name] = round((now - since) * 1000, 2)
+            return now
+
+        quotes = self._fetch_quotes(symbols)
+        mark = stage('quotes_ms', started)
+
+        candidates = [symbol for symbol in symbols if symbol in quotes]
+        for symbol in symbols:
+            if symbol not in quotes:
+                logging.warning(f"Failed to generate prediction for {symbol}: no current data")
+        histories = dict(zip(candidates, self._io_pool.map(self._fetch_history, candidates)))
+        batch = [symbol for symbol in candidates if histories[symbol] is not None]
+        mark = stage('history_ms', mark)
+
+        predictions = {}
+        if batch:
+            # Columns grouped by history length, each history filling the block's last days,
+            # so no symbol is cut to a shorter one's bars; packed as (field, day, symbol)
+            lengths = {symbol: len(histories[symbol]['close']) for symbol in batch}
+            columns = sorted(batch, key=lambda symbol: -lengths[symbol])
+            groups = []
+            for column, symbol in enumerate(columns):
+                if groups and groups[-1][2] == lengths[symbol]:
+                    groups[-1][1] = column + 1
+                else:
+                    groups.append([column, column + 1, lengths[symbol]])
+            shape = (len(FIELDS), lengths[columns[0]], len(columns))
+            block = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+            prices = None
+            try:
+                prices = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+                for column, symbol in enumerate(columns):
+                    for plane, field in enumerate(FIELDS):
+                        prices[plane, -lengths[symbol]:, column] = histories[symbol][field]
+                current_prices = [float(quotes[symbol]['price']) for symbol in columns]
+                sentiments = [float(sentiment_scores.get(symbol, 50)) for symbol in columns]
+                mark = stage('pack_ms', mark)
+
+                latest, scored = self._score(block, shape, groups, current_prices, sentiments)
+                mark = stage('compute_ms', mark)
+
+                for start, end, length in groups:
+                    # Pivot highs and lows for the whole group in one pass over the shared block
+                    days = min(length, service.level_lookback)
+                    high, low = prices[2, -days:, start:end], prices[3, -days:, start:end]
+                    is_high, is_low = indicators.pivot_points(high, low, order=service.pivot_order)
+
+                    for column in range(start, end):
+                        symbol = columns[column]
+                        try:
+                            prediction = service._format_prediction(
+                                {field: values[column] for field, values in latest.items()},
+                                {field: values[column] for field, values in scored.items()},
+                                current_prices[column],
+                                sentiments[column],
+                                service.calculate_support_resistance(
+                                    prices[0, -length:, column], prices[2, -length:, column],
+                                    prices[3, -length:, column], current_prices[column],
+                                    pivots=(is_high[:, column - start], is_low[:, column - start])
+                                )
+                            )
+                            prediction['symbol'] = symbol
+                            predictions[symbol] = prediction
+                        except Exception as e:
+                            logging.warning(f"Failed to generate prediction for {symbol}: {e}")
+                stage('format_ms', mark)
+            finally:
+                prices = high = low = None  # Release the views before closing the block
+                block.close()
+                block.unlink()
+
+        predictions = [predictions[symbol] for symbol in batch if symbol in predictions]
+        timings['wall_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        run = {
+            'symbols': len(symbols),
+            'predicted': len(predictions),
+            'workers': self.workers,
+            'timings': timings
+        }
+        logging.info(f"Batch prediction for {len(symbols)} symbols: {timings}")
+        with self._lock:
+            self.runs += 1
+            self.last_run = run
+        return {'predictions': predictions, **run}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'start_method': self.start_method,
+                'io_workers': self.io_workers,
+                'runs': self.runs,
+                'last_run': self.last_run
+            }
@@ -0,0 +1,456 @@
+import os
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'cache.db'
+)
+
+# Bump when the shared SQLite layout changes; old cache files are rebuilt
+SQLITE_SCHEMA_VERSION = 2
+
+_MISSING = object()
+
+
+class _Negative:
+    """Marker stored for keys known to have no data"""
+
+    def __reduce__(self):
+        # Unpickles to the module singleton so identity checks survive the shared tier
+        return 'NEGATIVE'
+
+    def __repr__(self):
+        return 'NEGATIVE'
+
+
+NEGATIVE = _Negative()
+
+
+class CacheEntry:
+    """Cached value with its write time, freshness deadline and hard expiry"""
+
+    __slots__ = ('value', 'stored_at', 'fresh_until', 'expires_at')
+
+    def __init__(self, value, stored_at, fresh_until, expires_at):
+        self.value = value
+        self.stored_at = stored_at
+        self.fresh_until = fresh_until
+        self.expires_at = expires_at
+
+    @classmethod
+    def create(cls, value, ttl, stale_ttl=0):
+        now = time.time()
+        return cls(value, now, now + ttl, now + ttl + stale_ttl)
+
+    @property
+    def age(self):
+        return time.time() - self.stored_at
+
+    @property
+    def is_stale(self):
+        return time.time() >= self.fresh_until
+
+    @property
+    def is_expired(self):
+        return time.time() >= self.expires_at
+
+    @property
+    def is_negative(self):
+        return self.value is NEGATIVE
+
+
+class CacheStats:
+    """Hit/miss counters shared by every cache tier"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def incr(self, field, amount=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def record_lookup(self, entry):
+        if entry is None:
+            self.incr('misses')
+        elif entry.is_negative:
+            self.incr('negative_hits')
+        elif entry.is_stale:
+            self.incr('stale_hits')
+        else:
+            self.incr('hits')
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.negative_hits + self.misses
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.negative_hits) / lookups, 3) if lookups else 0.0,
+                'sets': self.sets,
+                'evictions': self.evictions,
+                'errors': self.errors
+            }
+
+
+class _CacheTier:
+    """Value-level API shared by every tier; subclasses store CacheEntry objects"""
+
+    def get_entry(self, key):
+        raise NotImplementedError
+
+    def set_entry(self, key, entry):
+        raise NotImplementedError
+
+    def get(self, key, default=None):
+        """Return a fresh value (or NEGATIVE) for key, ignoring stale entries"""
+        entry = self.get_entry(key)
+        if entry is None or entry.is_stale:
+            return default
+        return entry.value
+
+    def set(self, key, value, ttl, stale_ttl=0):
+        """Cache a value that is fresh for ttl seconds and kept stale for stale_ttl more"""
+        self.set_entry(key, CacheEntry.create(value, ttl, stale_ttl))
+
+    def set_negative(self, key, ttl):
+        """Remember that key has no data so repeated lookups skip the upstream call"""
+        self.set_entry(key, CacheEntry.create(NEGATIVE, ttl))
+
+
+class MemoryCache(_CacheTier):
+    """In-process LRU tier bounded by entry count and, optionally, pickled byte size"""
+
+    def __init__(self, namespace, max_entries=1024, max_bytes=None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self.size_bytes = 0
+        self._entries = OrderedDict()  # key -> (CacheEntry, size in bytes)
+        self._lock = threading.Lock()
+
+    def get_entry(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                if item[0].is_expired:
+                    self._remove(key)
+                    item = None
+                else:
+                    self._entries.move_to_end(key)
+        entry = item[0] if item is not None else None
+        self.stats.record_lookup(entry)
+        return entry
+
+    def set_entry(self, key, entry):
+        size = len(pickle.dumps(entry.value)) if self.max_bytes else 0
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (entry, size)
+            self.size_bytes += size
+            self._evict()
+        self.stats.incr('sets')
+
+    def _remove(self, key):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self.size_bytes -= item[1]
+
+    def _evict(self):
+        """Drop least recently used entries until both bounds hold"""
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes and self.size_bytes > self.max_bytes)
+        ):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.size_bytes -= size
+            self.stats.incr('evictions')
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def info(self):
+        return dict(self.stats.as_dict(), backend='memory', entries=len(self),
+                    max_entries=self.max_entries, size_bytes=self.size_bytes, max_bytes=self.max_bytes)
+
+
+class SQLiteCache(_CacheTier):
+    """Host-wide cache tier stored in a WAL-mode SQLite file shared by all workers"""
+
+    def __init__(self, namespace, path=DEFAULT_CACHE_PATH, max_entries=10000):
+        self.namespace = namespace
+        self.path = path
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._local = threading.local()
+        self._writes_since_prune = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection()
+
+    def _connection(self):
+        """Get this thread's connection; sqlite3 connections are not shared between threads"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if conn.execute('PRAGMA user_version').fetchone()[0] != SQLITE_SCHEMA_VERSION:
+                conn.execute('DROP TABLE IF EXISTS cache_entry')
+                conn.execute(f'PRAGMA user_version = {SQLITE_SCHEMA_VERSION}')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entry ('
+                'namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, '
+                'stored_at REAL NOT NULL, fresh_until REAL NOT NULL, expires_at REAL NOT NULL, '
+                'PRIMARY KEY (namespace, key))'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS ix_cache_entry_stored_at ON cache_entry (namespace, stored_at)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def get_entry(self, key):
+        try:
+            row = self._connection().execute(
+                'SELECT value, stored_at, fresh_until, expires_at FROM cache_entry '
+                'WHERE namespace = ? AND key = ? AND expires_at > ?',
+                (self.namespace, str(key), time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"Shared cache read failed for {self.namespace}:{key}: {e}")
+            self.stats.incr('errors')
+            return None
+        entry = CacheEntry(pickle.loads(row[0]), row[1], row[2], row[3]) if row else None
+        self.stats.record_lookup(entry)
+        return entry
+
+    def set_entry(self, key, entry):
+        try:
+            self._connection().execute(
+                'INSERT OR REPLACE INTO cache_entry '
+                '(namespace, key, value, stored_at, fresh_until, expires_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (self.namespace, str(key), sqlite3.Binary(pickle.dumps(entry.value)),
+                 entry.stored_at, entry.fresh_until, entry.expires_at)
+            )
+        except sqlite3.Error as e:
+            logging.warning(f"Shared cache write failed for {self.namespace}:{key}: {e}")
+            self.stats.incr('errors')
+            return
+        self.stats.incr('sets')
+
+        # Prune every so often rather than on each write
+        self._writes_since_prune += 1
+        if self._writes_since_prune >= 100:
+            self._writes_since_prune = 0
+            self.prune()
+
+    def prune(self):
+        """Drop expired entries and the oldest ones beyond max_entries"""
+        try:
+            conn = self._connection()
+            expired = conn.execute(
+                'DELETE FROM cache_entry WHERE namespace = ? AND expires_at <= ?',
+                (self.namespace, time.time())
+            ).rowcount
+            overflow = conn.execute(
+                'DELETE FROM cache_entry WHERE namespace = ? AND key IN ('
+                'SELECT key FROM cache_entry WHERE namespace = ? '
+                'ORDER BY stored_at DESC LIMIT -1 OFFSET ?)',
+                (self.namespace, self.namespace, self.max_entries)
+            ).rowcount
+            self.stats.incr('evictions', expired + overflow)
+        except sqlite3.Error as e:
+            logging.warning(f"Shared cache prune failed for {self.namespace}: {e}")
+            self.stats.incr('errors')
+
+    def delete(self, key):
+        try:
+            self._connection().execute(
+                'DELETE FROM cache_entry WHERE namespace = ? AND key = ?',
+                (self.namespace, str(key))
+            )
+        except sqlite3.Error as e:
+            logging.warning(f"Shared cache delete failed for {self.namespace}:{key}: {e}")
+            self.stats.incr('errors')
+
+    def clear(self):
+        try:
+            self._connection().execute('DELETE FROM cache_entry WHERE namespace = ?', (self.namespace,))
+        except sqlite3.Error as e:
+            logging.warning(f"Shared cache clear failed for {self.namespace}: {e}")
+            self.stats.incr('errors')
+
+    def __len__(self):
+        try:
+            return self._connection().execute(
+                'SELECT COUNT(*) FROM cache_entry WHERE namespace = ?', (self.namespace,)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def info(self):
+        return dict(self.stats.as_dict(), backend='sqlite', path=self.path,
+                    entries=len(self), max_entries=self.max_entries)
+
+
+class RedisCache(_CacheTier):
+    """Shared cache tier on a Redis-compatible server; the server's maxmemory policy bounds its size"""
+
+    def __init__(self, namespace, url):
+        import redis  # Optional dependency, only needed for CACHE_BACKEND=redis
+
+        self.namespace = namespace
+        self.client = redis.Redis.from_url(url)
+        self.stats = CacheStats()
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def get_entry(self, key):
+        try:
+            raw = self.client.get(self._key(key))
+        except Exception as e:
+            logging.warning(f"Redis cache read failed for {self._key(key)}: {e}")
+            self.stats.incr('errors')
+            return None
+        entry = pickle.loads(raw) if raw is not None else None
+        self.stats.record_lookup(entry)
+        return entry
+
+    def set_entry(self, key, entry):
+        ttl_ms = max(1, int((entry.expires_at - time.time()) * 1000))
+        try:
+            self.client.set(self._key(key), pickle.dumps(entry), px=ttl_ms)
+        except Exception as e:
+            logging.warning(f"Redis cache write failed for {self._key(key)}: {e}")
+            self.stats.incr('errors')
+            return
+        self.stats.incr('sets')
+
+    def delete(self, key):
+        try:
+            self.client.delete(self._key(key))
+        except Exception as e:
+            logging.warning(f"Redis cache delete failed for {self._key(key)}: {e}")
+            self.stats.incr('errors')
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=f"{self.namespace}:*"))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as e:
+            logging.warning(f"Redis cache clear failed for {self.namespace}: {e}")
+            self.stats.incr('errors')
+
+    def info(self):
+        return dict(self.stats.as_dict(), backend='redis')
+
+
+class TieredCache(_CacheTier):
+    """Two-level cache: a bounded in-process LRU tier in front of a shared tier"""
+
+    def __init__(self, namespace, local, shared=None):
+        self.namespace = namespace
+        self.local = local
+        self.shared = shared
+
+    def get_entry(self, key):
+        """Return the entry for key, which may be stale or NEGATIVE, or None
+
+        A fresh local entry is served directly. Otherwise the shared tier is
+        read, since another worker may have refreshed the key, and the more
+        recently stored of the two entries wins.
+        """
+        entry = self.local.get_entry(key)
+        if self.shared is None or (entry is not None and not entry.is_stale):
+            return entry
+
+        shared = self.shared.get_entry(key)
+        if shared is not None and (entry is None or shared.stored_at > entry.stored_at):
+            # Refill the local tier with the shared entry's own deadlines
+            self.local.set_entry(key, shared)
+            return shared
+        return entry
+
+    def set_entry(self, key, entry):
+        self.local.set_entry(key, entry)
+        if self.shared is not None:
+            self.shared.set_entry(key, entry)
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def info(self):
+        return {
+            'local': self.local.info(),
+            'shared': self.shared.info() if self.shared is not None else None
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _create_shared_tier(namespace, max_entries):
+    """Build the shared tier selected by CACHE_BACKEND (sqlite, redis or memory)"""
+    backend = os.environ.get('CACHE_BACKEND', 'sqlite').lower()
+    try:
+        if backend == 'sqlite':
+            path = os.environ.get('CACHE_PATH', DEFAULT_CACHE_PATH)
+            return SQLiteCache(namespace, path=path, max_entries=max_entries)
+        if backend == 'redis':
+            return RedisCache(namespace, os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+    except Exception as e:
+        logging.error(f"Error initializing {backend} cache for {namespace}, using in-process cache only: {e}")
+    return None
+
+
+def get_cache(namespace, max_entries=1024, max_bytes=None, shared_max_entries=10000):
+    """Get the process-wide cache for a namespace, creating it on first use"""
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = TieredCache(
+                namespace,
+                MemoryCache(namespace, max_entries=max_entries, max_bytes=max_bytes),
+                _create_shared_tier(namespace, shared_max_entries)
+            )
+            _caches[namespace] = cache
+        return cache
+
+
+def get_cache_stats():
+    """Return tier stats for every registered cache keyed by namespace"""
+    with _caches_lock:
+        caches = list(_caches.items())
+    return {namespace: cache.info() for namespace, cache in caches}
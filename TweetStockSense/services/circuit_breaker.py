@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the upstream's breaker is open"""
+
+
+class Deadline:
+    """Time budget for one request; retries stop once it is spent"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def allows(self, seconds):
+        """Whether waiting this long still leaves time for another attempt"""
+        return self.remaining() > seconds
+
+
+class CircuitBreaker:
+    """Per-upstream breaker: opens after repeated failures, probes again after a cool-down"""
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=60, half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._lock = threading.Lock()
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.half_open_calls = 0
+
+        # Stats
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def _transition(self, state):
+        if state != self.state:
+            logging.warning(f"Circuit breaker {self.name}: {self.state} -> {state}")
+            self.state = state
+
+    def allow_request(self):
+        """Return True if a call may go upstream now"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self._transition(HALF_OPEN)
+                self.half_open_calls = 0
+
+            if self.state == HALF_OPEN:
+                if self.half_open_calls >= self.half_open_max_calls:
+                    self.rejected += 1
+                    return False
+                self.half_open_calls += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self._transition(OPEN)
+                self.opened_at = time.monotonic()
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn through the breaker, raising CircuitOpenError if it is open"""
+        if not self.allow_request():
+            raise CircuitOpenError(f"Circuit breaker {self.name} is open")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout_seconds': self.reset_timeout,
+                'retry_in_seconds': retry_in,
+                'successes': self.successes,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'times_opened': self.times_opened
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name, **kwargs):
+    """Get the process-wide breaker for an upstream, creating it on first use"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, **kwargs)
+            _breakers[name] = breaker
+        return breaker
+
+
+def get_circuit_breaker_stats():
+    """Return state and counters for every registered breaker keyed by upstream"""
+    with _breakers_lock:
+        breakers = list(_breakers.items())
+    return {name: breaker.stats() for name, breaker in breakers}
@@ -1,8 +1,111 @@
-from app import db
-from models import Stock, StockPrice, Tweet, Prediction, UserWatchlist, MarketSentiment
-from datetime import datetime, timedelta
-from sqlalchemy import func
+from app import app, db
+from models import Stock, StockPrice, PriceRollup, Tweet, Prediction, UserWatchlist, MarketSentiment
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import String, event, func, literal, select, type_coerce
+from sqlalchemy.dialects import postgresql, sqlite
+import csv
+import io
+import json
 import logging
+import re
+import numpy as np
+
+# StockPrice columns written by save_stock_prices, in COPY order
+PRICE_COLUMNS = (
+    'stock_id', 'timestamp', 'open_price', 'high_price', 'low_price', 'close_price', 'volume',
+    'price_change', 'price_change_percent'
+)
+
+# PriceRollup resolutions, finest first, with the width of one bucket
+ROLLUP_RESOLUTIONS = {
+    '1m': np.timedelta64(1, 'm'),
+    '1h': np.timedelta64(1, 'h'),
+    '1d': np.timedelta64(1, 'D'),
+    '1w': np.timedelta64(7, 'D'),
+}
+
+# Weekly buckets start on Mondays; every other width divides a week evenly
+ROLLUP_ORIGIN = np.datetime64('1970-01-05T00:00:00', 'us')
+
+# Units of yfinance interval strings such as '5m', '1h', '1d', '1wk'
+INTERVAL_UNITS = {'m': (1, 'm'), 'h': (1, 'h'), 'd': (1, 'D'), 'wk': (7, 'D'), 'mo': (30, 'D')}
+
+# Days after a prediction at which get_accuracy_report checks its direction
+ACCURACY_HORIZONS = (1, 5, 20)
+
+# Symbol of the throwaway stock query_plans inserts so its reads reach the per-symbol queries
+QUERY_PLAN_PROBE = '__PLAN_PROBE__'
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING ... RETURNING
+UPSERT_DIALECTS = {'postgresql': postgresql, 'sqlite': sqlite}
+
+
+def _to_utc(value):
+    """Naive UTC datetime from a datetime or an ISO 8601 string"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _bar_columns(bars):
+    """Timestamps (datetime64[us]) and OHLCV arrays from a yfinance frame or a column dict
+
+    Column dicts are the price store's layout; integer timestamps there are
+    epoch days. Timezone-aware frames keep their exchange-local wall time.
+    """
+    if hasattr(bars, 'index') and hasattr(bars, 'columns'):
+        index = bars.index
+        if getattr(index, 'tz', None) is not None:
+            index = index.tz_localize(None)
+        names = {str(column).lower(): column for column in bars.columns}
+        columns = {field: bars[names[field]].to_numpy() for field in ('open', 'high', 'low', 'close', 'volume')}
+        timestamps = index.values
+    else:
+        columns = {field: np.asarray(bars[field]) for field in ('open', 'high', 'low', 'close', 'volume')}
+        timestamps = np.asarray(bars['timestamp'])
+        if np.issubdtype(timestamps.dtype, np.integer):
+            timestamps = timestamps.astype('datetime64[D]')
+    columns = {field: np.asarray(values, dtype=np.float64) for field, values in columns.items()}
+    columns['timestamp'] = np.asarray(timestamps, dtype='datetime64[us]')
+    return columns
+
+
+def _interval_width(interval):
+    """Bar width of a yfinance interval string, e.g. '5m' or '1d'"""
+    match = re.fullmatch(r'(\d+)(m|h|d|wk|mo)', interval)
+    if not match:
+        raise ValueError(f"Unsupported interval: {interval}")
+    count, unit = INTERVAL_UNITS[match.group(2)]
+    return np.timedelta64(int(match.group(1)) * count, unit).astype('timedelta64[us]')
+
+
+def _bucket_start(timestamps, width):
+    """Start of the rollup bucket of the given width holding each timestamp"""
+    timestamps = np.asarray(timestamps, dtype='datetime64[us]')
+    return ROLLUP_ORIGIN + (timestamps - ROLLUP_ORIGIN) // width * width
+
+
+def _downsample(bars, width):
+    """Aggregate time-sorted OHLCV column arrays into buckets of the given width
+
+    Open is the first bar's, close the last's; high, low, volume and
+    bar_count combine over the bucket.
+    """
+    buckets = _bucket_start(bars['timestamp'], width)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    return {
+        'timestamp': buckets[starts],
+        'open': bars['open'][starts],
+        'high': np.maximum.reduceat(bars['high'], starts),
+        'low': np.minimum.reduceat(bars['low'], starts),
+        'close': bars['close'][ends],
+        'volume': np.add.reduceat(bars['volume'], starts),
+        'bar_count': np.add.reduceat(bars['bar_count'], starts)
+    }
+
 
 class DatabaseService:
     def __init__(self):
@@ -32,6 +135,64 @@ class DatabaseService:
         
         return stock
     
+    def save_stock_metadata(self, symbol, metadata):
+        """Persist slow-changing Ticker.info fields on the Stock row"""
+        # Called from background refresh threads, so push our own app context
+        with app.app_context():
+            try:
+                fields = {
+                    'market_cap': metadata.get('market_cap') or None,
+                    'pe_ratio': metadata.get('pe_ratio') or None,
+                    'metadata_updated': datetime.utcnow()
+                }
+                return self.get_or_create_stock(symbol, name=metadata.get('name') or None, **fields)
+            except Exception as e:
+                logging.error(f"Error saving metadata for {symbol}: {e}")
+                db.session.rollback()
+        return None
+    
+    def get_stock_metadata(self):
+        """Load persisted symbol metadata, used to warm the metadata cache at startup
+        
+        Only rows saved by save_stock_metadata count; rows created for prices
+        or quotes hold placeholders until their metadata is first fetched.
+        """
+        return {
+            stock.symbol: {
+                'name': stock.name,
+                'market_cap': stock.market_cap or 0,
+                'pe_ratio': stock.pe_ratio or 0,
+                'updated_at': stock.metadata_updated
+            }
+            for stock in Stock.query.filter(Stock.metadata_updated.isnot(None)).all()
+        }
+    
+    def save_indicator_state(self, symbol, state):
+        """Persist a symbol's IndicatorState (as a dict) on its Stock row"""
+        with app.app_context():
+            try:
+                stock = Stock.query.filter_by(symbol=symbol).first()
+                if not stock:
+                    return False
+                stock.indicator_state = json.dumps(state)
+                db.session.commit()
+                return True
+            except Exception as e:
+                logging.error(f"Error saving indicator state for {symbol}: {e}")
+                db.session.rollback()
+        return False
+    
+    def get_indicator_state(self, symbol):
+        """Load a symbol's persisted IndicatorState dict, or None"""
+        with app.app_context():
+            try:
+                stock = Stock.query.filter_by(symbol=symbol).first()
+                if stock and stock.indicator_state:
+                    return json.loads(stock.indicator_state)
+            except Exception as e:
+                logging.error(f"Error loading indicator state for {symbol}: {e}")
+        return None
+    
     def save_stock_price(self, stock, price_data):
         """Save historical stock price data"""
         try:
@@ -60,6 +221,272 @@ class DatabaseService:
             logging.error(f"Error saving stock price for {stock.symbol}: {e}")
             db.session.rollback()
     
+    def _price_columns(self, stock_id, bars):
+        """StockPrice column lists keyed by PRICE_COLUMNS for one symbol's bars, sorted by time"""
+        columns = _bar_columns(bars)
+        order = np.argsort(columns['timestamp'], kind='stable')
+        columns = {field: values[order] for field, values in columns.items()}
+        keep = np.isfinite(columns['close'])
+        # Last bar wins when a block repeats a timestamp, as the unique key requires
+        keep[:-1] &= columns['timestamp'][1:] != columns['timestamp'][:-1]
+        columns = {field: values[keep] for field, values in columns.items()}
+        
+        close = columns['close']
+        # open, high and low are NOT NULL; fall back to the close where a bar lacks them
+        for field in ('open', 'high', 'low'):
+            columns[field] = np.where(np.isfinite(columns[field]), columns[field], close)
+        change = np.full(len(close), np.nan)
+        change[1:] = np.diff(close)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change_percent = np.where(np.isfinite(change), change / np.r_[np.nan, close[:-1]] * 100, np.nan)
+        
+        def nullable(values):
+            return [None if value != value else value for value in values.tolist()]
+        
+        return {
+            'stock_id': [stock_id] * len(close),
+            # Kept as datetime64; each load path converts it to what its driver binds
+            'timestamp': columns['timestamp'],
+            'open_price': columns['open'].tolist(),
+            'high_price': columns['high'].tolist(),
+            'low_price': columns['low'].tolist(),
+            'close_price': close.tolist(),
+            'volume': np.nan_to_num(columns['volume']).astype(np.int64).tolist(),
+            'price_change': nullable(change),
+            'price_change_percent': nullable(change_percent)
+        }
+    
+    def _copy_prices(self, columns):
+        """PostgreSQL: COPY rows into a temporary table, then upsert them in one statement"""
+        columns = {**columns, 'timestamp': np.datetime_as_string(columns['timestamp'], unit='us').tolist()}
+        cursor = db.session.connection().connection.cursor()
+        try:
+            cursor.execute(
+                "CREATE TEMP TABLE stock_price_load (LIKE stock_price INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+            buffer = io.StringIO()
+            # None is written as an empty field, read back as NULL
+            csv.writer(buffer).writerows(zip(*(columns[column] for column in PRICE_COLUMNS)))
+            buffer.seek(0)
+            column_list = ', '.join(f'"{column}"' for column in PRICE_COLUMNS)
+            cursor.copy_expert(f"COPY stock_price_load ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+            updates = ', '.join(
+                f'"{column}" = COALESCE(EXCLUDED."{column}", stock_price."{column}")'
+                if column.startswith('price_change') else f'"{column}" = EXCLUDED."{column}"'
+                for column in PRICE_COLUMNS[2:]
+            )
+            cursor.execute(
+                f"INSERT INTO stock_price ({column_list}) SELECT {column_list} FROM stock_price_load "
+                f"ON CONFLICT (stock_id, timestamp) DO UPDATE SET {updates}"
+            )
+        finally:
+            cursor.close()
+    
+    def _upsert_prices(self, columns, chunk_size):
+        """Upsert rows with executemany in chunks, by INSERT ... ON CONFLICT where the dialect has it"""
+        table = StockPrice.__table__
+        dialect = UPSERT_DIALECTS.get(db.engine.dialect.name)
+        if dialect is not None:
+            statement = dialect.insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=['stock_id', 'timestamp'],
+                set_={
+                    # A block's first bar has no previous close; keep the change already stored
+                    column: func.coalesce(statement.excluded[column], table.c[column])
+                    if column.startswith('price_change') else statement.excluded[column]
+                    for column in PRICE_COLUMNS[2:]
+                }
+            )
+        
+        if db.engine.dialect.name == 'sqlite':
+            # Per-row parameter processing costs more than SQLite's insert, so bind plain tuples,
+            # with timestamps in the text format SQLAlchemy stores (and the unique index compares)
+            compiled = statement.compile(dialect=db.engine.dialect, column_keys=list(PRICE_COLUMNS))
+            timestamps = np.char.replace(np.datetime_as_string(columns['timestamp'], unit='us'), 'T', ' ')
+            columns = {**columns, 'timestamp': timestamps.tolist()}
+            rows = list(zip(*(columns[name] for name in compiled.positiontup)))
+            connection = db.session.connection()
+            for start in range(0, len(rows), chunk_size):
+                connection.exec_driver_sql(str(compiled), rows[start:start + chunk_size])
+            return
+        
+        timestamps = columns['timestamp'].astype('datetime64[us]').tolist()
+        if dialect is None:
+            # Other databases: replace the block's time range, then insert
+            statement = table.insert()
+            db.session.execute(table.delete().where(
+                table.c.stock_id == columns['stock_id'][0], table.c.timestamp.between(timestamps[0], timestamps[-1])
+            ))
+        rows = [dict(zip(PRICE_COLUMNS, row)) for row in zip(*(
+            timestamps if column == 'timestamp' else columns[column] for column in PRICE_COLUMNS
+        ))]
+        for start in range(0, len(rows), chunk_size):
+            db.session.execute(statement, rows[start:start + chunk_size])
+    
+    def save_stock_prices(self, symbol, bars, chunk_size=5000, interval='1d'):
+        """Upsert a block of bars for one symbol in one transaction
+        
+        bars is a yfinance history frame or a column dict like the price
+        store's (timestamp, open, high, low, close, volume). Bars already
+        stored for the same timestamp are overwritten. PostgreSQL loads through
+        COPY with psycopg2; other databases and drivers use chunked
+        executemany. interval is the bars' yfinance interval; rollups coarser
+        than it are updated in the same transaction. Returns the number of
+        bars written.
+        """
+        # Also called from history sync threads, so push our own app context
+        with app.app_context():
+            try:
+                stock = Stock.query.filter_by(symbol=symbol).first() or self.get_or_create_stock(symbol)
+                columns = self._price_columns(stock.id, bars)
+                count = len(columns['stock_id'])
+                if not count:
+                    return 0
+                if db.engine.dialect.name == 'postgresql' and db.engine.dialect.driver == 'psycopg2':
+                    self._copy_prices(columns)
+                else:
+                    self._upsert_prices(columns, chunk_size)
+                self._update_rollups(stock.id, columns['timestamp'][0], columns['timestamp'][-1], interval)
+                db.session.commit()
+                return count
+            except Exception as e:
+                logging.error(f"Error saving stock prices for {symbol}: {e}")
+                db.session.rollback()
+                return 0
+    
+    def _bar_source(self, stock_id, start, end, resolution):
+        """Table, time column and filters for one symbol's bars: StockPrice when resolution is None"""
+        if resolution is None:
+            table = StockPrice.__table__
+            time_column = table.c.timestamp
+            conditions = [table.c.stock_id == stock_id]
+        else:
+            table = PriceRollup.__table__
+            time_column = table.c.bucket
+            conditions = [table.c.stock_id == stock_id, table.c.resolution == resolution]
+        if start is not None:
+            conditions.append(time_column >= start)
+        if end is not None:
+            conditions.append(time_column < end)
+        return table, time_column, conditions
+    
+    def _read_bars(self, stock_id, start=None, end=None, resolution=None):
+        """Time-sorted OHLCV columns for start <= t < end from StockPrice or one rollup resolution"""
+        table, time_column, conditions = self._bar_source(stock_id, start, end, resolution)
+        bar_count = literal(1) if resolution is None else table.c.bar_count
+        # SQLite stores timestamps as text, which NumPy parses far faster than datetime objects
+        time_value = type_coerce(time_column, String) if db.engine.dialect.name == 'sqlite' else time_column
+        query = select(
+            time_value, table.c.open_price, table.c.high_price, table.c.low_price, table.c.close_price,
+            table.c.volume, bar_count
+        ).where(*conditions).order_by(time_column)
+        rows = db.session.connection().execute(query).all()
+        timestamps, opens, highs, lows, closes, volumes, bar_counts = zip(*rows) if rows else ((),) * 7
+        return {
+            'timestamp': np.array(timestamps, dtype='datetime64[us]'),
+            'open': np.array(opens, dtype=np.float64),
+            'high': np.array(highs, dtype=np.float64),
+            'low': np.array(lows, dtype=np.float64),
+            'close': np.array(closes, dtype=np.float64),
+            'volume': np.array([volume or 0 for volume in volumes], dtype=np.int64),
+            'bar_count': np.array(bar_counts, dtype=np.int64)
+        }
+    
+    def _update_rollups(self, stock_id, first, last, interval='1d'):
+        """Recompute the rollup buckets touched by bars between first and last; returns rollup rows written
+        
+        Only resolutions coarser than the bars' interval are kept. Each one is
+        rebuilt from the next finer level just written (raw bars for the
+        finest), so an update reads at most one bucket's worth of children
+        per level.
+        """
+        native = _interval_width(interval)
+        table = PriceRollup.__table__
+        source = None
+        written = 0
+        for resolution, width in ROLLUP_RESOLUTIONS.items():
+            if width <= native:
+                continue
+            start = _bucket_start(first, width).item()
+            end = (_bucket_start(last, width) + width).item()
+            bars = self._read_bars(stock_id, start, end, source)
+            db.session.execute(table.delete().where(
+                table.c.stock_id == stock_id, table.c.resolution == resolution,
+                table.c.bucket >= start, table.c.bucket < end
+            ))
+            if len(bars['timestamp']):
+                rollup = _downsample(bars, width)
+                db.session.execute(table.insert(), [
+                    {
+                        'stock_id': stock_id, 'resolution': resolution, 'bucket': bucket,
+                        'open_price': open_price, 'high_price': high_price, 'low_price': low_price,
+                        'close_price': close_price, 'volume': volume, 'bar_count': bar_count
+                    }
+                    for bucket, open_price, high_price, low_price, close_price, volume, bar_count in zip(
+                        rollup['timestamp'].tolist(), rollup['open'].tolist(), rollup['high'].tolist(),
+                        rollup['low'].tolist(), rollup['close'].tolist(), rollup['volume'].tolist(),
+                        rollup['bar_count'].tolist()
+                    )
+                ])
+                written += len(rollup['timestamp'])
+            source = resolution
+        return written
+    
+    def rebuild_rollups(self, symbols=None, interval='1d'):
+        """Recompute every rollup from StockPrice, e.g. for bars stored before rollups existed
+        
+        Returns the number of rollup rows written.
+        """
+        query = db.session.query(
+            StockPrice.stock_id, Stock.symbol, func.min(StockPrice.timestamp), func.max(StockPrice.timestamp)
+        ).join(Stock, StockPrice.stock_id == Stock.id).group_by(StockPrice.stock_id, Stock.symbol)
+        if symbols:
+            query = query.filter(Stock.symbol.in_(list(symbols)))
+        
+        written = 0
+        for stock_id, symbol, first, last in query.all():
+            try:
+                table = PriceRollup.__table__
+                db.session.execute(table.delete().where(table.c.stock_id == stock_id))
+                written += self._update_rollups(
+                    stock_id, np.datetime64(first, 'us'), np.datetime64(last, 'us'), interval
+                )
+                db.session.commit()
+            except Exception as e:
+                logging.error(f"Error rebuilding rollups for {symbol}: {e}")
+                db.session.rollback()
+        return written
+    
+    def get_price_bars(self, symbol, start=None, end=None, points=500):
+        """OHLCV columns for start <= t < end at the coarsest resolution giving at least points bars
+        
+        Resolutions are tried coarsest first by counting their rows over the
+        range, with raw StockPrice bars last; if none reaches points, the one
+        with the most bars wins. A finer level is only counted when the one
+        above it fell short, so rows read stay within points times the width
+        ratio between neighbouring levels, however much raw history is kept.
+        Returns None for an unknown symbol.
+        """
+        try:
+            stock = Stock.query.filter_by(symbol=symbol).first()
+            if not stock:
+                return None
+            
+            chosen, chosen_count = None, -1
+            for resolution in [*reversed(ROLLUP_RESOLUTIONS), None]:
+                table, _, conditions = self._bar_source(stock.id, start, end, resolution)
+                count = db.session.execute(select(func.count()).select_from(table).where(*conditions)).scalar()
+                if count > chosen_count:
+                    chosen, chosen_count = resolution, count
+                if count >= points:
+                    break
+            
+            bars = self._read_bars(stock.id, start, end, chosen)
+            return {'symbol': symbol, 'resolution': chosen or 'raw', **bars}
+        except Exception as e:
+            logging.error(f"Error getting price bars for {symbol}: {e}")
+            return None
+    
     def save_tweet(self, tweet_data):
         """Save tweet data to database"""
         try:
@@ -79,7 +506,7 @@ class DatabaseService:
                     retweet_count=tweet_data.get('retweet_count', 0),
                     like_count=tweet_data.get('like_count', 0),
                     reply_count=tweet_data.get('reply_count', 0),
-                    tweet_created_at=datetime.fromisoformat(tweet_data['created_at'].replace('Z', '+00:00')),
+                    tweet_created_at=_to_utc(tweet_data['created_at']),
                     created_at=datetime.utcnow()
                 )
                 db.session.add(tweet)
@@ -91,6 +518,78 @@ class DatabaseService:
         
         return existing
     
+    def _tweet_row(self, tweet_data, now):
+        return {
+            'tweet_id': str(tweet_data['id']),
+            'text': tweet_data['text'],
+            'username': tweet_data['username'],
+            'name': tweet_data.get('name'),
+            'verified': bool(tweet_data.get('verified', False)),
+            'sentiment_score': tweet_data['sentiment']['score'],
+            'sentiment_label': tweet_data['sentiment']['label'],
+            'sentiment_polarity': tweet_data['sentiment']['polarity'],
+            'retweet_count': tweet_data.get('retweet_count', 0),
+            'like_count': tweet_data.get('like_count', 0),
+            'reply_count': tweet_data.get('reply_count', 0),
+            'tweet_created_at': _to_utc(tweet_data.get('created_at')),
+            'created_at': now
+        }
+    
+    def save_tweets(self, tweets):
+        """Save a batch of tweets in one transaction, skipping ones already stored
+        
+        Uses INSERT ... ON CONFLICT (tweet_id) DO NOTHING on SQLite and
+        PostgreSQL, so concurrent writers cannot insert duplicates. Returns
+        {'inserted': n, 'skipped': n, 'invalid': n, 'failed': n}; when the
+        transaction fails every valid tweet is counted as failed, not skipped.
+        """
+        now = datetime.utcnow()
+        rows = {}
+        invalid = 0
+        for tweet_data in tweets:
+            try:
+                row = self._tweet_row(tweet_data, now)
+            except (KeyError, TypeError, ValueError) as e:
+                logging.warning(f"Skipping malformed tweet: {e}")
+                invalid += 1
+                continue
+            rows.setdefault(row['tweet_id'], row)
+        
+        counts = {'inserted': 0, 'skipped': len(tweets) - invalid, 'invalid': invalid, 'failed': 0}
+        if not rows:
+            return counts
+        
+        try:
+            dialect = UPSERT_DIALECTS.get(db.engine.dialect.name)
+            if dialect is not None:
+                statement = (
+                    dialect.insert(Tweet.__table__)
+                    .on_conflict_do_nothing(index_elements=['tweet_id'])
+                    .returning(Tweet.__table__.c.tweet_id)
+                )
+                inserted = len(db.session.execute(statement, list(rows.values())).all())
+            else:
+                # Other databases: one existence query, then a plain bulk insert
+                existing = {
+                    tweet_id for (tweet_id,) in
+                    db.session.query(Tweet.tweet_id).filter(Tweet.tweet_id.in_(list(rows)))
+                }
+                new_rows = [row for tweet_id, row in rows.items() if tweet_id not in existing]
+                if new_rows:
+                    db.session.execute(Tweet.__table__.insert(), new_rows)
+                inserted = len(new_rows)
+            db.session.commit()
+        except Exception as e:
+            logging.error(f"Error saving tweets: {e}")
+            db.session.rollback()
+            counts['skipped'] = 0
+            counts['failed'] = len(tweets) - invalid
+            return counts
+        
+        counts['inserted'] = inserted
+        counts['skipped'] = len(tweets) - invalid - inserted
+        return counts
+    
     def save_prediction(self, stock, prediction_data):
         """Save prediction data to database"""
         try:
@@ -151,52 +650,182 @@ class DatabaseService:
                 .limit(limit).all()
         return []
     
-    def get_prediction_accuracy(self, symbol, days=30):
-        """Calculate prediction accuracy for a stock"""
+    def _days_after(self, column, days):
+        """SQL expression for a timestamp column shifted by whole days"""
+        if db.engine.dialect.name == 'sqlite':
+            return func.datetime(column, f'+{days} days')
+        return column + timedelta(days=days)
+    
+    def _close_after(self, at, inclusive=False):
+        """Correlated subquery: the first close for the prediction's stock after (or at) a time"""
+        after = StockPrice.timestamp >= at if inclusive else StockPrice.timestamp > at
+        return select(StockPrice.close_price)\
+            .where(StockPrice.stock_id == Prediction.stock_id, after)\
+            .order_by(StockPrice.timestamp)\
+            .limit(1)\
+            .correlate(Prediction)\
+            .scalar_subquery()
+    
+    def get_accuracy_report(self, symbols=None, days=30, horizons=ACCURACY_HORIZONS):
+        """Direction accuracy of recent predictions per symbol, from one query
+        
+        Each prediction is compared with the first bar after it and with the
+        first bar at least h days after it for every horizon h. The outcomes
+        are correlated subqueries (a portable LATERAL join) that each read one
+        row through the (stock_id, timestamp) index. Predictions without a
+        later bar yet are counted in total_predictions but not evaluated.
+        
+        Returns {symbol: {...}} for every symbol with predictions in the window.
+        """
         cutoff_date = datetime.utcnow() - timedelta(days=days)
-        stock = Stock.query.filter_by(symbol=symbol).first()
+        outcomes = {'next': self._close_after(Prediction.prediction_date)}
+        for horizon in horizons:
+            outcomes[f'{horizon}d'] = self._close_after(
+                self._days_after(Prediction.prediction_date, horizon), inclusive=True
+            )
         
-        if not stock:
-            return None
+        query = select(
+            Prediction.symbol,
+            (Prediction.predicted_price - Prediction.current_price).label('predicted_change'),
+            *[(outcome - Prediction.current_price).label(name) for name, outcome in outcomes.items()]
+        ).where(Prediction.prediction_date >= cutoff_date)
+        if symbols:
+            stock_ids = select(Stock.id).where(Stock.symbol.in_(list(symbols)))
+            query = query.where(Prediction.stock_id.in_(stock_ids))
+        # Core rows: ORM result processing would cost more than the query itself
+        rows = db.session.connection().execute(query.order_by(Prediction.symbol)).all()
+        if not rows:
+            return {}
         
-        predictions = Prediction.query.filter(
-            Prediction.stock_id == stock.id,
-            Prediction.prediction_date >= cutoff_date
-        ).all()
+        # Aggregate in NumPy: grouping in SQL would re-run each outcome subquery per reference
+        symbol_column = np.array([row[0] for row in rows])
+        values = np.array([row[1:] for row in rows], dtype=np.float64)  # NULL outcomes become NaN
+        predicted = values[:, 0]
+        boundaries = np.flatnonzero(symbol_column[1:] != symbol_column[:-1]) + 1
+        starts = np.r_[0, boundaries]
         
-        if not predictions:
-            return None
+        def group_sums(flags):
+            return np.add.reduceat(flags.astype(np.int64), starts)
         
-        accurate_predictions = 0
-        total_predictions = len(predictions)
+        summaries = {}
+        for index, name in enumerate(outcomes, start=1):
+            actual = values[:, index]
+            # Same rule as before: moved the predicted way, or both stayed flat
+            correct = ((predicted > 0) & (actual > 0)) | ((predicted < 0) & (actual < 0)) | \
+                      ((np.abs(predicted) < 0.01) & (np.abs(actual) < 0.01))
+            summaries[name] = (group_sums(~np.isnan(actual)), group_sums(correct))
+        totals = np.diff(np.r_[starts, len(rows)])
         
-        for prediction in predictions:
-            # Simple accuracy check: if price moved in predicted direction
-            predicted_change = prediction.predicted_price - prediction.current_price
-            
-            # Get actual price after prediction (simplified)
-            actual_prices = StockPrice.query.filter(
-                StockPrice.stock_id == stock.id,
-                StockPrice.timestamp > prediction.prediction_date
-            ).first()
-            
-            if actual_prices:
-                actual_change = actual_prices.close_price - prediction.current_price
-                
-                # Check if prediction direction was correct
-                if (predicted_change > 0 and actual_change > 0) or \
-                   (predicted_change < 0 and actual_change < 0) or \
-                   (abs(predicted_change) < 0.01 and abs(actual_change) < 0.01):
-                    accurate_predictions += 1
+        def summary(name, group):
+            evaluated = int(summaries[name][0][group])
+            accurate = int(summaries[name][1][group])
+            return {
+                'accuracy_percent': round(accurate / evaluated * 100, 2) if evaluated else None,
+                'evaluated_predictions': evaluated,
+                'accurate_predictions': accurate
+            }
         
-        accuracy = (accurate_predictions / total_predictions) * 100 if total_predictions > 0 else 0
+        report = {}
+        for group, start in enumerate(starts):
+            report[str(symbol_column[start])] = {
+                **summary('next', group),
+                'total_predictions': int(totals[group]),
+                'period_days': days,
+                'horizons': {name: summary(name, group) for name in outcomes if name != 'next'}
+            }
+        return report
+    
+    def get_prediction_accuracy(self, symbol, days=30):
+        """Calculate prediction accuracy for a stock"""
+        return self.get_accuracy_report([symbol], days=days).get(symbol)
+    
+    def get_price_history(self, symbols=None):
+        """Load stored daily bars as {symbol: column arrays} in one query
+
+        Columns match the price store (timestamp in epoch days, open, high,
+        low, close, volume). Symbols stored at intraday intervals are read
+        from their daily rollups; otherwise when several rows fall on one day
+        the last wins.
+        """
+        daily = db.session.query(
+            Stock.symbol, PriceRollup.bucket, PriceRollup.open_price, PriceRollup.high_price,
+            PriceRollup.low_price, PriceRollup.close_price, PriceRollup.volume
+        ).join(Stock, PriceRollup.stock_id == Stock.id).filter(PriceRollup.resolution == '1d')
+        query = db.session.query(
+            Stock.symbol, StockPrice.timestamp, StockPrice.open_price, StockPrice.high_price,
+            StockPrice.low_price, StockPrice.close_price, StockPrice.volume
+        ).join(Stock, StockPrice.stock_id == Stock.id).filter(
+            StockPrice.stock_id.notin_(select(PriceRollup.stock_id).where(PriceRollup.resolution == '1d'))
+        )
+        if symbols:
+            daily = daily.filter(Stock.symbol.in_(list(symbols)))
+            query = query.filter(Stock.symbol.in_(list(symbols)))
+        # Each symbol comes from one of the two queries, so its rows stay contiguous
+        rows = daily.order_by(Stock.symbol, PriceRollup.bucket).all() + \
+            query.order_by(Stock.symbol, StockPrice.timestamp).all()
+        if not rows:
+            return {}
         
-        return {
-            'accuracy_percent': round(accuracy, 2),
-            'total_predictions': total_predictions,
-            'accurate_predictions': accurate_predictions,
-            'period_days': days
+        symbol_column, timestamps, opens, highs, lows, closes, volumes = zip(*rows)
+        symbol_column = np.array(symbol_column)
+        days = np.array(timestamps, dtype='datetime64[D]').astype(np.int64)
+        fields = {
+            'open': np.array(opens, dtype=np.float64),
+            'high': np.array(highs, dtype=np.float64),
+            'low': np.array(lows, dtype=np.float64),
+            'close': np.array(closes, dtype=np.float64),
+            'volume': np.array([volume or 0 for volume in volumes], dtype=np.int64)
         }
+        
+        # Last row of each (symbol, day) run
+        last = np.ones(len(days), dtype=bool)
+        last[:-1] = (days[1:] != days[:-1]) | (symbol_column[1:] != symbol_column[:-1])
+        symbol_column = symbol_column[last]
+        days = days[last]
+        fields = {name: values[last] for name, values in fields.items()}
+        
+        history = {}
+        boundaries = np.flatnonzero(symbol_column[1:] != symbol_column[:-1]) + 1
+        for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(days)]):
+            columns = {name: values[start:end] for name, values in fields.items()}
+            columns['timestamp'] = days[start:end]
+            history[str(symbol_column[start])] = columns
+        return history
+    
+    def get_daily_sentiment(self, symbols):
+        """Daily mean tweet sentiment per symbol and for the market, keyed by epoch day
+
+        Tweets are attributed to every symbol whose ticker (without the
+        exchange suffix) they mention; stored MarketSentiment readings count
+        towards the market series alongside all tweets.
+        """
+        tickers = {symbol.split('.')[0].upper(): symbol for symbol in symbols}
+        pattern = re.compile(r'\$?\b(' + '|'.join(re.escape(t) for t in sorted(tickers, key=len, reverse=True)) + r')\b') \
+            if tickers else None
+        epoch = date(1970, 1, 1)
+        symbol_totals = {}
+        market_totals = {}
+        
+        def add(totals, day, score):
+            total, count = totals.get(day, (0.0, 0))
+            totals[day] = (total + score, count + 1)
+        
+        rows = db.session.query(Tweet.tweet_created_at, Tweet.created_at, Tweet.text, Tweet.sentiment_score)\
+            .filter(Tweet.sentiment_score.isnot(None)).all()
+        for tweeted_at, saved_at, text, score in rows:
+            day = ((tweeted_at or saved_at).date() - epoch).days
+            add(market_totals, day, score)
+            if pattern is not None:
+                for ticker in set(pattern.findall(text.upper())):
+                    add(symbol_totals.setdefault(tickers[ticker], {}), day, score)
+        
+        for timestamp, score in db.session.query(MarketSentiment.timestamp, MarketSentiment.overall_score).all():
+            add(market_totals, (timestamp.date() - epoch).days, score)
+        
+        def means(totals):
+            return {day: total / count for day, (total, count) in totals.items()}
+        
+        return {symbol: means(totals) for symbol, totals in symbol_totals.items()}, means(market_totals)
     
     def save_market_sentiment(self, sentiment_data):
         """Save overall market sentiment"""
@@ -230,16 +859,116 @@ class DatabaseService:
         """Get top performing stocks from database"""
         return Stock.query.order_by(Stock.last_updated.desc()).limit(limit).all()
     
+    def _hot_reads(self, symbol):
+        """The time-series reads query_plans checks, as calls against one stored symbol"""
+        cutoff = datetime.utcnow() - timedelta(days=30)
+        return {
+            'price_bars': lambda: self.get_price_bars(symbol, start=cutoff, end=datetime.utcnow()),
+            'stock_predictions': lambda: self.get_stock_predictions(symbol),
+            'accuracy_report': lambda: self.get_accuracy_report([symbol]),
+            'accuracy_report_all': lambda: self.get_accuracy_report(),
+            'recent_tweets': lambda: self.get_recent_tweets(),
+            'market_sentiment_history': lambda: self.get_market_sentiment_history(),
+        }
+    
+    def _capture_reads(self):
+        """Run the hot reads and return [(name, statement, parameters)] for every SELECT they issue
+        
+        A probe stock is inserted so lookups by symbol go on to their bar and
+        prediction queries; the transaction is rolled back afterwards.
+        """
+        captured = []
+        current = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                captured.append((current[-1], statement, parameters))
+        
+        try:
+            db.session.add(Stock(symbol=QUERY_PLAN_PROBE, name=QUERY_PLAN_PROBE))
+            db.session.flush()
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                for name, read in self._hot_reads(QUERY_PLAN_PROBE).items():
+                    current.append(name)
+                    read()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+        finally:
+            db.session.rollback()
+        
+        unique = {}
+        for name, statement, parameters in captured:
+            unique.setdefault((name, statement), parameters)
+        return [(name, statement, parameters) for (name, statement), parameters in unique.items()]
+    
+    def query_plans(self):
+        """EXPLAIN every SELECT the hot reads issue and report whether it reads through an index
+        
+        The statements are captured from the service methods themselves, so
+        the check follows them as they change. Returns [{'name', 'sql',
+        'uses_index', 'plan'}], one per distinct statement. On PostgreSQL
+        sequential scans are disabled for the check, so small tables do not
+        hide a missing index behind a cheaper seq scan.
+        """
+        dialect = db.engine.dialect
+        if dialect.name == 'sqlite':
+            prefix = 'EXPLAIN QUERY PLAN '
+        elif dialect.name == 'postgresql':
+            prefix = 'EXPLAIN '
+        else:
+            raise ValueError(f"Query plans are not supported for {dialect.name}")
+        
+        statements = self._capture_reads()
+        results = []
+        connection = db.engine.connect()
+        try:
+            if dialect.name == 'postgresql':
+                connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+            for name, statement, parameters in statements:
+                rows = connection.exec_driver_sql(prefix + statement, parameters).all()
+                if dialect.name == 'sqlite':
+                    plan = [row[-1] for row in rows]
+                    # 'SCAN table' without USING ... INDEX reads every row
+                    full_scan = any(line.startswith('SCAN ') and ' USING ' not in line for line in plan)
+                else:
+                    plan = [row[0] for row in rows]
+                    full_scan = any('Seq Scan' in line for line in plan)
+                results.append({'name': name, 'sql': statement, 'uses_index': not full_scan, 'plan': plan})
+        finally:
+            connection.rollback()
+            if dialect.name == 'sqlite':
+                # Cached EXPLAIN statements are never re-planned after a schema change; drop them
+                connection.invalidate()
+            connection.close()
+        return results
+    
     def cleanup_old_data(self, days=90):
         """Clean up old data to keep database size manageable"""
         try:
             cutoff_date = datetime.utcnow() - timedelta(days=days)
             
+            # Finest rollup resolution of each stock with buckets before the cutoff
+            finest = {}
+            resolutions = db.session.query(PriceRollup.stock_id, PriceRollup.resolution)\
+                .filter(PriceRollup.bucket < cutoff_date).distinct().all()
+            for stock_id, resolution in resolutions:
+                if stock_id not in finest or ROLLUP_RESOLUTIONS[resolution] < ROLLUP_RESOLUTIONS[finest[stock_id]]:
+                    finest[stock_id] = resolution
+            
             # Clean old stock prices (keep more recent data)
             old_prices = StockPrice.query.filter(
                 StockPrice.timestamp < cutoff_date
             ).delete()
             
+            # Drop their rollups too, then rebuild the buckets the cutoff splits from the bars left in them
+            PriceRollup.query.filter(PriceRollup.bucket < cutoff_date).delete()
+            levels = list(ROLLUP_RESOLUTIONS)
+            cutoff = np.datetime64(cutoff_date, 'us')
+            for stock_id, resolution in finest.items():
+                # Rebuild that resolution and the coarser ones, as for bars one level finer
+                self._update_rollups(stock_id, cutoff, cutoff, interval=levels[levels.index(resolution) - 1])
+            
             # Clean old tweets
             old_tweets = Tweet.query.filter(
                 Tweet.created_at < cutoff_date
@@ -0,0 +1,69 @@
+import numpy as np
+
+
+class MonteCarloForecaster:
+    """Forecast price distributions by simulating paths from historical daily log returns
+
+    'bootstrap' resamples the observed returns, keeping their fat tails;
+    'gbm' draws normal returns with the same mean and volatility. All paths
+    and horizons come from one (paths x longest horizon) draw.
+    """
+
+    def __init__(self, paths=2000, horizons=(1, 5, 20), percentiles=(5, 25, 50, 75, 95), lookback=250,
+                 method='bootstrap'):
+        self.paths = paths
+        self.horizons = tuple(sorted(horizons))
+        self.percentiles = percentiles
+        self.lookback = lookback  # Trailing returns sampled from, about a year of daily bars
+        self.min_returns = 20  # Fewer returns than this give no meaningful distribution
+        self.method = method
+
+    def log_returns(self, close):
+        close = np.asarray(close, dtype=np.float64)[-(self.lookback + 1):]
+        close = close[np.isfinite(close) & (close > 0)]
+        return np.diff(np.log(close))
+
+    def simulate(self, returns, seed=None):
+        """Cumulative log returns at each horizon, shape (paths, horizons)"""
+        rng = np.random.default_rng(seed)
+        steps = self.horizons[-1]
+        if self.method == 'bootstrap':
+            draws = returns[rng.integers(0, len(returns), size=(self.paths, steps))]
+        elif self.method == 'gbm':
+            draws = rng.normal(returns.mean(), returns.std(), size=(self.paths, steps))
+        else:
+            raise ValueError(f"Unsupported forecast method: {self.method}")
+        return np.cumsum(draws, axis=1)[:, np.asarray(self.horizons) - 1]
+
+    def forecast(self, close, current_price=None, seed=None):
+        """Percentile bands, expected price and probability of an up move per horizon
+
+        Returns None when there is not enough history to sample from.
+        """
+        returns = self.log_returns(close)
+        if len(returns) < self.min_returns:
+            return None
+        if current_price is None:
+            current_price = float(np.asarray(close, dtype=np.float64)[-1])
+
+        cumulative = self.simulate(returns, seed)
+        prices = current_price * np.exp(cumulative)
+        bands = np.percentile(prices, self.percentiles, axis=0)
+        expected = prices.mean(axis=0)
+        prob_up = (cumulative > 0).mean(axis=0)
+
+        horizons = {}
+        for i, horizon in enumerate(self.horizons):
+            horizons[f'{horizon}d'] = {
+                'percentiles': {f'p{p}': round(float(bands[j, i]), 2) for j, p in enumerate(self.percentiles)},
+                'expected_price': round(float(expected[i]), 2),
+                'expected_change_percent': round((float(expected[i]) / current_price - 1) * 100, 2),
+                'prob_up': round(float(prob_up[i]), 4)
+            }
+        return {
+            'method': self.method,
+            'paths': self.paths,
+            'returns_sampled': len(returns),
+            'daily_volatility': round(float(returns.std()) * 100, 3),
+            'horizons': horizons
+        }
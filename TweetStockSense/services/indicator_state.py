@@ -0,0 +1,259 @@
+import math
+from collections import deque
+
+FAST_PERIOD = 12
+SLOW_PERIOD = 26
+SIGNAL_PERIOD = 9
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+BOLLINGER_WINDOW = 20
+BOLLINGER_STD = 2
+VOLUME_WINDOW = 20
+VOLATILITY_WINDOW = 20
+SMA_WINDOWS = (5, 10)
+TREND_SHORT = 5
+TREND_MEDIUM = 20
+
+
+class _RollingWindow:
+    """Fixed-size window keeping a running sum and sum of squares
+
+    Values are stored relative to a reference (the first value seen) so the
+    sum-of-squares variance keeps its precision, as in indicators.rolling_std.
+    """
+
+    def __init__(self, size, reference=None, values=(), total=0.0, total_sq=0.0):
+        self.size = size
+        self.reference = reference
+        self.values = deque(values, maxlen=size)
+        self.total = total
+        self.total_sq = total_sq
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    def push(self, value):
+        if self.reference is None:
+            self.reference = value
+        shifted = value - self.reference
+        if self.full:
+            oldest = self.values[0]
+            self.total -= oldest
+            self.total_sq -= oldest * oldest
+        self.values.append(shifted)
+        self.total += shifted
+        self.total_sq += shifted * shifted
+
+    def mean(self):
+        return self.total / self.size + self.reference if self.full else math.nan
+
+    def std(self):
+        if not self.full:
+            return math.nan
+        mean = self.total / self.size
+        return math.sqrt(max(self.total_sq / self.size - mean * mean, 0.0))
+
+    def to_dict(self):
+        return {
+            'size': self.size,
+            'reference': self.reference,
+            'values': list(self.values),
+            'total': self.total,
+            'total_sq': self.total_sq
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['size'], data['reference'], data['values'], data['total'], data['total_sq'])
+
+
+class _Wilder:
+    """Wilder average: the plain mean of the first period values, then alpha = 1/period"""
+
+    def __init__(self, period, seen=0, total=0.0, value=None):
+        self.period = period
+        self.seen = seen
+        self.total = total
+        self.value = value
+
+    def push(self, x):
+        if self.value is not None:
+            self.value += (x - self.value) / self.period
+            return
+        self.seen += 1
+        self.total += x
+        if self.seen == self.period:
+            self.value = self.total / self.period
+
+    def to_dict(self):
+        return {'period': self.period, 'seen': self.seen, 'total': self.total, 'value': self.value}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['period'], data['seen'], data['total'], data['value'])
+
+
+class IndicatorState:
+    """Per-symbol running indicator state updated in O(1) per bar
+
+    Feeding the same daily bars gives the same values as
+    indicators.compute_indicators over those bars. A bar for the same day as
+    the last one (an intraday tick) replaces it rather than adding a new bar.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.last_day = None
+        self.last_close = None
+        self.last_volume = 0.0
+        self.ema_fast = None
+        self.ema_slow = None
+        self.macd_signal = None
+        self.avg_gain = _Wilder(RSI_PERIOD)
+        self.avg_loss = _Wilder(RSI_PERIOD)
+        self.atr = _Wilder(ATR_PERIOD)
+        self.sma = {window: _RollingWindow(window) for window in SMA_WINDOWS}
+        self.bollinger = _RollingWindow(BOLLINGER_WINDOW)
+        self.returns = _RollingWindow(VOLATILITY_WINDOW)
+        self.volumes = _RollingWindow(VOLUME_WINDOW, reference=0.0)
+        self.closes = deque(maxlen=TREND_MEDIUM + 1)  # Enough to look TREND_MEDIUM bars back
+        self._previous = None  # State before the last bar, restored when that bar is revised
+
+    def update(self, day, close, volume=0, high=None, low=None):
+        """Apply one daily bar; returns False for bars older than the last one"""
+        if self.last_day is not None and day < self.last_day:
+            return False
+        if self.last_day is not None and day == self.last_day:
+            self._load(self._previous)
+        else:
+            self._previous = self._dump()
+        self._apply(float(close), float(volume or 0), high, low)
+        self.last_day = day
+        return True
+
+    def extend(self, columns):
+        """Apply every bar from store column arrays (timestamp, close, volume, high, low)"""
+        for day, close, volume, high, low in zip(
+            columns['timestamp'].tolist(), columns['close'].tolist(), columns['volume'].tolist(),
+            columns['high'].tolist(), columns['low'].tolist()
+        ):
+            self.update(day, close, volume, high, low)
+
+    def _apply(self, close, volume, high, low):
+        high = close if high is None else float(high)
+        low = close if low is None else float(low)
+
+        if self.count == 0:
+            self.ema_fast = self.ema_slow = close
+            self.macd_signal = 0.0
+            true_range = high - low
+        else:
+            prev = self.last_close
+            self.ema_fast += 2 / (FAST_PERIOD + 1) * (close - self.ema_fast)
+            self.ema_slow += 2 / (SLOW_PERIOD + 1) * (close - self.ema_slow)
+            self.macd_signal += 2 / (SIGNAL_PERIOD + 1) * (self.ema_fast - self.ema_slow - self.macd_signal)
+
+            delta = close - prev
+            self.avg_gain.push(max(delta, 0.0))
+            self.avg_loss.push(max(-delta, 0.0))
+            self.returns.push(close / prev - 1)
+            true_range = max(high - low, abs(high - prev), abs(low - prev))
+
+        self.atr.push(true_range)
+        for window in self.sma.values():
+            window.push(close)
+        self.bollinger.push(close)
+        self.volumes.push(volume)
+        self.closes.append(close)
+        self.last_close = close
+        self.last_volume = volume
+        self.count += 1
+
+    def values(self):
+        """Latest indicator readings, keyed like indicators.compute_indicators"""
+        if self.count == 0:
+            return {}
+        close = self.last_close
+        macd_line = self.ema_fast - self.ema_slow
+        middle = self.bollinger.mean()
+        width = self.bollinger.std() * BOLLINGER_STD
+
+        gain, loss = self.avg_gain.value, self.avg_loss.value
+        if gain is None:
+            rsi = math.nan
+        elif loss == 0:
+            rsi = 50.0 if gain == 0 else 100.0
+        else:
+            rsi = 100 - 100 / (1 + gain / loss)
+
+        average_volume = self.volumes.mean()
+        return {
+            'close': close,
+            'ma_5': self.sma[5].mean(),
+            'ma_10': self.sma[10].mean(),
+            'ma_20': middle,
+            'ema_12': self.ema_fast,
+            'ema_26': self.ema_slow,
+            'rsi': rsi,
+            'macd': macd_line,
+            'macd_signal': self.macd_signal,
+            'macd_histogram': macd_line - self.macd_signal,
+            'bollinger_upper': middle + width,
+            'bollinger_middle': middle,
+            'bollinger_lower': middle - width,
+            'volatility': self.returns.std(),
+            'trend_short': close / self.closes[-TREND_SHORT - 1] - 1 if len(self.closes) > TREND_SHORT else math.nan,
+            'trend_medium': close / self.closes[-TREND_MEDIUM - 1] - 1 if len(self.closes) > TREND_MEDIUM else math.nan,
+            'volume_ratio': self.last_volume / average_volume if average_volume > 0 else math.nan,
+            'atr': self.atr.value if self.atr.value is not None else math.nan
+        }
+
+    def _dump(self):
+        return {
+            'count': self.count,
+            'last_day': self.last_day,
+            'last_close': self.last_close,
+            'last_volume': self.last_volume,
+            'ema_fast': self.ema_fast,
+            'ema_slow': self.ema_slow,
+            'macd_signal': self.macd_signal,
+            'avg_gain': self.avg_gain.to_dict(),
+            'avg_loss': self.avg_loss.to_dict(),
+            'atr': self.atr.to_dict(),
+            'sma': {str(window): rolling.to_dict() for window, rolling in self.sma.items()},
+            'bollinger': self.bollinger.to_dict(),
+            'returns': self.returns.to_dict(),
+            'volumes': self.volumes.to_dict(),
+            'closes': list(self.closes)
+        }
+
+    def _load(self, data):
+        self.count = data['count']
+        self.last_day = data['last_day']
+        self.last_close = data['last_close']
+        self.last_volume = data['last_volume']
+        self.ema_fast = data['ema_fast']
+        self.ema_slow = data['ema_slow']
+        self.macd_signal = data['macd_signal']
+        self.avg_gain = _Wilder.from_dict(data['avg_gain'])
+        self.avg_loss = _Wilder.from_dict(data['avg_loss'])
+        self.atr = _Wilder.from_dict(data['atr'])
+        self.sma = {int(window): _RollingWindow.from_dict(rolling) for window, rolling in data['sma'].items()}
+        self.bollinger = _RollingWindow.from_dict(data['bollinger'])
+        self.returns = _RollingWindow.from_dict(data['returns'])
+        self.volumes = _RollingWindow.from_dict(data['volumes'])
+        self.closes = deque(data['closes'], maxlen=TREND_MEDIUM + 1)
+
+    def to_dict(self):
+        """JSON-serializable state, including what is needed to revise the last bar"""
+        data = self._dump()
+        data['previous'] = self._previous
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state._load(data)
+        state._previous = data.get('previous')
+        return state
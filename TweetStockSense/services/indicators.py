@@ -0,0 +1,262 @@
+import numpy as np
+
+# Every function works along axis 0, so a 1-D price series and a 2-D
+# (days x symbols) matrix are handled the same way. Each returns a full
+# series the same length as its input, NaN where the window is not yet full.
+
+# _recursive solves blocks over which the decay factor falls by at most this much,
+# keeping 1 / decay**k far inside float64 range and rounding error negligible
+_BLOCK_DECAY = 1e-30
+
+
+def _as_array(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+def _recursive(x, alpha, seed):
+    """y[t] = alpha * x[t] + (1 - alpha) * y[t-1], with y[-1] = seed
+
+    Vectorized by the closed form y[t] = d**t * (d * seed + alpha * sum(x[k] / d**k for k <= t))
+    with d = 1 - alpha, evaluated with a cumulative sum over blocks of rows.
+    """
+    decay = 1 - alpha
+    if len(x) == 0 or decay <= 0:
+        return x.copy()
+    block = max(1, min(len(x), int(np.log(_BLOCK_DECAY) / np.log(decay))))
+    powers = (decay ** np.arange(block)).reshape((-1,) + (1,) * (x.ndim - 1))
+    y = np.empty_like(x)
+    prev = np.asarray(seed, dtype=np.float64)
+    for start in range(0, len(x), block):
+        chunk = x[start:start + block]
+        scale = powers[:len(chunk)]
+        y[start:start + len(chunk)] = scale * (decay * prev + alpha * np.cumsum(chunk / scale, axis=0))
+        prev = y[start + len(chunk) - 1]
+    return y
+
+
+def sma(values, window):
+    """Simple moving average from cumulative sums"""
+    x = _as_array(values)
+    out = np.full_like(x, np.nan)
+    if window <= 0 or len(x) < window:
+        return out
+    csum = np.cumsum(x, axis=0)
+    out[window - 1] = csum[window - 1]
+    out[window:] = csum[window:] - csum[:-window]
+    out[window - 1:] /= window
+    return out
+
+
+def ema(values, window):
+    """Exponential moving average seeded with the first value"""
+    x = _as_array(values)
+    if len(x) == 0:
+        return x.copy()
+    return _recursive(x, 2 / (window + 1), x[0])
+
+
+def wilder(values, window):
+    """Wilder smoothing: seeded with the mean of the first window values, then alpha = 1/window"""
+    x = _as_array(values)
+    out = np.full_like(x, np.nan)
+    if len(x) < window:
+        return out
+    out[window - 1] = x[:window].mean(axis=0)
+    out[window:] = _recursive(x[window:], 1 / window, out[window - 1])
+    return out
+
+
+def rsi(close, window=14):
+    """Wilder relative strength index (0-100)"""
+    x = _as_array(close)
+    out = np.full_like(x, np.nan)
+    if len(x) < window + 1:
+        return out
+    deltas = np.diff(x, axis=0)
+    avg_gain = wilder(np.clip(deltas, 0, None), window)
+    avg_loss = wilder(np.clip(-deltas, 0, None), window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = 100 - 100 / (1 + avg_gain / avg_loss)
+    values = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), values)
+    out[1:] = np.where(np.isnan(avg_gain), np.nan, values)
+    return out
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """MACD line, its signal-period EMA and the histogram"""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def rolling_std(values, window):
+    """Population standard deviation over a trailing window"""
+    x = _as_array(values)
+    out = np.full_like(x, np.nan)
+    if len(x) < window:
+        return out
+    # Shift by the first value so the sum-of-squares difference does not lose precision
+    shifted = x - x[0]
+    mean = sma(shifted, window)
+    mean_sq = sma(shifted ** 2, window)
+    return np.sqrt(np.clip(mean_sq - mean ** 2, 0, None))
+
+
+def bollinger_bands(close, window=20, num_std=2):
+    """Upper, middle and lower Bollinger bands"""
+    middle = sma(close, window)
+    width = rolling_std(close, window) * num_std
+    return middle + width, middle, middle - width
+
+
+def true_range(high, low, close):
+    """Largest of the bar range and the gaps from the previous close"""
+    high = _as_array(high)
+    low = _as_array(low)
+    close = _as_array(close)
+    tr = high - low
+    if len(close) > 1:
+        prev_close = close[:-1]
+        tr[1:] = np.maximum(tr[1:], np.maximum(np.abs(high[1:] - prev_close), np.abs(low[1:] - prev_close)))
+    return tr
+
+
+def atr(high, low, close, window=14):
+    """Average true range with Wilder smoothing"""
+    return wilder(true_range(high, low, close), window)
+
+
+def pct_change(values, periods=1):
+    """Fractional change over the given number of bars"""
+    x = _as_array(values)
+    out = np.full_like(x, np.nan)
+    if len(x) > periods:
+        out[periods:] = x[periods:] / x[:-periods] - 1
+    return out
+
+
+def volatility(close, window=None):
+    """Standard deviation of daily returns, over the whole series or a trailing window"""
+    returns = pct_change(close)[1:]
+    if window is None:
+        return np.std(returns, axis=0) if len(returns) else np.zeros(np.shape(close)[1:])
+    out = np.full_like(_as_array(close), np.nan)
+    out[1:] = rolling_std(returns, window)
+    return out
+
+
+def volume_ratio(volume, window=20):
+    """Volume relative to its trailing average"""
+    v = _as_array(volume)
+    average = sma(v, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(average > 0, v / average, np.nan)
+
+
+def compute_indicators(close, volume=None, high=None, low=None):
+    """Compute every indicator used for scoring as full series in one pass"""
+    close = _as_array(close)
+    macd_line, macd_signal, macd_histogram = macd(close)
+    upper, middle, lower = bollinger_bands(close)
+    indicators = {
+        'close': close,
+        'ma_5': sma(close, 5),
+        'ma_10': sma(close, 10),
+        'ma_20': sma(close, 20),
+        'ema_12': ema(close, 12),
+        'ema_26': ema(close, 26),
+        'rsi': rsi(close),
+        'macd': macd_line,
+        'macd_signal': macd_signal,
+        'macd_histogram': macd_histogram,
+        'bollinger_upper': upper,
+        'bollinger_middle': middle,
+        'bollinger_lower': lower,
+        'volatility': volatility(close, window=20),
+        'trend_short': pct_change(close, 5),
+        'trend_medium': pct_change(close, 20),
+    }
+    if volume is not None:
+        indicators['volume_ratio'] = volume_ratio(volume)
+    if high is not None and low is not None:
+        indicators['atr'] = atr(high, low, close)
+    return indicators
+
+
+def pivot_points(high, low, order=3):
+    """Boolean masks of pivot highs and lows: bars that are the extreme of the order bars either side"""
+    high = _as_array(high)
+    low = _as_array(low)
+    is_high = np.zeros(high.shape, dtype=bool)
+    is_low = np.zeros(low.shape, dtype=bool)
+    span = 2 * order + 1
+    if len(high) < span:
+        return is_high, is_low
+    # Windows are laid out along a new last axis; row i covers bars i .. i + 2*order
+    high_windows = np.lib.stride_tricks.sliding_window_view(high, span, axis=0)
+    low_windows = np.lib.stride_tricks.sliding_window_view(low, span, axis=0)
+    is_high[order:-order] = high[order:-order] == high_windows.max(axis=-1)
+    is_low[order:-order] = low[order:-order] == low_windows.min(axis=-1)
+    return is_high, is_low
+
+
+def cluster_levels(prices, positions, tolerance=0.015):
+    """Group pivot prices within tolerance (fractional gap) into levels
+
+    Returns (level prices, touch counts, most recent position) per cluster.
+    """
+    prices = _as_array(prices)
+    if len(prices) == 0:
+        return np.empty(0), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    order = np.argsort(prices, kind='stable')
+    prices = prices[order]
+    positions = np.asarray(positions)[order]
+    # A new run starts wherever the gap to the previous pivot exceeds the tolerance;
+    # dense runs are then cut into bands no wider than the tolerance from their lowest pivot
+    run = np.concatenate([[0], np.cumsum(np.diff(prices) > tolerance * prices[:-1])])
+    run_start = prices[np.searchsorted(run, run)]
+    band = np.floor(np.log(prices / run_start) / np.log1p(tolerance)).astype(np.int64)
+    # Prices are sorted, so (run, band) pairs are too: number them where either changes
+    cluster = np.concatenate([[0], np.cumsum((np.diff(run) != 0) | (np.diff(band) != 0))])
+    touches = np.bincount(cluster)
+    levels = np.bincount(cluster, weights=prices) / touches
+    last_touch = np.full(len(touches), -1, dtype=np.int64)
+    np.maximum.at(last_touch, cluster, positions)
+    return levels, touches, last_touch
+
+
+def support_resistance_levels(high, low, price, order=3, lookback=None, tolerance=0.015, max_levels=3,
+                              pivots=None):
+    """Ranked support and resistance levels for one series
+
+    Pivot highs and lows over the lookback are clustered into levels; levels
+    below price are support, above are resistance. Each side is ranked by
+    touch count, then by how recently the level was touched.
+    """
+    high = _as_array(high)
+    low = _as_array(low)
+    if lookback:
+        high = high[-lookback:]
+        low = low[-lookback:]
+    is_high, is_low = pivots if pivots is not None else pivot_points(high, low, order)
+    if lookback and pivots is not None:
+        is_high, is_low = is_high[-lookback:], is_low[-lookback:]
+
+    high_positions = np.flatnonzero(is_high)
+    low_positions = np.flatnonzero(is_low)
+    levels, touches, last_touch = cluster_levels(
+        np.concatenate([high[high_positions], low[low_positions]]),
+        np.concatenate([high_positions, low_positions]),
+        tolerance
+    )
+
+    def ranked(mask):
+        index = np.flatnonzero(mask)
+        # lexsort keys run last-first: most touches, then most recent
+        index = index[np.lexsort((-last_touch[index], -touches[index]))][:max_levels]
+        return [
+            {'price': float(levels[i]), 'touches': int(touches[i]), 'bars_ago': int(len(high) - 1 - last_touch[i])}
+            for i in index
+        ]
+
+    return {'support': ranked(levels < price), 'resistance': ranked(levels > price)}
@@ -0,0 +1,119 @@
+import logging
+from datetime import datetime
+import numpy as np
+from sklearn.linear_model import RidgeCV
+from services import indicators
+from services.prediction_service import score_indicators, MODEL_VERSION
+from services.prediction_model import FEATURES, save_model
+from services.price_store import from_day
+
+# Offline training pipeline; imports scikit-learn, so keep it off the request path
+
+
+def sentiment_series(days, symbol_sentiment, market_sentiment, default=50.0):
+    """Sentiment per bar: the symbol's daily mean, else the market's, else neutral"""
+    return np.array([
+        symbol_sentiment.get(day, market_sentiment.get(day, default)) for day in days.tolist()
+    ], dtype=np.float64)
+
+
+def build_dataset(prediction_service, history, symbol_sentiment, market_sentiment, horizon):
+    """Feature rows, forward returns over horizon bars, and bar days for every symbol
+
+    Features come from score_indicators, exactly as they are computed when
+    serving, so the model sees the same inputs in training and production.
+    """
+    warmup = prediction_service.min_data_points
+    features, targets, days = [], [], []
+    for symbol, columns in history.items():
+        close = np.asarray(columns['close'], dtype=np.float64)
+        n = len(close)
+        if n <= warmup + horizon:
+            continue
+        series = indicators.compute_indicators(close, columns['volume'], columns['high'], columns['low'])
+        sentiment = sentiment_series(columns['timestamp'], symbol_sentiment.get(symbol, {}), market_sentiment)
+        scored = score_indicators(series, sentiment, prediction_service.weights,
+                                  prediction_service.default_prediction_window,
+                                  data_points=np.arange(1, n + 1), with_features=True)
+
+        rows = slice(warmup - 1, n - horizon)
+        features.append(np.column_stack([
+            np.broadcast_to(scored['features'][name], close.shape)[rows] for name in FEATURES
+        ]))
+        targets.append(close[warmup - 1 + horizon:] / close[rows] - 1)
+        days.append(np.asarray(columns['timestamp'])[rows])
+
+    if not features:
+        return np.empty((0, len(FEATURES))), np.empty(0), np.empty(0, dtype=np.int64)
+    return np.concatenate(features), np.concatenate(targets), np.concatenate(days)
+
+
+def _fit(features, targets, alphas):
+    """Standardize, then fit ridge regression with the penalty chosen by cross-validation"""
+    mean = features.mean(axis=0)
+    scale = features.std(axis=0)
+    scale[scale == 0] = 1.0
+    model = RidgeCV(alphas=alphas).fit((features - mean) / scale, targets)
+    return mean, scale, model
+
+
+def _evaluate(features, targets, mean, scale, model):
+    predicted = model.predict((features - mean) / scale)
+    residual = targets - predicted
+    variance = np.var(targets)
+    return {
+        'samples': int(len(targets)),
+        'r2': round(float(1 - np.var(residual) / variance), 4) if variance else None,
+        'mae': round(float(np.mean(np.abs(residual))), 6),
+        'direction_accuracy': round(float(np.mean(np.sign(predicted) == np.sign(targets))) * 100, 2)
+    }
+
+
+def train_model(prediction_service, database_service, horizon=5, validation_fraction=0.2,
+                alphas=(0.1, 1.0, 10.0, 100.0), version=None, refit=True):
+    """Train on stored StockPrice bars and tweet sentiment, then save a versioned artifact
+
+    The most recent validation_fraction of days is held out to report
+    out-of-sample metrics. With refit the saved model is then refitted on
+    all days; without, the model fitted before the held-out days is saved,
+    so they stay out of sample. The artifact records the days it was fitted
+    on as training_window, and backtests only score bars after it.
+    """
+    history = database_service.get_price_history()
+    symbol_sentiment, market_sentiment = database_service.get_daily_sentiment(list(history))
+    features, targets, days = build_dataset(prediction_service, history, symbol_sentiment,
+                                            market_sentiment, horizon)
+    if len(targets) < 100:
+        raise ValueError(f"Not enough training rows ({len(targets)}); ingest more price history first")
+
+    # Time-ordered split: validate on the most recent days only
+    cutoff = np.quantile(days, 1 - validation_fraction)
+    train = days < cutoff
+    mean, scale, model = _fit(features[train], targets[train], alphas)
+    validation = _evaluate(features[~train], targets[~train], mean, scale, model)
+    logging.info(f"Validation metrics: {validation}")
+
+    fitted = np.ones(len(days), dtype=bool) if refit else train
+    if refit:
+        mean, scale, model = _fit(features, targets, alphas)
+    version = version or datetime.utcnow().strftime('%Y%m%d%H%M%S')
+    meta = {
+        'trained_at': datetime.utcnow().isoformat(),
+        'rules_version': MODEL_VERSION,
+        'horizon': horizon,
+        'alpha': float(model.alpha_),
+        'symbols': len(history),
+        'samples': int(fitted.sum()),
+        'refit': refit,
+        'training_window': {
+            'start': from_day(days[fitted].min()).isoformat(),
+            'end': from_day(days[fitted].max()).isoformat()
+        },
+        'metrics': {
+            'validation': validation,
+            'train': _evaluate(features[fitted], targets[fitted], mean, scale, model)
+        }
+    }
+    path = save_model(version, FEATURES, mean, scale, model.coef_, model.intercept_, meta)
+    logging.info(f"Saved prediction model {version} to {path}")
+    return {**meta, 'version': version, 'path': path}
@@ -0,0 +1,105 @@
+import os
+import json
+import shutil
+import logging
+from datetime import date
+import numpy as np
+from services.price_store import to_day
+
+# Kept free of training dependencies: this module is imported on the request path
+
+DEFAULT_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'models'
+)
+
+# Feature order used by every artifact; produced by prediction_service.score_indicators
+FEATURES = (
+    'trend', 'momentum', 'mean_reversion', 'sentiment',
+    'rsi', 'volatility', 'volume_ratio', 'trend_short', 'trend_medium'
+)
+
+LATEST_FILE = 'LATEST'
+
+
+class PredictionModel:
+    """Standardized linear model over score_indicators features, loaded through memory maps"""
+
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.path = path
+        self.meta = meta
+        self.version = meta['version']
+        self.features = tuple(meta['features'])
+        self.intercept = float(meta['intercept'])
+        self.mean = np.load(os.path.join(path, 'mean.npy'), mmap_mode='r')
+        self.scale = np.load(os.path.join(path, 'scale.npy'), mmap_mode='r')
+        self.coef = np.load(os.path.join(path, 'coef.npy'), mmap_mode='r')
+        if not (len(self.features) == len(self.mean) == len(self.scale) == len(self.coef)):
+            raise ValueError(f"Model {self.version} has mismatched feature arrays")
+        # Epoch day of the last bar the model was fitted on; None for artifacts that predate the record
+        window = meta.get('training_window')
+        self.trained_through = to_day(date.fromisoformat(window['end'])) if window else None
+
+    def predict(self, features):
+        """Predicted fractional price change for a features dict of equally shaped arrays"""
+        matrix = np.stack([np.asarray(features[name], dtype=np.float64) for name in self.features], axis=-1)
+        return ((matrix - self.mean) / self.scale) @ self.coef + self.intercept
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'trained_at': self.meta.get('trained_at'),
+            'horizon': self.meta.get('horizon'),
+            'samples': self.meta.get('samples'),
+            'training_window': self.meta.get('training_window'),
+            'metrics': self.meta.get('metrics')
+        }
+
+
+def model_root():
+    return os.environ.get('PREDICTION_MODEL_PATH', DEFAULT_MODEL_PATH)
+
+
+def save_model(version, features, mean, scale, coef, intercept, meta=None, root=None):
+    """Write a versioned artifact directory and point LATEST at it"""
+    root = root or model_root()
+    path = os.path.join(root, version)
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    np.save(os.path.join(tmp_path, 'mean.npy'), np.asarray(mean, dtype=np.float64))
+    np.save(os.path.join(tmp_path, 'scale.npy'), np.asarray(scale, dtype=np.float64))
+    np.save(os.path.join(tmp_path, 'coef.npy'), np.asarray(coef, dtype=np.float64))
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump({**(meta or {}), 'version': version, 'features': list(features), 'intercept': float(intercept)},
+                  f, indent=2)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+    latest_tmp = os.path.join(root, LATEST_FILE + '.tmp')
+    with open(latest_tmp, 'w') as f:
+        f.write(version)
+    os.replace(latest_tmp, os.path.join(root, LATEST_FILE))
+    return path
+
+
+def load_model(version=None, root=None):
+    """Load a model artifact (PREDICTION_MODEL_VERSION, else LATEST); None if there is none"""
+    root = root or model_root()
+    version = version or os.environ.get('PREDICTION_MODEL_VERSION')
+    try:
+        if not version:
+            with open(os.path.join(root, LATEST_FILE)) as f:
+                version = f.read().strip()
+        model = PredictionModel(os.path.join(root, version))
+        logging.info(f"Loaded prediction model {model.version}")
+        return model
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.error(f"Error loading prediction model {version}: {str(e)}")
+        return None
@@ -1,39 +1,145 @@
 import logging
+import math
+import threading
+import zlib
 import numpy as np
-from datetime import datetime, timedelta
 from services.stock_service import StockService
+from services.cache import get_cache, NEGATIVE
+from services import indicators
+from services.indicator_state import IndicatorState
+from services.prediction_model import load_model
+from services.forecast import MonteCarloForecaster
 
-class PredictionService:
-    def __init__(self):
-        self.stock_service = StockService()
-        self.min_data_points = 30  # Minimum data points needed for reliable predictions
-        self.default_prediction_window = 7  # Default prediction window in days
-        self.cache = {}
-        self.cache_timeout = 300  # 5 minutes
+# Bump whenever scoring changes, so memoized predictions from the old logic are not served
+MODEL_VERSION = 'rules-2'
+
+def score_indicators(values, sentiment_score, weights, prediction_window, current_price=None, data_points=None,
+                     model=None, with_features=False):
+    """Turn indicator values into a predicted change, confidence and buy/sell signal counts
+
+    Works elementwise, so values may hold the latest reading for one symbol,
+    one reading per symbol, or whole series for backtesting. Kept at module
+    level so batch worker processes can score without a PredictionService.
+    With a trained model the predicted change comes from the model instead
+    of the weighted factors; with_features also returns the model inputs.
+    """
+    close = np.asarray(values['close'], dtype=np.float64)
+    price = close if current_price is None else np.asarray(current_price, dtype=np.float64)
+    sentiment = np.asarray(sentiment_score, dtype=np.float64)
     
-    def _is_cached(self, key):
-        """Check if data is in cache and not expired"""
-        if key not in self.cache:
-            return False
-            
-        if 'timestamp' not in self.cache[key]:
-            return False
-            
-        elapsed = (datetime.now() - self.cache[key]['timestamp']).total_seconds()
-        return elapsed < self.cache_timeout
+    # Indicators whose window is not full yet fall back to neutral readings
+    ma_5 = np.where(np.isnan(values['ma_5']), price, values['ma_5'])
+    ma_10 = np.where(np.isnan(values['ma_10']), price, values['ma_10'])
+    ma_20 = np.where(np.isnan(values['ma_20']), price, values['ma_20'])
+    middle = np.where(np.isnan(values['bollinger_middle']), price, values['bollinger_middle'])
+    upper = np.where(np.isnan(values['bollinger_upper']), price, values['bollinger_upper'])
+    lower = np.where(np.isnan(values['bollinger_lower']), price, values['bollinger_lower'])
+    rsi = np.nan_to_num(values['rsi'], nan=50.0)
+    volatility = np.nan_to_num(values['volatility'])
+    short_trend = np.nan_to_num(values['trend_short'])
+    volume_ratio = np.nan_to_num(values.get('volume_ratio', 1.0), nan=1.0)
+    medium_trend = np.nan_to_num(values['trend_medium'])
+    
+    # Prediction factors, each a fractional price move over the prediction window
+    horizon_volatility = volatility * np.sqrt(prediction_window)
+    factors = {
+        'trend': (ma_5 - ma_20) / ma_20,
+        'momentum': np.nan_to_num(values['macd_histogram']) / price,
+        'mean_reversion': (middle - price) / price,
+        'sentiment': (sentiment - 50) / 50 * horizon_volatility
+    }
+    features = {
+        **factors,
+        'rsi': (rsi - 50) / 50,
+        'volatility': volatility,
+        'volume_ratio': volume_ratio - 1,
+        'trend_short': short_trend,
+        'trend_medium': medium_trend
+    }
+    if model is not None:
+        # Scalars such as a shared sentiment score are broadcast to the indicator shape
+        predicted_change = model.predict(dict(zip(features, np.broadcast_arrays(*features.values()))))
+    else:
+        predicted_change = sum(weights[name] * factor for name, factor in factors.items())
     
-    def _get_cached(self, key, default=None):
-        """Get cached data if available"""
-        if self._is_cached(key):
-            return self.cache[key]['data']
-        return default
+    points = len(close) if data_points is None else data_points
+    confidence_factors = {
+        'volatility': np.maximum(0, 40 - (volatility * 2000)),  # Lower volatility = higher confidence
+        'data_quality': np.minimum(np.asarray(points) / 30, 1) * 30,
+        'rsi_confidence': 20 - np.abs(rsi - 50) / 2.5,  # RSI near 50 = more confidence
+        'volume_confidence': np.minimum(volume_ratio * 10, 20),
+        'sentiment_strength': np.abs(sentiment - 50) / 50 * 10
+    }
+    confidence = np.clip(sum(confidence_factors.values()), 20, 95)
     
-    def _cache_result(self, key, data):
-        """Cache data with timestamp"""
-        self.cache[key] = {
-            'data': data,
-            'timestamp': datetime.now()
+    # Multi-factor recommendation system
+    buy_signals = (
+        2 * (short_trend > 0.02) +  # Trend signals
+        (rsi < 30) +  # Technical indicator signals
+        (price < lower) +
+        ((ma_5 > ma_10) & (ma_10 > ma_20)) +
+        (sentiment > 65)  # Sentiment signals
+    )
+    sell_signals = (
+        2 * (short_trend < -0.02) +
+        (rsi > 70) +
+        (price > upper) +
+        ((ma_5 < ma_10) & (ma_10 < ma_20)) +
+        (sentiment < 35)
+    )
+    
+    scored = {
+        'predicted_change': predicted_change,
+        'confidence': confidence,
+        'buy_signals': buy_signals,
+        'sell_signals': sell_signals
+    }
+    if with_features:
+        scored['features'] = features
+    return scored
+
+
+class PredictionService:
+    def __init__(self, stock_service=None):
+        # Reuse the caller's StockService so quotes are not fetched twice
+        self.stock_service = stock_service or StockService()
+        self.min_data_points = 30  # Minimum data points needed for reliable predictions
+        self.default_prediction_window = 7  # Default prediction window in days
+        self.history_period = '3mo'  # Enough daily bars for the 26-day EMA plus its 9-day signal
+        self.weights = {
+            'trend': 0.3,
+            'momentum': 0.2,
+            'mean_reversion': 0.1,
+            'sentiment': 0.4
         }
+        
+        # Running per-symbol indicator state, persisted through database_service when set
+        self.database_service = None
+        self.indicator_states = {}
+        self._states_lock = threading.Lock()
+        self.cache = get_cache('predictions', max_entries=256, max_bytes=16 * 1024 * 1024)
+        self.cache_timeout = 300  # 5 minutes
+        self.negative_cache_timeout = 600  # 10 minutes for symbols without history
+        
+        # Trained model artifact, if one has been built with `flask train-model`; else the weights above
+        self.model = None
+        self.model_version = MODEL_VERSION
+        self.load_model()
+        
+        # Memoized predictions keyed on their inputs; identical inputs give identical results
+        self.result_cache = get_cache('prediction_results', max_entries=1024)
+        self.result_cache_timeout = 86400  # Inputs change with every new bar anyway
+        self.sentiment_quantum = 1.0  # Sentiment differences below this reuse the same prediction
+        
+        # Support/resistance detection
+        self.pivot_order = 3  # Bars either side a pivot must exceed
+        self.level_lookback = 250  # Bars scanned for pivots, about a year of daily history
+        self.level_tolerance = 0.015  # Pivots within 1.5% of each other form one level
+        self.max_levels = 3  # Levels reported on each side of the price
+        
+        # Monte Carlo forecast distribution, sampled from a longer history than scoring needs
+        self.forecaster = MonteCarloForecaster()
+        self.forecast_period = '1y'
     
     def validate_stock_data(self, data):
         """Validate stock data before prediction"""
@@ -50,7 +156,9 @@ class PredictionService:
         """Get historical prices with caching"""
         try:
             cache_key = f'prices_{symbol}_{period}'
-            cached = self._get_cached(cache_key)
+            cached = self.cache.get(cache_key)
+            if cached is NEGATIVE:
+                return {'error': f'No historical data available for {symbol}'}
             if cached is not None:
                 return cached
                 
@@ -58,10 +166,11 @@ class PredictionService:
             hist = self.stock_service.get_historical_data(symbol, period=period)
             
             if not hist:
+                self.cache.set_negative(cache_key, ttl=self.negative_cache_timeout)
                 return {'error': f'No historical data available for {symbol}'}
                 
             prices = [float(item['close']) for item in hist]
-            self._cache_result(cache_key, prices)
+            self.cache.set(cache_key, prices, ttl=self.cache_timeout)
             return prices
             
         except Exception as e:
@@ -70,74 +179,48 @@ class PredictionService:
     
     def calculate_moving_average(self, prices, window=5):
         """Calculate simple moving average with error handling"""
-        if not isinstance(prices, (list, tuple)) or len(prices) < window:
+        if not isinstance(prices, (list, tuple, np.ndarray)) or len(prices) < window:
             return 0
             
         try:
-            return sum(prices[-window:]) / window
+            return float(indicators.sma(prices, window)[-1])
         except Exception as e:
             logging.error(f"Error calculating MA: {str(e)}")
             return 0
     
     def calculate_exponential_moving_average(self, prices, window=12):
         """Calculate exponential moving average with error handling"""
-        if not isinstance(prices, (list, tuple)) or len(prices) < window:
+        if not isinstance(prices, (list, tuple, np.ndarray)) or len(prices) < window:
             return self.calculate_moving_average(prices, len(prices))
         
         try:
-            multiplier = 2 / (window + 1)
-            ema = prices[0]
-            
-            for price in prices[1:]:
-                ema = (price * multiplier) + (ema * (1 - multiplier))
-            
-            return ema
+            return float(indicators.ema(prices, window)[-1])
         except Exception as e:
             logging.error(f"Error calculating EMA: {str(e)}")
             return 0
     
     def calculate_rsi(self, prices, window=14):
         """Calculate Relative Strength Index with error handling"""
-        if not isinstance(prices, (list, tuple)) or len(prices) < window + 1:
+        if not isinstance(prices, (list, tuple, np.ndarray)) or len(prices) < window + 1:
             return 50
         
         try:
-            deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-            gains = [delta if delta > 0 else 0 for delta in deltas]
-            losses = [-delta if delta < 0 else 0 for delta in deltas]
-            
-            avg_gain = sum(gains[-window:]) / window
-            avg_loss = sum(losses[-window:]) / window
-            
-            if avg_loss == 0:
-                return 100
-            
-            rs = avg_gain / avg_loss
-            rsi = 100 - (100 / (1 + rs))
-            return rsi
+            return float(indicators.rsi(prices, window)[-1])
         except Exception as e:
             logging.error(f"Error calculating RSI: {str(e)}")
             return 50
     
     def calculate_macd(self, prices):
         """Calculate MACD with error handling"""
-        if not isinstance(prices, (list, tuple)) or len(prices) < 26:
+        if not isinstance(prices, (list, tuple, np.ndarray)) or len(prices) < 26:
             return {'macd': 0, 'signal': 0, 'histogram': 0}
         
         try:
-            ema_12 = self.calculate_exponential_moving_average(prices, 12)
-            ema_26 = self.calculate_exponential_moving_average(prices, 26)
-            
-            macd_line = ema_12 - ema_26
-            
-            # Simple approximation for signal line (9-period EMA of MACD)
-            signal_line = macd_line * 0.2  # Simplified calculation
-            histogram = macd_line - signal_line
-            
+            macd_line, signal_line, histogram = indicators.macd(prices)
             return {
-                'macd': macd_line,
-                'signal': signal_line,
-                'histogram': histogram
+                'macd': float(macd_line[-1]),
+                'signal': float(signal_line[-1]),
+                'histogram': float(histogram[-1])
             }
         except Exception as e:
             logging.error(f"Error calculating MACD: {str(e)}")
@@ -145,20 +228,15 @@ class PredictionService:
     
     def calculate_bollinger_bands(self, prices, window=20, num_std=2):
         """Calculate Bollinger Bands with error handling"""
-        if not isinstance(prices, (list, tuple)) or len(prices) < window:
+        if not isinstance(prices, (list, tuple, np.ndarray)) or len(prices) < window:
             return {'upper': 0, 'middle': 0, 'lower': 0}
         
         try:
-            ma = self.calculate_moving_average(prices, window)
-            std = np.std(prices[-window:])
-            
-            upper = ma + (std * num_std)
-            lower = ma - (std * num_std)
-            
+            upper, middle, lower = indicators.bollinger_bands(prices, window, num_std)
             return {
-                'upper': upper,
-                'middle': ma,
-                'lower': lower
+                'upper': float(upper[-1]),
+                'middle': float(middle[-1]),
+                'lower': float(lower[-1])
             }
         except Exception as e:
             logging.error(f"Error calculating Bollinger Bands: {str(e)}")
@@ -169,33 +247,217 @@ class PredictionService:
         if len(prices) < 2:
             return 0
         
-        returns = [(prices[i] - prices[i-1]) / prices[i-1] for i in range(1, len(prices))]
-        return np.std(returns) if returns else 0
+        return float(indicators.volatility(prices))
     
-    def calculate_support_resistance(self, prices):
-        """Calculate support and resistance levels"""
-        if len(prices) < 10:
-            return {'support': min(prices) if prices else 0, 'resistance': max(prices) if prices else 0}
+    def calculate_support_resistance(self, prices, high=None, low=None, current_price=None, pivots=None):
+        """Calculate ranked support and resistance levels from clustered pivot highs and lows
+
+        support and resistance are the strongest level on each side of the
+        current price; support_levels and resistance_levels list up to
+        max_levels of them with their touch counts. pivots takes precomputed
+        indicators.pivot_points masks, as batch prediction does for all symbols at once.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        if len(prices) < 2 * self.pivot_order + 1:
+            return {
+                'support': float(prices.min()) if len(prices) else 0,
+                'resistance': float(prices.max()) if len(prices) else 0,
+                'support_levels': [],
+                'resistance_levels': []
+            }
         
-        # Simple approach: use recent highs and lows
-        recent_prices = prices[-20:] if len(prices) >= 20 else prices
+        current_price = float(prices[-1]) if current_price is None else current_price
+        levels = indicators.support_resistance_levels(
+            prices if high is None else high,
+            prices if low is None else low,
+            current_price,
+            order=self.pivot_order,
+            lookback=self.level_lookback,
+            tolerance=self.level_tolerance,
+            max_levels=self.max_levels,
+            pivots=pivots
+        )
         
-        # Find local maxima and minima
-        highs = []
-        lows = []
+        # Without a pivot on one side, fall back to the recent extreme as before
+        recent_prices = prices[-20:]
+        support = levels['support'][0]['price'] if levels['support'] else float(recent_prices.min())
+        resistance = levels['resistance'][0]['price'] if levels['resistance'] else float(recent_prices.max())
         
-        for i in range(1, len(recent_prices) - 1):
-            if recent_prices[i] > recent_prices[i-1] and recent_prices[i] > recent_prices[i+1]:
-                highs.append(recent_prices[i])
-            elif recent_prices[i] < recent_prices[i-1] and recent_prices[i] < recent_prices[i+1]:
-                lows.append(recent_prices[i])
+        return {
+            'support': support,
+            'resistance': resistance,
+            'support_levels': levels['support'],
+            'resistance_levels': levels['resistance']
+        }
+    
+    def load_model(self, version=None):
+        """(Re)load the trained model artifact; without one, predictions use the fixed weights"""
+        self.model = load_model(version)
+        self.model_version = f'{MODEL_VERSION}+{self.model.version}' if self.model else MODEL_VERSION
+        return self.model
+    
+    def score(self, values, sentiment_score, current_price=None, data_points=None, weights=None):
+        """Score indicator values with the trained model, or with weights when given to evaluate a new weighting"""
+        return score_indicators(values, sentiment_score, weights or self.weights, self.default_prediction_window,
+                                current_price=current_price, data_points=data_points,
+                                model=None if weights else self.model)
+    
+    def recommendation(self, signal_difference):
+        """Map net buy minus sell signals to a recommendation label"""
+        if signal_difference >= 3:
+            return "Strong Buy"
+        elif signal_difference >= 1:
+            return "Buy"
+        elif signal_difference <= -3:
+            return "Strong Sell"
+        elif signal_difference <= -1:
+            return "Sell"
+        return "Hold"
+    
+    def _round_levels(self, levels):
+        return [{**level, 'price': round(level['price'], 2)} for level in levels]
+    
+    def _format_prediction(self, latest, scored, current_price, sentiment_score, support_resistance):
+        """Build the prediction response from one symbol's latest indicator values and scores"""
+        predicted_price = current_price * (1 + float(scored['predicted_change']))
+        price_change_percent = ((predicted_price - current_price) / current_price) * 100
+        confidence = float(scored['confidence'])
+        buy_signals = int(scored['buy_signals'])
+        sell_signals = int(scored['sell_signals'])
+        signal_difference = buy_signals - sell_signals
         
-        resistance = max(highs) if highs else max(recent_prices)
-        support = min(lows) if lows else min(recent_prices)
+        def indicator(name, digits=2, scale=1):
+            value = float(latest.get(name, math.nan))
+            return round(value * scale, digits) if math.isfinite(value) else 0.0
         
-        return {'support': support, 'resistance': resistance}
+        return {
+            'predicted_price': float(round(predicted_price, 2)),
+            'current_price': float(round(current_price, 2)),
+            'confidence': float(round(confidence, 1)),
+            'recommendation': self.recommendation(signal_difference),
+            'price_change_percent': float(round(price_change_percent, 2)),
+            'sentiment_score': float(sentiment_score),
+            'technical_indicators': {
+                'ma_5': indicator('ma_5'),
+                'ma_10': indicator('ma_10'),
+                'ma_20': indicator('ma_20'),
+                'ema_12': indicator('ema_12'),
+                'ema_26': indicator('ema_26'),
+                'rsi': indicator('rsi'),
+                'macd': indicator('macd', 4),
+                'macd_signal': indicator('macd_signal', 4),
+                'bollinger_upper': indicator('bollinger_upper'),
+                'bollinger_lower': indicator('bollinger_lower'),
+                'support': float(round(support_resistance['support'], 2)),
+                'resistance': float(round(support_resistance['resistance'], 2)),
+                'support_levels': self._round_levels(support_resistance['support_levels']),
+                'resistance_levels': self._round_levels(support_resistance['resistance_levels']),
+                'volatility': indicator('volatility', scale=100),
+                'atr': indicator('atr'),
+                'trend_short': indicator('trend_short', scale=100),
+                'trend_medium': indicator('trend_medium', scale=100),
+                'volume_ratio': indicator('volume_ratio')
+            },
+            'signals': {
+                'buy_signals': buy_signals,
+                'sell_signals': sell_signals,
+                'net_signal': signal_difference
+            }
+        }
     
-    def predict_price(self, symbol, current_data, sentiment_score):
+    def _load_indicator_state(self, symbol):
+        """Get the symbol's indicator state from memory, else from the database"""
+        with self._states_lock:
+            state = self.indicator_states.get(symbol)
+        if state is not None or self.database_service is None:
+            return state
+        data = self.database_service.get_indicator_state(symbol)
+        if not data:
+            return None
+        try:
+            return IndicatorState.from_dict(data)
+        except (KeyError, TypeError, ValueError) as e:
+            logging.warning(f"Discarding unreadable indicator state for {symbol}: {e}")
+            return None
+    
+    def update_indicator_state(self, symbol, history):
+        """Bring the symbol's running indicator state up to the latest stored bar
+
+        Only bars after the state's last bar are applied (the last bar itself
+        is re-applied in case it was still forming), so a warm state costs
+        O(new bars) rather than a full recompute. Without a usable state, or
+        when its last bar is no longer in history, it is rebuilt once.
+        """
+        state = self._load_indicator_state(symbol)
+        timestamps = history['timestamp']
+        
+        with self._states_lock:
+            start = None
+            if state is not None and state.last_day is not None and len(timestamps):
+                position = int(np.searchsorted(timestamps, state.last_day))
+                if position < len(timestamps) and timestamps[position] == state.last_day:
+                    start = position
+            if start is None:
+                state = IndicatorState()
+                start = 0
+            
+            state.extend({field: values[start:] for field, values in history.items()})
+            self.indicator_states[symbol] = state
+            # Persist only when a new day was added; revisions of the last bar are replayed anyway
+            advanced = len(timestamps) - start > 1 or start == 0
+            snapshot = state.to_dict() if advanced else None
+        
+        if snapshot is not None and self.database_service is not None:
+            self.database_service.save_indicator_state(symbol, snapshot)
+        return state
+    
+    def quantize_sentiment(self, sentiment_score):
+        return round(sentiment_score / self.sentiment_quantum) * self.sentiment_quantum
+    
+    def fingerprint(self, symbol, last_day, price, sentiment_score):
+        """Cache key for everything a prediction depends on"""
+        weights = ','.join(f'{name}={value}' for name, value in sorted(self.weights.items()))
+        return f'{symbol}|{last_day}|{price!r}|{sentiment_score!r}|{self.model_version}|{weights}'
+    
+    def get_prediction(self, symbol, current_data, sentiment_score):
+        """Memoized predict_price; returns (prediction, cached)
+
+        The sentiment score is quantized before predicting, so small sentiment
+        jitter does not defeat the cache. A cached result means nothing
+        changed since it was stored, so callers can skip persisting it again.
+        """
+        if not isinstance(sentiment_score, (int, float)):
+            raise ValueError("Invalid sentiment score")
+        if not current_data or not isinstance(current_data, dict):
+            raise ValueError("Invalid current data")
+        sentiment_score = self.quantize_sentiment(sentiment_score)
+        
+        history = self.stock_service.get_history_arrays(symbol, period=self.history_period)
+        last_day = int(history['timestamp'][-1]) if len(history['timestamp']) else None
+        key = self.fingerprint(symbol, last_day, float(current_data['price']), sentiment_score)
+        
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            return cached, True
+        
+        prediction = self.predict_price(symbol, current_data, sentiment_score, history=history)
+        self.result_cache.set(key, prediction, ttl=self.result_cache_timeout)
+        return prediction, False
+    
+    def forecast(self, symbol, current_price, history=None):
+        """Simulated price distribution over the forecaster's horizons; None without enough history
+
+        Seeded from the symbol and its last bar, so repeated requests for
+        the same day return the same bands.
+        """
+        if history is None:
+            history = self.stock_service.get_history_arrays(symbol, period=self.forecast_period)
+        if not len(history['close']):
+            return None
+        seed = zlib.crc32(f"{symbol}|{int(history['timestamp'][-1])}".encode())
+        return self.forecaster.forecast(history['close'], current_price=float(current_price), seed=seed)
+    
+    def predict_price(self, symbol, current_data, sentiment_score, history=None):
         """Enhanced stock price prediction using advanced technical analysis and sentiment"""
         try:
             # Validate inputs
@@ -206,132 +468,105 @@ class PredictionService:
             if not isinstance(sentiment_score, (int, float)):
                 raise ValueError("Invalid sentiment score")
                 
-            # Get historical data
-            hist_data = self.get_historical_prices(symbol)
-            if not hist_data or len(hist_data) < self.min_data_points:
+            # Get historical data as column arrays
+            if history is None:
+                history = self.stock_service.get_history_arrays(symbol, period=self.history_period)
+            close = np.asarray(history['close'], dtype=np.float64)
+            if len(close) < self.min_data_points:
                 raise ValueError(f"Not enough historical data for {symbol}")
-                
-            prices = [float(d['Close']) for d in hist_data]
-            
-            # Calculate technical indicators
-            ma = self.calculate_moving_average(prices)
-            macd = self.calculate_macd(prices)
-            rsi = self.calculate_rsi(prices)
-            bb = self.calculate_bollinger_bands(prices)
-            vol = self.calculate_volatility(prices)
-            
-            # Calculate prediction factors
-            trend_factor = (ma - prices[-1]) / prices[-1] * 100
-            momentum_factor = macd['histogram']
-            volatility_factor = vol * 100
-            sentiment_factor = sentiment_score
-            
-            # Weighted prediction
-            prediction = current_data['price'] * (1 + 
-                (trend_factor * 0.3) +
-                (momentum_factor * 0.2) +
-                (volatility_factor * 0.1) +
-                (sentiment_factor * 0.4)
-            )
-            
-            confidence_factors = {
-                'volatility': max(0, 40 - (volatility * 2000)),  # Lower volatility = higher confidence
-                'data_quality': min(len(historical_data) / 30, 1) * 30,
-                'rsi_confidence': 20 - abs(rsi - 50) / 2.5,  # RSI near 50 = more confidence
-                'volume_confidence': min(volume_ratio * 10, 20),
-                'sentiment_strength': abs(sentiment_factor) * 10
-            }
-            
-            confidence = min(95, max(20, sum(confidence_factors.values())))
-            
-            # Generate enhanced recommendation
-            price_change_percent = ((predicted_price - current_price) / current_price) * 100
-            
-            # Multi-factor recommendation system
-            buy_signals = 0
-            sell_signals = 0
-            
-            # Trend signals
-            if short_trend > 0.02: buy_signals += 2
-            elif short_trend < -0.02: sell_signals += 2
             
-            # Technical indicator signals
-            if rsi < 30: buy_signals += 1
-            elif rsi > 70: sell_signals += 1
+            # Running indicator state only needs the bars added since it was last updated
+            state = self.update_indicator_state(symbol, history)
+            latest = state.values()
             
-            if current_price < bollinger['lower']: buy_signals += 1
-            elif current_price > bollinger['upper']: sell_signals += 1
-            
-            if ma_5 > ma_10 > ma_20: buy_signals += 1
-            elif ma_5 < ma_10 < ma_20: sell_signals += 1
-            
-            # Sentiment signals
-            if sentiment_score > 65: buy_signals += 1
-            elif sentiment_score < 35: sell_signals += 1
-            
-            # Final recommendation
-            signal_difference = buy_signals - sell_signals
-            if signal_difference >= 3:
-                recommendation = "Strong Buy"
-            elif signal_difference >= 1:
-                recommendation = "Buy"
-            elif signal_difference <= -3:
-                recommendation = "Strong Sell"
-            elif signal_difference <= -1:
-                recommendation = "Sell"
-            else:
-                recommendation = "Hold"
-            
-            return {
-                'predicted_price': float(round(predicted_price, 2)),
-                'current_price': float(round(current_price, 2)),
-                'confidence': float(round(confidence, 1)),
-                'recommendation': recommendation,
-                'price_change_percent': float(round(price_change_percent, 2)),
-                'sentiment_score': float(sentiment_score),
-                'technical_indicators': {
-                    'ma_5': float(round(ma_5, 2)),
-                    'ma_10': float(round(ma_10, 2)),
-                    'ma_20': float(round(ma_20, 2)),
-                    'ema_12': float(round(ema_12, 2)),
-                    'ema_26': float(round(ema_26, 2)),
-                    'rsi': float(round(rsi, 2)),
-                    'macd': float(round(macd['macd'], 4)),
-                    'macd_signal': float(round(macd['signal'], 4)),
-                    'bollinger_upper': float(round(bollinger['upper'], 2)),
-                    'bollinger_lower': float(round(bollinger['lower'], 2)),
-                    'support': float(round(support_resistance['support'], 2)),
-                    'resistance': float(round(support_resistance['resistance'], 2)),
-                    'volatility': float(round(volatility * 100, 2)),
-                    'trend_short': float(round(short_trend * 100, 2)),
-                    'trend_medium': float(round(medium_trend * 100, 2)),
-                    'volume_ratio': float(round(volume_ratio, 2))
-                },
-                'signals': {
-                    'buy_signals': buy_signals,
-                    'sell_signals': sell_signals,
-                    'net_signal': signal_difference
-                }
-            }
+            current_price = float(current_data['price'])
+            scored = self.score(latest, sentiment_score, current_price=current_price, data_points=state.count)
+            levels = self.calculate_support_resistance(close, history['high'], history['low'], current_price)
+            return self._format_prediction(latest, scored, current_price, sentiment_score, levels)
             
         except Exception as e:
             logging.error(f"Error predicting price for {symbol}: {e}")
             raise
     
-    def batch_predict(self, symbols):
-        """Generate predictions for multiple stocks"""
-        predictions = []
+    def batch_predict(self, symbols, sentiment_scores=None):
+        """Generate predictions for many stocks with one matrix pass per history length
+
+        Symbols whose histories have the same length have their close,
+        volume, high and low stacked into (days x symbols) arrays, so every
+        indicator and signal count is computed column-wise for the group at
+        once. Grouping rather than trimming to the shortest history keeps each
+        prediction equivalent to a fresh recompute over the symbol's full
+        history. predict_price resumes a persisted IndicatorState instead,
+        whose EMAs can drift slightly from that recompute.
+        sentiment_scores maps symbol to score; missing symbols use neutral 50.
+        """
+        sentiment_scores = sentiment_scores or {}
+        quotes = self.stock_service.get_batch_stock_data(list(symbols))
         
+        histories = {}
         for symbol in symbols:
+            if symbol not in quotes:
+                logging.warning(f"Failed to generate prediction for {symbol}: no current data")
+                continue
             try:
-                current_data = self.stock_service.get_stock_data(symbol)
-                # For batch predictions, use neutral sentiment if not specified
-                prediction = self.predict_price(symbol, current_data, 50)
-                prediction['symbol'] = symbol
-                prediction['current_price'] = current_data['price']
-                predictions.append(prediction)
+                history = self.stock_service.get_history_arrays(symbol, period=self.history_period)
             except Exception as e:
                 logging.warning(f"Failed to generate prediction for {symbol}: {e}")
                 continue
+            if len(history['close']) < self.min_data_points:
+                logging.warning(f"Failed to generate prediction for {symbol}: not enough historical data")
+                continue
+            histories[symbol] = history
+        
+        # Symbols on the same exchange calendar share a length, so there are few groups
+        groups = {}
+        for symbol, history in histories.items():
+            groups.setdefault(len(history['close']), []).append(symbol)
+        
+        predictions = {}
+        for length, batch in groups.items():
+            predictions.update(self._predict_group(batch, length, histories, quotes, sentiment_scores))
+        return [predictions[symbol] for symbol in histories if symbol in predictions]
+    
+    def _predict_group(self, batch, length, histories, quotes, sentiment_scores):
+        """Predictions keyed by symbol for symbols whose histories all have length bars"""
+        matrix = {
+            field: np.column_stack([np.asarray(histories[symbol][field], dtype=np.float64) for symbol in batch])
+            for field in ('close', 'volume', 'high', 'low')
+        }
+        
+        series = indicators.compute_indicators(matrix['close'], matrix['volume'], matrix['high'], matrix['low'])
+        latest = {name: values[-1] for name, values in series.items()}
+        current_prices = np.array([float(quotes[symbol]['price']) for symbol in batch])
+        sentiments = np.array([float(sentiment_scores.get(symbol, 50)) for symbol in batch])
+        scored = self.score(latest, sentiments, current_price=current_prices, data_points=length)
+        
+        # Pivot detection for every symbol at once; only the level clustering runs per symbol
+        lookback = matrix['high'][-self.level_lookback:], matrix['low'][-self.level_lookback:]
+        is_high, is_low = indicators.pivot_points(*lookback, order=self.pivot_order)
+        
+        # Plain Python floats format much faster than NumPy scalars
+        latest = {name: values.tolist() for name, values in latest.items()}
+        scored = {name: values.tolist() for name, values in scored.items()}
+        current_prices = current_prices.tolist()
+        sentiments = sentiments.tolist()
+        
+        predictions = {}
+        for column, symbol in enumerate(batch):
+            try:
+                prediction = self._format_prediction(
+                    {name: values[column] for name, values in latest.items()},
+                    {name: values[column] for name, values in scored.items()},
+                    current_prices[column],
+                    sentiments[column],
+                    self.calculate_support_resistance(
+                        matrix['close'][:, column], matrix['high'][:, column], matrix['low'][:, column],
+                        current_prices[column], pivots=(is_high[:, column], is_low[:, column])
+                    )
+                )
+                prediction['symbol'] = symbol
+                predictions[symbol] = prediction
+            except Exception as e:
+                logging.warning(f"Failed to generate prediction for {symbol}: {e}")
         
         return predictions
@@ -0,0 +1,213 @@
+import os
+import re
+import json
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+DEFAULT_STORE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'price_store'
+)
+
+# One flat little-endian file per column; timestamps are days since the Unix epoch
+COLUMNS = {
+    'timestamp': np.dtype('<i8'),
+    'open': np.dtype('<f8'),
+    'high': np.dtype('<f8'),
+    'low': np.dtype('<f8'),
+    'close': np.dtype('<f8'),
+    'volume': np.dtype('<i8'),
+}
+
+EPOCH = date(1970, 1, 1)
+
+
+def to_day(value):
+    """Convert a date to days since the Unix epoch"""
+    return (value - EPOCH).days
+
+
+def from_day(day):
+    """Convert days since the Unix epoch back to a date"""
+    return EPOCH + timedelta(days=int(day))
+
+
+def frame_to_columns(hist):
+    """Convert a yfinance history frame to the store's column arrays"""
+    index = hist.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)  # Keep exchange-local calendar dates
+    return {
+        'timestamp': index.values.astype('datetime64[D]').astype(np.int64),
+        'open': hist['Open'].to_numpy(dtype=np.float64),
+        'high': hist['High'].to_numpy(dtype=np.float64),
+        'low': hist['Low'].to_numpy(dtype=np.float64),
+        'close': hist['Close'].to_numpy(dtype=np.float64),
+        'volume': np.nan_to_num(hist['Volume'].to_numpy(dtype=np.float64)).astype(np.int64),
+    }
+
+
+class _SymbolLock:
+    """Thread lock plus an flock on the symbol directory for other workers"""
+
+    def __init__(self, store, symbol):
+        self.thread_lock = store._thread_lock(symbol)
+        self.lock_path = os.path.join(store._symbol_dir(symbol), '.lock')
+        self.handle = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        if fcntl is not None:
+            self.handle = open(self.lock_path, 'a')
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.handle is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+        self.thread_lock.release()
+
+
+class PriceStore:
+    """Per-symbol columnar store of daily OHLCV bars, read through memory maps
+
+    Each symbol directory holds one raw file per column plus meta.json, which
+    records the date range already fetched from the provider. New bars are
+    appended; a head backfill (older dates than ever requested) rewrites the
+    symbol's files once.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _symbol_dir(self, symbol):
+        return os.path.join(self.path, re.sub(r'[^A-Za-z0-9._^-]', '_', symbol))
+
+    def _column_path(self, symbol, column):
+        return os.path.join(self._symbol_dir(symbol), f'{column}.bin')
+
+    def _thread_lock(self, symbol):
+        with self._locks_lock:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def lock(self, symbol):
+        return _SymbolLock(self, symbol)
+
+    def coverage(self, symbol):
+        """Return meta for the fetched range ({'start', 'end', 'synced_at'}) or None"""
+        try:
+            with open(os.path.join(self._symbol_dir(symbol), 'meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def mark_synced(self, symbol, start, end, synced_at):
+        """Record that the provider has been queried for start..end (epoch days)"""
+        meta_path = os.path.join(self._symbol_dir(symbol), 'meta.json')
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'start': int(start), 'end': int(end), 'synced_at': synced_at}, f)
+        os.replace(tmp_path, meta_path)
+
+    def _row_count(self, symbol):
+        """Rows present in every column file (guards against a torn append)"""
+        counts = []
+        for column, dtype in COLUMNS.items():
+            try:
+                counts.append(os.path.getsize(self._column_path(symbol, column)) // dtype.itemsize)
+            except OSError:
+                return 0
+        return min(counts)
+
+    def read(self, symbol, start=None, end=None):
+        """Return column arrays for start <= day <= end as read-only memory-mapped slices"""
+        rows = self._row_count(symbol)
+        if rows == 0:
+            return {column: np.empty(0, dtype=dtype) for column, dtype in COLUMNS.items()}
+
+        columns = {
+            column: np.memmap(self._column_path(symbol, column), dtype=dtype, mode='r', shape=(rows,))
+            for column, dtype in COLUMNS.items()
+        }
+        timestamps = columns['timestamp']
+        lo = np.searchsorted(timestamps, start, side='left') if start is not None else 0
+        hi = np.searchsorted(timestamps, end, side='right') if end is not None else rows
+        return {column: values[lo:hi] for column, values in columns.items()}
+
+    def append(self, symbol, columns):
+        """Append bars, overwriting any stored bars from the first new timestamp onwards
+
+        Callers hold lock(symbol). Overwriting the tail lets today's partial bar
+        be updated while older history stays untouched. Files are only ever
+        extended here, never shrunk, so open memory maps stay valid.
+        """
+        if len(columns['timestamp']) == 0:
+            return
+        os.makedirs(self._symbol_dir(symbol), exist_ok=True)
+        rows = self._row_count(symbol)
+        keep = rows
+        if rows:
+            existing = np.memmap(self._column_path(symbol, 'timestamp'), dtype=COLUMNS['timestamp'],
+                                 mode='r', shape=(rows,))
+            keep = int(np.searchsorted(existing, columns['timestamp'][0], side='left'))
+            del existing
+
+        if keep + len(columns['timestamp']) < rows:
+            # The provider returned fewer bars than we hold; rebuild rather than shrink in place
+            stored = self.read(symbol)
+            self.rewrite(symbol, {
+                column: np.concatenate([np.asarray(stored[column][:keep]), columns[column]])
+                for column in COLUMNS
+            })
+            return
+
+        for column, dtype in COLUMNS.items():
+            path = self._column_path(symbol, column)
+            with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+                f.seek(keep * dtype.itemsize)
+                f.write(np.ascontiguousarray(columns[column], dtype=dtype).tobytes())
+
+    def rewrite(self, symbol, columns):
+        """Replace all stored bars for a symbol; used when backfilling older history"""
+        os.makedirs(self._symbol_dir(symbol), exist_ok=True)
+        for column, dtype in COLUMNS.items():
+            path = self._column_path(symbol, column)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(np.ascontiguousarray(columns[column], dtype=dtype).tobytes())
+            os.replace(tmp_path, path)
+
+    def merge_head(self, symbol, columns):
+        """Prepend older bars ahead of the stored history"""
+        stored = self.read(symbol)
+        if len(stored['timestamp']):
+            cutoff = np.searchsorted(columns['timestamp'], stored['timestamp'][0], side='left')
+            columns = {
+                column: np.concatenate([columns[column][:cutoff], np.asarray(stored[column])])
+                for column in COLUMNS
+            }
+        self.rewrite(symbol, columns)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_price_store():
+    """Get the process-wide price store rooted at PRICE_STORE_PATH"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PriceStore(os.environ.get('PRICE_STORE_PATH', DEFAULT_STORE_PATH))
+        return _store
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import threading
+import time
+
+# Upstream hosts shared by every service instance in the process
+YAHOO_FINANCE_HOST = 'query2.finance.yahoo.com'
+TWITTER_API_HOST = 'api.twitter.com'
+
+
+class TokenBucket:
+    """Token bucket rate limiter that can be shared by threads and asyncio tasks"""
+
+    def __init__(self, name, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        self.name = name
+        self.rate = float(rate)  # Tokens added per second
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        # Stats
+        self.acquired = 0
+        self.rejected = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _refill(self, now):
+        """Add the tokens accrued since the last update"""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def _reserve(self, tokens, max_wait):
+        """Reserve tokens and return how long the caller must wait, or None if rejected
+
+        Reservations may drive the bucket negative, so concurrent callers queue
+        up behind each other instead of all waking at the same moment.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            deficit = tokens - self.tokens
+            wait = deficit / self.rate if deficit > 0 else 0.0
+
+            if max_wait is not None and wait > max_wait:
+                self.rejected += 1
+                return None
+
+            self.tokens -= tokens
+            self.acquired += 1
+            if wait > 0:
+                self.waited += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            return wait
+
+    def try_acquire(self, tokens=1):
+        """Take tokens only if they are available right now"""
+        return self._reserve(tokens, 0) is not None
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until tokens are available; return False if that would exceed timeout"""
+        wait = self._reserve(tokens, timeout)
+        if wait is None:
+            logging.info(f"Rate limiter {self.name}: rejected request (timeout {timeout}s)")
+            return False
+        if wait > 0:
+            logging.debug(f"Rate limiter {self.name}: waiting {wait:.2f} seconds")
+            time.sleep(wait)
+        return True
+
+    async def acquire_async(self, tokens=1, timeout=None):
+        """Asyncio variant of acquire that does not block the event loop"""
+        wait = self._reserve(tokens, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    def stats(self):
+        """Return limiter counters"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'rate_per_second': self.rate,
+                'capacity': self.capacity,
+                'available_tokens': round(max(self.tokens, 0.0), 3),
+                'acquired': self.acquired,
+                'rejected': self.rejected,
+                'waited': self.waited,
+                'total_wait_seconds': round(self.total_wait, 3),
+                'max_wait_seconds': round(self.max_wait, 3)
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(host, rate, capacity=1):
+    """Get the process-wide limiter for an upstream host, creating it on first use"""
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = TokenBucket(host, rate, capacity)
+            _limiters[host] = limiter
+        return limiter
+
+
+def get_rate_limiter_stats():
+    """Return stats for every registered limiter keyed by host"""
+    with _limiters_lock:
+        limiters = list(_limiters.items())
+    return {host: limiter.stats() for host, limiter in limiters}
@@ -0,0 +1,110 @@
+import functools
+import logging
+import threading
+
+
+class _Call:
+    """An in-flight call whose result or error is shared with waiting callers"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        # Stats
+        self.executed = 0
+        self.coalesced = 0
+        self.per_operation = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn once per key at a time; concurrent callers wait and share its result or error"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+                operation = key[0] if isinstance(key, tuple) else key
+                self.per_operation[operation] = self.per_operation.get(operation, 0) + 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logging.debug(f"Single-flight {key}: shared result with {call.waiters} callers")
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'coalesced_by_operation': dict(self.per_operation)
+            }
+
+
+# Shared by every service so identical upstream fetches coalesce across instances
+default_group = SingleFlight()
+
+
+# Per-caller arguments that do not change what is fetched
+_UNKEYED_KWARGS = ('deadline',)
+
+
+def _make_key(operation, args, kwargs):
+    """Build a hashable (operation, args, params) key"""
+    params = tuple(sorted(item for item in kwargs.items() if item[0] not in _UNKEYED_KWARGS))
+    return (operation, args, params)
+
+
+def single_flight(operation, group=None):
+    """Decorator that coalesces concurrent calls to a service method by (operation, arguments)
+
+    The instance itself is left out of the key, so two service objects asking
+    for the same symbol share one upstream fetch.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                key = _make_key(operation, args, kwargs)
+                hash(key)
+            except TypeError:
+                # Unhashable arguments cannot be coalesced
+                return method(self, *args, **kwargs)
+            return (group or default_group).do(key, method, self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_single_flight_stats():
+    """Return stats for the shared single-flight group"""
+    return default_group.stats()
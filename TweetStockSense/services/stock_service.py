@@ -1,8 +1,80 @@
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import numpy as np
 import yfinance as yf
-from functools import lru_cache
 import time
+from services.rate_limiter import get_rate_limiter, YAHOO_FINANCE_HOST
+from services.cache import get_cache
+from services.background import get_refresher
+from services.single_flight import single_flight
+from services.circuit_breaker import get_circuit_breaker, CircuitOpenError, Deadline
+from services.price_store import get_price_store, frame_to_columns, to_day, from_day
+
+# Calendar days covered by each yfinance period string
+PERIOD_DAYS = {
+    '1d': 1,
+    '5d': 5,
+    '1mo': 31,
+    '3mo': 92,
+    '6mo': 183,
+    '1y': 366,
+    '2y': 731,
+    '5y': 1827,
+    '10y': 3653,
+}
+
+HISTORY_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class EmptyHistoryError(ValueError):
+    """Yahoo Finance returned no bars
+
+    yfinance catches per-ticker errors itself, so outages and rate limits come
+    back as empty frames. An unknown symbol looks the same, so this is only
+    raised inside circuit_breaker.call (counting as a failure) when symbols
+    known to trade came back empty.
+    """
+
+
+def _has_bars(frame):
+    return frame is not None and not frame.empty and 'Close' in frame and bool(frame['Close'].notna().any())
+
+
+def _round_prices(values):
+    """round(value, 2) for a whole column, as a list
+
+    np.round scales by 100 before rounding, so values within float error of
+    a half cent can round the other way from round(); only those are redone
+    with round().
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, 2).tolist()
+    fraction = np.modf(np.abs(values) * 100)[0]
+    for i in np.flatnonzero(np.abs(fraction - 0.5) < 1e-6):
+        rounded[i] = round(float(values[i]), 2)
+    return rounded
+
+
+def serialize_history(columns, orient='records'):
+    """Convert OHLCV column arrays to JSON-ready data in bulk, without a per-row loop over values"""
+    if orient not in ('records', 'columns'):
+        raise ValueError(f"Unsupported orient: {orient}")
+    
+    # Vectorised formatting: one conversion per column instead of round()/strftime per row
+    data = {
+        'dates': np.asarray(columns['timestamp']).astype('datetime64[D]').astype(str).tolist(),
+        'open': _round_prices(columns['open']),
+        'high': _round_prices(columns['high']),
+        'low': _round_prices(columns['low']),
+        'close': _round_prices(columns['close']),
+        'volume': np.asarray(columns['volume'], dtype=np.int64).tolist(),
+    }
+    if orient == 'columns':
+        return data
+    
+    keys = ('date',) + HISTORY_FIELDS
+    return [dict(zip(keys, row)) for row in zip(data['dates'], *(data[field] for field in HISTORY_FIELDS))]
+
 
 class StockService:
     def __init__(self):
@@ -24,63 +96,64 @@ class StockService:
             'HCLTECH.NS': 'HCL Technologies',
             'WIPRO.NS': 'Wipro',
         }
-        # Cache settings
+        # Proper Yahoo Finance ticker symbols for Indian indices
+        self.index_symbols = {
+            'NIFTY50': '^NSEI',  # NIFTY 50
+            'SENSEX': '^BSESN',  # BSE SENSEX
+            'NIFTYBANK': '^NSEBANK'  # NIFTY BANK
+        }
+        # Cache settings; quotes are shared by every StockService in every worker
         self.cache_timeout = 300  # 5 minutes
-        self.last_fetch = {}
+        self.stale_cache_timeout = 3600  # Expired quotes are served while a refresh runs
+        self.negative_cache_timeout = 600  # Symbols with no data are not retried for 10 minutes
+        self.last_fetch = get_cache('quotes', max_entries=512, max_bytes=2 * 1024 * 1024)
+        self.refresher = get_refresher('quotes')
+        
+        # Ticker.info fields (name, market cap, P/E) change slowly and are the most
+        # rate-limited Yahoo call, so they get their own long-lived cache
+        self.metadata_timeout = 86400  # 24 hours
+        self.metadata_stale_timeout = 7 * 86400  # Older metadata is still shown while it refreshes
+        self.metadata_cache = get_cache('metadata', max_entries=2048)
+        self.metadata_refresher = get_refresher('metadata', max_workers=1)
+        self.database_service = None  # Optional DatabaseService used to persist metadata and fetched bars
+        
+        # Local columnar store of daily bars; history requests only fetch missing dates
+        self.price_store = get_price_store()
         
-        # Rate limiting settings
-        self.last_request_time = time.time()  # Initialize with current time
+        # Rate limiting settings, shared with every other Yahoo Finance client
         self.request_interval = 1.5  # Minimum 1.5 seconds between requests
+        self.rate_limiter = get_rate_limiter(YAHOO_FINANCE_HOST, rate=1 / self.request_interval)
         self.rate_limit_reset = None
+        
+        # Stop hammering Yahoo Finance once it keeps failing, and bound how long one request may retry
+        self.circuit_breaker = get_circuit_breaker(YAHOO_FINANCE_HOST, failure_threshold=5, reset_timeout=60)
+        self.request_budget = 10  # Seconds a caller may spend on fetches and retries
     
-    def _is_cached(self, symbol):
-        """Check if data is in cache and not expired"""
-        if symbol in self.last_fetch:
-            timestamp = self.last_fetch[symbol].get('timestamp', 0)
-            if time.time() - timestamp < self.cache_timeout:
-                return True
-        return False
-
     def get_market_indices(self):
         """Get market indices data"""
         try:
             indices = {}
-            # Use proper Yahoo Finance ticker symbols for Indian indices
-            index_symbols = {
-                'NIFTY50': '^NSEI',  # NIFTY 50
-                'SENSEX': '^BSESN',  # BSE SENSEX
-                'NIFTYBANK': '^NSEBANK'  # NIFTY BANK
-            }
             
-            for index, symbol in index_symbols.items():
-                try:
-                    data = self.get_stock_data(symbol, retries=5, delay=5)  # Increased retries and delay
-                    if data:
-                        indices[index] = data
-                    else:
-                        logging.warning(f"No data fetched for {index}")
-                except Exception as e:
-                    logging.warning(f"Error fetching {index} data: {str(e)}")
-                    continue
+            # Retries stop when the budget runs out; cached or partial data is returned instead
+            quotes = self.get_batch_stock_data(list(self.index_symbols.values()), retries=5, delay=5,
+                                               deadline=Deadline(self.request_budget))
+            for index, symbol in self.index_symbols.items():
+                data = quotes.get(symbol)
+                if data:
+                    indices[index] = data
+                else:
+                    logging.warning(f"No data fetched for {index}")
             
             return indices if indices else None
         except Exception as e:
             logging.error(f"Error fetching market indices: {str(e)}", exc_info=True)
             return None
-            return None
 
     def get_top_stocks(self):
         """Get data for top Indian stocks"""
         try:
-            top_stocks = []
-            for symbol, name in self.indian_stocks.items():
-                try:
-                    data = self.get_stock_data(symbol)
-                    if data:
-                        top_stocks.append(data)
-                except Exception as e:
-                    logging.warning(f"Error fetching data for {symbol}: {str(e)}")
-            return top_stocks
+            quotes = self.get_batch_stock_data(list(self.indian_stocks), deadline=Deadline(self.request_budget))
+            return list(quotes.values())
         except Exception as e:
             logging.error(f"Error fetching top stocks: {str(e)}")
             return []
@@ -90,18 +163,55 @@ class StockService:
         try:
             info = stock.info
             return {
-                'name': info.get('longName', ''),
-                'marketCap': info.get('marketCap', 0),
-                'volume': info.get('volume', 0),
-                'trailingPE': info.get('trailingPE', 0)
+                'name': info.get('longName') or '',
+                'market_cap': info.get('marketCap') or 0,
+                'pe_ratio': info.get('trailingPE') or 0
             }
         except Exception as e:
             logging.warning(f"Error getting stock info: {str(e)}")
             return {}
 
+    def load_metadata(self, metadata):
+        """Warm the metadata cache from persisted rows ({symbol: {..., 'updated_at': datetime}})"""
+        now = datetime.utcnow()
+        for symbol, fields in metadata.items():
+            updated_at = fields.pop('updated_at', None) or now
+            remaining = self.metadata_timeout - (now - updated_at).total_seconds()
+            self.metadata_cache.set(symbol, fields, ttl=max(remaining, 1), stale_ttl=self.metadata_stale_timeout)
+        logging.info(f"Loaded metadata for {len(metadata)} symbols")
+
+    def _refresh_metadata(self, symbols):
+        """Fetch Ticker.info for symbols in the background and persist it"""
+        for symbol in symbols:
+            self.rate_limiter.acquire()
+            stock = yf.Ticker(symbol)
+            try:
+                # Load info through the breaker; yfinance keeps it on the Ticker for _get_stock_info
+                self.circuit_breaker.call(lambda: stock.info)
+            except CircuitOpenError:
+                logging.warning("Yahoo Finance circuit open, postponing metadata refresh")
+                return
+            except Exception as e:
+                logging.warning(f"Error refreshing metadata for {symbol}: {str(e)}")
+                continue
+            metadata = self._get_stock_info(stock)
+            if not metadata:
+                continue
+            self.metadata_cache.set(symbol, metadata, ttl=self.metadata_timeout, stale_ttl=self.metadata_stale_timeout)
+            if self.database_service is not None:
+                self.database_service.save_stock_metadata(symbol, metadata)
+
+    def get_symbol_metadata(self, symbol):
+        """Cached name/market cap/P-E for a symbol; missing or old entries refresh in the background"""
+        entry = self.metadata_cache.get_entry(symbol)
+        if entry is None or entry.is_stale:
+            self.metadata_refresher.submit([symbol], self._refresh_metadata)
+        return entry.value if entry is not None else {}
+
     def _get_stock_data(self, symbol, hist):
-        """Process stock data from historical data"""
+        """Build a quote dict from recent price history and cached symbol metadata"""
         try:
+            hist = hist.dropna(subset=['Close'])
             if hist.empty:
                 logging.warning(f"No historical data available for {symbol}")
                 return None
@@ -110,50 +220,35 @@ class StockService:
             latest = hist.iloc[-1]
             
             # Get today's data
-            current_price = latest.get('Close')
-            day_high = latest.get('High')
-            day_low = latest.get('Low')
+            current_price = float(latest.get('Close', 0.0))
+            day_high = float(latest.get('High', 0.0))
+            day_low = float(latest.get('Low', 0.0))
             
-            # Validate data exists
-            if current_price is None or day_high is None or day_low is None:
-                logging.warning(f"Missing required data for {symbol}: {latest}")
-                return None
-                
             # Get previous day's close for change calculation
             prev_close = None
             if len(hist) > 1:
-                prev_row = hist.iloc[-2]
-                prev_close = prev_row.get('Close')
+                prev_close = float(hist.iloc[-2].get('Close', 0.0))
             
             # Calculate change and percentage change
-            change = 0
-            change_percent = 0
-            if prev_close is not None and isinstance(prev_close, (float, int)):
-                try:
-                    change = float(current_price) - float(prev_close)
-                    change_percent = (change / float(prev_close)) * 100
-                except (TypeError, ValueError) as e:
-                    logging.warning(f"Error calculating change for {symbol}: {str(e)}")
-                    change = 0
-                    change_percent = 0
-            
-            # Get stock info
-            stock = yf.Ticker(symbol)
-            info = self._get_stock_info(stock)
+            change = 0.0
+            change_percent = 0.0
+            if prev_close is not None and prev_close > 0:
+                change = current_price - prev_close
+                change_percent = (change / prev_close) * 100
             
-            # Validate info
-            if not info:
-                info = {}
+            # Metadata never blocks the quote; until it arrives fall back to known names
+            metadata = self.get_symbol_metadata(symbol)
+            volume = latest.get('Volume', 0) or 0
             
             return {
                 'symbol': symbol,
-                'name': info.get('name', symbol),
+                'name': metadata.get('name') or self.indian_stocks.get(symbol, symbol),
                 'price': float(round(current_price, 2)),
                 'change': float(round(change, 2)),
                 'change_percent': float(round(change_percent, 2)),
-                'volume': int(info.get('volume', 0)),
-                'market_cap': int(info.get('marketCap', 0)),
-                'pe_ratio': float(info.get('trailingPE', 0)),
+                'volume': int(volume),
+                'market_cap': int(metadata.get('market_cap') or 0),
+                'pe_ratio': float(metadata.get('pe_ratio') or 0),
                 'day_high': float(round(day_high, 2)),
                 'day_low': float(round(day_low, 2)),
                 'timestamp': datetime.now().isoformat()
@@ -162,328 +257,337 @@ class StockService:
             logging.error(f"Error processing stock data for {symbol}: {str(e)}", exc_info=True)
             return None
 
-    
-    @lru_cache(maxsize=128)
-    def _get_stock_data(self, symbol, hist):
-        """Helper method to process stock data"""
-        # Get current price and change
-        current_price = hist['Close'].iloc[-1]
-        previous_price = hist['Close'].iloc[-2] if len(hist) > 1 else current_price
-        change = current_price - previous_price
-        change_percent = (change / previous_price * 100) if previous_price != 0 else 0
+    def _cache_quote(self, symbol, data):
+        """Store a quote in the fetch cache, keeping it past expiry for stale reads"""
+        self.last_fetch.set(symbol, data, ttl=self.cache_timeout, stale_ttl=self.stale_cache_timeout)
+
+    def _has_quote(self, symbol):
+        """Whether the fetch cache still holds a real quote for symbol, fresh or stale"""
+        entry = self.last_fetch.get_entry(symbol)
+        return entry is not None and not entry.is_negative
+
+    def _stale_quote(self, entry):
+        """Copy of an expired cached quote flagged with its age in seconds"""
+        return dict(entry.value, stale=True, age=round(entry.age, 1))
+
+    def _refresh_quotes(self, symbols):
+        """Background refresh of expired quotes; blocks on the rate limiter instead of serving stale"""
+        deadline = Deadline(self.request_budget * 3)
+        if len(symbols) == 1:
+            self.get_stock_data(symbols[0], retries=2, delay=2, serve_stale=False, deadline=deadline)
+        else:
+            self.get_batch_stock_data(symbols, retries=2, delay=2, serve_stale=False, deadline=deadline)
+
+    def _split_batch_history(self, data, symbols):
+        """Split a multi-ticker download frame into per-symbol history frames"""
+        frames = {}
+        if data is None or data.empty:
+            return frames
         
-        # Get day high and low
-        day_high = hist['High'].iloc[-1]
-        day_low = hist['Low'].iloc[-1]
+        if data.columns.nlevels == 1:
+            # Single ticker downloads come back with flat columns
+            if len(symbols) == 1:
+                frames[symbols[0]] = data
+            return frames
         
-        # Get additional info with error handling
-        info = self._get_stock_info(hist)
+        available = set(data.columns.get_level_values(0))
+        for symbol in symbols:
+            if symbol in available:
+                frames[symbol] = data[symbol]
+        return frames
+
+    def _is_known_symbol(self, symbol):
+        """Whether symbol is one of the indices or top stocks, which always have recent bars"""
+        return symbol in self.indian_stocks or symbol in self.index_symbols.values()
+
+    def _download_batch(self, symbols):
+        """Multi-ticker download split into per-symbol frames
+
+        Raises EmptyHistoryError when no symbol has bars and the batch holds
+        a known symbol: that is an outage, not a batch of unknown tickers.
+        """
+        data = yf.download(
+            tickers=symbols,
+            period='2d',
+            group_by='ticker',
+            auto_adjust=False,
+            threads=True,
+            progress=False
+        )
+        frames = self._split_batch_history(data, symbols)
+        if not any(_has_bars(frame) for frame in frames.values()) and any(map(self._is_known_symbol, symbols)):
+            raise EmptyHistoryError("No historical data returned for batch")
+        return frames
+
+    @single_flight('batch_quotes')
+    def _fetch_batch(self, missing, retries=3, delay=2, deadline=None):
+        """Download and cache quotes for a tuple of symbols in one multi-ticker call"""
+        results = {}
+        deadline = deadline or Deadline(self.request_budget)
+        if not self.rate_limiter.acquire(timeout=deadline.remaining()):
+            logging.warning(f"Request budget spent waiting for a token, skipping batch of {len(missing)} symbols")
+            return results
         
-        # Validate data
-        if pd.isna(current_price) or pd.isna(day_high) or pd.isna(day_low):
-            raise ValueError(f"Invalid data for {symbol}")
-            
-        return {
-            'symbol': symbol,
-            'name': info['name'],
-            'current_price': float(current_price),
-            'previous_price': float(previous_price),
-            'change': float(change),
-            'change_percent': float(change_percent),
-            'market_cap': info['marketCap'],
-            'volume': info['volume'],
-            'trailing_pe': info['trailingPE'],
-            'day_high': float(day_high),
-            'day_low': float(day_low),
-            'timestamp': datetime.now().isoformat()
-        }
+        for attempt in range(retries):
+            try:
+                logging.info(f"Fetching batch data for {len(missing)} symbols, attempt {attempt + 1} of {retries}")
+                frames = self.circuit_breaker.call(self._download_batch, list(missing))
+                
+                for symbol in missing:
+                    quote = self._get_stock_data(symbol, frames[symbol]) if symbol in frames else None
+                    if quote:
+                        self._cache_quote(symbol, quote)
+                        results[symbol] = quote
+                    elif not self._has_quote(symbol):
+                        # Never replace a known (possibly stale) quote with a negative entry
+                        self.last_fetch.set_negative(symbol, ttl=self.negative_cache_timeout)
+                break
+                
+            except CircuitOpenError as e:
+                logging.warning(f"Skipping batch fetch: {str(e)}")
+                break
+            except Exception as e:
+                if attempt == retries - 1:
+                    logging.error(f"Error fetching batch data after {retries} attempts: {str(e)}", exc_info=True)
+                    break
+                backoff = delay * (attempt + 1)  # Exponential backoff
+                if not deadline.allows(backoff):
+                    logging.warning(f"Batch attempt {attempt + 1} failed and the request budget is spent")
+                    break
+                logging.warning(f"Batch attempt {attempt + 1} failed, retrying...")
+                time.sleep(backoff)
+        
+        for symbol in missing:
+            if symbol not in results:
+                logging.warning(f"No batch data available for {symbol}")
+        
+        return results
+
+    def get_batch_stock_data(self, symbols, retries=3, delay=2, serve_stale=True, deadline=None):
+        """Get current data for several symbols with a single multi-ticker history call
 
-    def get_stock_data(self, symbol, retries=5, delay=5):
-        """Get current stock data with improved error handling and caching"""
+        If the fetch fails or the deadline runs out, symbols with an expired
+        cached quote still get that quote (flagged stale); others are omitted.
+        """
+        results = {}
+        missing = []
+        stale = []
+        fallback = {}
+        
+        for symbol in symbols:
+            entry = self.last_fetch.get_entry(symbol)
+            if entry is None or (entry.is_stale and not serve_stale):
+                missing.append(symbol)
+                if entry is not None and not entry.is_negative:
+                    fallback[symbol] = entry
+            elif entry.is_stale:
+                results[symbol] = self._stale_quote(entry)
+                stale.append(symbol)
+            elif not entry.is_negative:
+                results[symbol] = entry.value
+        
+        if stale:
+            self.refresher.submit(stale, self._refresh_quotes)
+        
+        if missing:
+            results.update(self._fetch_batch(tuple(missing), retries=retries, delay=delay, deadline=deadline))
+            for symbol, entry in fallback.items():
+                if symbol not in results:
+                    results[symbol] = self._stale_quote(entry)
+        
+        # Preserve the caller's ordering
+        return {symbol: results[symbol] for symbol in symbols if symbol in results}
+
+    @single_flight('stock_data')
+    def get_stock_data(self, symbol, retries=5, delay=5, serve_stale=True, deadline=None):
+        """Get current stock data with improved error handling and caching
+
+        With serve_stale, an expired cached quote is returned at once (flagged
+        stale) and refreshed in the background instead of blocking the caller.
+        Retries stop once the deadline (default request_budget) is spent; an
+        expired cached quote is then returned if there is one.
+        """
         try:
             # Validate input
             if not symbol or not isinstance(symbol, str):
                 raise ValueError(f"Invalid symbol: {symbol}")
             
-            # Check cache
-            if self._is_cached(symbol):
-                cached_data = self.last_fetch[symbol]
-                if 'data' in cached_data:
-                    return cached_data['data']
+            # Check cache; negative entries mark symbols that recently had no data
+            entry = self.last_fetch.get_entry(symbol)
+            if entry is not None and not entry.is_stale:
+                return None if entry.is_negative else entry.value
             
-            # Implement rate limiting with longer interval
-            time_since_last = time.time() - self.last_request_time
-            if time_since_last < self.request_interval:  # Minimum 3 seconds between requests
-                time.sleep(self.request_interval - time_since_last)
-            self.last_request_time = time.time()
-            
-            # Initialize variables
-            current_price = 0.0
-            day_high = 0.0
-            day_low = 0.0
-            info = {}
-            change = 0.0
-            change_percent = 0.0
-            
-            # Fetch data with retries
-            for attempt in range(retries):
-                try:
-                    logging.info(f"Attempting to fetch data for {symbol}, attempt {attempt + 1} of {retries}")
-                    
-                    stock = yf.Ticker(symbol)
-                    
-                    # Get historical data
-                    hist = stock.history(period='2d')
-                    if hist.empty:
-                        logging.warning(f"No historical data available for {symbol}")
-                        raise ValueError(f"No historical data available for {symbol}")
-                        
-                    # Get latest data point
-                    latest = hist.iloc[-1]
-                    
-                    # Get today's data
-                    current_price = float(latest.get('Close', 0.0))
-                    day_high = float(latest.get('High', 0.0))
-                    day_low = float(latest.get('Low', 0.0))
-                    
-                    # Get previous day's close for change calculation
-                    prev_close = None
-                    if len(hist) > 1:
-                        prev_row = hist.iloc[-2]
-                        prev_close = float(prev_row.get('Close', 0.0))
-                    
-                    # Calculate change and percentage change
-                    if prev_close is not None and prev_close > 0:
-                        try:
-                            change = current_price - prev_close
-                            change_percent = (change / prev_close) * 100
-                        except (TypeError, ValueError) as e:
-                            logging.warning(f"Error calculating change for {symbol}: {str(e)}")
-                            change = 0.0
-                            change_percent = 0.0
-                    
-                    # Get stock info
-                    info = self._get_stock_info(stock)
-                    
-                    # Cache the data
-                    self.last_fetch[symbol] = {
-                        'data': {
-                            'symbol': symbol,
-                            'name': info.get('name', symbol),
-                            'price': float(round(current_price, 2)),
-                            'change': float(round(change, 2)),
-                            'change_percent': float(round(change_percent, 2)),
-                            'volume': int(info.get('volume', 0)),
-                            'market_cap': int(info.get('marketCap', 0)),
-                            'pe_ratio': float(info.get('trailingPE', 0)),
-                            'day_high': float(round(day_high, 2)),
-                            'day_low': float(round(day_low, 2)),
-                            'timestamp': datetime.now().isoformat()
-                        },
-                        'timestamp': time.time()
-                    }
-                    
-                    return self.last_fetch[symbol]['data']
-                    
-                except Exception as e:
-                    if attempt == retries - 1:
-                        logging.error(f"Error fetching data for {symbol} after {retries} attempts: {str(e)}", exc_info=True)
-                        return None
-                    logging.warning(f"Attempt {attempt + 1} failed for {symbol}, retrying...")
-                    time.sleep(delay * (attempt + 1))  # Exponential backoff
-                    
-        except Exception as e:
-            logging.error(f"Critical error in get_stock_data for {symbol}: {str(e)}", exc_info=True)
-            return None
+            if entry is not None and serve_stale:
+                self.refresher.submit([symbol], self._refresh_quotes)
+                return self._stale_quote(entry)
             
-            # Implement rate limiting
-            time_since_last = time.time() - self.last_request_time
-            if time_since_last < self.request_interval:  # Minimum 1.5 seconds between requests
-                time.sleep(self.request_interval - time_since_last)
-            self.last_request_time = time.time()
-
-            # Initialize variables
-            current_price = 0.0
-            day_high = 0.0
-            day_low = 0.0
-            info = {}
-            change = 0.0
-            change_percent = 0.0
+            deadline = deadline or Deadline(self.request_budget)
+            fallback = self._stale_quote(entry) if entry is not None and not entry.is_negative else None
+            if not self.rate_limiter.acquire(timeout=deadline.remaining()):
+                logging.warning(f"Request budget spent waiting for a token for {symbol}")
+                return fallback
             
             # Fetch data with retries
             for attempt in range(retries):
                 try:
                     logging.info(f"Attempting to fetch data for {symbol}, attempt {attempt + 1} of {retries}")
                     
-                    stock = yf.Ticker(symbol)
-                    
                     # Get historical data
-                    hist = stock.history(period='2d')
-                    if hist.empty:
+                    hist = self.circuit_breaker.call(yf.Ticker(symbol).history, period='2d')
+                    if not _has_bars(hist):
+                        # Checked outside the breaker and not retried: an unknown symbol must not
+                        # count as an outage. One with a known quote keeps serving it
                         logging.warning(f"No historical data available for {symbol}")
-                        raise ValueError(f"No historical data available for {symbol}")
-                        
-                    # Get latest data point
-                    latest = hist.iloc[-1]
+                        if fallback is None:
+                            self.last_fetch.set_negative(symbol, ttl=self.negative_cache_timeout)
+                        return fallback
                     
-                    # Get today's data
-                    current_price = float(latest.get('Close', 0.0))
-                    day_high = float(latest.get('High', 0.0))
-                    day_low = float(latest.get('Low', 0.0))
-                    
-                    # Get previous day's close for change calculation
-                    prev_close = None
-                    if len(hist) > 1:
-                        prev_row = hist.iloc[-2]
-                        prev_close = float(prev_row.get('Close', 0.0))
-                    
-                    # Calculate change and percentage change
-                    if prev_close is not None and prev_close > 0:
-                        try:
-                            change = current_price - prev_close
-                            change_percent = (change / prev_close) * 100
-                        except (TypeError, ValueError) as e:
-                            logging.warning(f"Error calculating change for {symbol}: {str(e)}")
-                            change = 0.0
-                            change_percent = 0.0
-                    
-                    # Get stock info
-                    info = self._get_stock_info(stock)
+                    data = self._get_stock_data(symbol, hist)
+                    if not data:
+                        raise ValueError(f"Invalid historical data for {symbol}")
                     
                     # Cache the data
-                    self.last_fetch[symbol] = {
-                        'data': {
-                            'symbol': symbol,
-                            'name': info.get('name', symbol),
-                            'price': float(round(current_price, 2)),
-                            'change': float(round(change, 2)),
-                            'change_percent': float(round(change_percent, 2)),
-                            'volume': int(info.get('volume', 0)),
-                            'market_cap': int(info.get('marketCap', 0)),
-                            'pe_ratio': float(info.get('trailingPE', 0)),
-                            'day_high': float(round(day_high, 2)),
-                            'day_low': float(round(day_low, 2)),
-                            'timestamp': datetime.now().isoformat()
-                        },
-                        'timestamp': time.time()
-                    }
-                    
-                    return self.last_fetch[symbol]['data']
+                    self._cache_quote(symbol, data)
+                    return data
                     
+                except CircuitOpenError as e:
+                    logging.warning(f"Skipping fetch for {symbol}: {str(e)}")
+                    return fallback
                 except Exception as e:
                     if attempt == retries - 1:
                         logging.error(f"Error fetching data for {symbol} after {retries} attempts: {str(e)}", exc_info=True)
-                        return None
+                        return fallback
+                    backoff = delay * (attempt + 1)  # Exponential backoff
+                    if not deadline.allows(backoff):
+                        logging.warning(f"Attempt {attempt + 1} failed for {symbol} and the request budget is spent")
+                        return fallback
                     logging.warning(f"Attempt {attempt + 1} failed for {symbol}, retrying...")
-                    time.sleep(delay * (attempt + 1))  # Exponential backoff
+                    time.sleep(backoff)
                     
         except Exception as e:
             logging.error(f"Critical error in get_stock_data for {symbol}: {str(e)}", exc_info=True)
             return None
 
-            # Fetch data with retries
-            for attempt in range(retries):
-                try:
-                    yf.set_timeout(timeout)
-                    
-                    logging.info(f"Attempting to fetch data for {symbol}, attempt {attempt + 1} of {retries}")
-                    
-                    stock = yf.Ticker(symbol)
-                    
-                    # Get historical data with timeout
-                    hist = stock.history(period='2d', timeout=timeout)
-                    if hist.empty:
-                        logging.warning(f"No historical data available for {symbol}")
-                        raise ValueError(f"No historical data available for {symbol}")
-                        
-                    data = self._get_stock_data(symbol, hist)
-                    
-                    # Cache the data
-                    self.last_fetch[symbol] = {
-                        'data': data,
-                        'timestamp': time.time()
-                    }
-                    
-                    return data
-                    
-                except Exception as e:
-                    if attempt == retries - 1:  # Last attempt
-                        logging.error(f"Failed to fetch data for {symbol} after {retries} attempts: {str(e)}")
-                        raise
-                    else:
-                        logging.warning(f"Attempt {attempt + 1} failed for {symbol}: {str(e)}, retrying...")
-                        time.sleep(delay * (attempt + 1))  # Exponential backoff
-
-            # If we reach here, all retries failed
-            raise Exception(f"Failed to fetch data for {symbol} after {retries} attempts")
-
-        except Exception as e:
-            # Handle any other unexpected errors
-            logging.error(f"Critical error in get_stock_data for {symbol}: {str(e)}")
-            raise
+    def _period_start(self, period):
+        """First calendar date covered by a yfinance period string"""
+        today = date.today()
+        if period == 'ytd':
+            return date(today.year, 1, 1)
+        if period == 'max':
+            return date(1900, 1, 1)
+        if period not in PERIOD_DAYS:
+            raise ValueError(f"Unsupported period: {period}")
+        return today - timedelta(days=PERIOD_DAYS[period])
 
-    def get_historical_data(self, symbol, period='1mo', retries=3):
-        """Get historical stock data with retry mechanism"""
+    def _download_range(self, symbol, start, end, retries=3):
+        """Fetch daily bars for start <= day < end as store columns"""
         for attempt in range(retries):
             try:
-                yf = get_yf()
-                stock = yf.Ticker(symbol)
-                hist = stock.history(period=period)
-                
-                if hist.empty:
-                    if attempt == retries - 1:
-                        raise ValueError(f"No historical data available for {symbol}")
-                    continue
-                
-                data = []
-                for date, row in hist.iterrows():
-                    data.append({
-                        'date': date.strftime('%Y-%m-%d'),
-                        'open': round(row['Open'], 2),
-                        'high': round(row['High'], 2),
-                        'low': round(row['Low'], 2),
-                        'close': round(row['Close'], 2),
-                        'volume': int(row['Volume'])
-                    })
-                
-                return data
+                self.rate_limiter.acquire()
+                logging.info(f"Fetching history for {symbol} from {start} to {end}")
+                hist = self.circuit_breaker.call(
+                    yf.Ticker(symbol).history, start=start.isoformat(), end=end.isoformat(), interval='1d'
+                )
+                return frame_to_columns(hist.dropna(subset=['Close']))
+            except CircuitOpenError:
+                raise
             except Exception as e:
                 if attempt == retries - 1:
-                    logging.error(f"Error fetching historical data for {symbol} after {retries} attempts: {e}")
                     raise
-                logging.warning(f"Attempt {attempt + 1} failed for {symbol}, retrying...")
+                logging.warning(f"Attempt {attempt + 1} failed for {symbol} history: {e}, retrying...")
                 time.sleep(2 ** attempt)  # Exponential backoff
+
+    def _sync_history(self, symbol, start, retries=3):
+        """Make the local store cover start..today, fetching only the missing head and tail"""
+        with self.price_store.lock(symbol):
+            fetched = self._sync_store(symbol, start, retries)
+        # Mirror new bars into StockPrice outside the store lock
+        if self.database_service is not None:
+            for columns in fetched:
+                if len(columns['timestamp']):
+                    self.database_service.save_stock_prices(symbol, columns)
     
-    def get_top_indian_stocks(self):
-        """Get data for top Indian stocks"""
-        top_stocks = []
+    def _sync_store(self, symbol, start, retries):
+        """Fetch the store's missing ranges for symbol; returns the fetched column blocks"""
+        today = date.today()
+        tomorrow = today + timedelta(days=1)
+        store = self.price_store
         
-        for symbol, name in list(self.indian_stocks.items())[:10]:  # Get top 10
-            try:
-                data = self.get_stock_data(symbol)
-                top_stocks.append(data)
-            except Exception as e:
-                logging.warning(f"Failed to fetch data for {symbol}: {e}")
-                continue
+        coverage = store.coverage(symbol)
+        if coverage is None:
+            columns = self._download_range(symbol, start, tomorrow, retries)
+            if len(columns['timestamp']) == 0:
+                return []
+            store.rewrite(symbol, columns)
+            store.mark_synced(symbol, to_day(start), to_day(today), time.time())
+            return [columns]
+        
+        covered_start = coverage['start']
+        covered_end = coverage['end']
+        synced_at = coverage['synced_at']
+        fetched = []
+        
+        # Head gap: an older start than anything requested before
+        if to_day(start) < covered_start:
+            columns = self._download_range(symbol, start, from_day(covered_start), retries)
+            store.merge_head(symbol, columns)
+            fetched.append(columns)
+            covered_start = to_day(start)
+        
+        # Tail gap: new sessions since the last sync, or today's bar is older than the quote TTL
+        if covered_end < to_day(today) or time.time() - synced_at >= self.cache_timeout:
+            stored = store.read(symbol)
+            # Refetch from the last stored bar so a partial bar gets its final values
+            last_day = int(stored['timestamp'][-1]) if len(stored['timestamp']) else covered_end
+            columns = self._download_range(symbol, from_day(last_day), tomorrow, retries)
+            store.append(symbol, columns)
+            fetched.append(columns)
+            covered_end = to_day(today)
+            synced_at = time.time()
+        
+        if fetched:
+            store.mark_synced(symbol, covered_start, covered_end, synced_at)
+        return fetched
+
+    @single_flight('history_arrays')
+    def get_history_arrays(self, symbol, period='1mo', retries=3):
+        """Get daily OHLCV column arrays, served as memory-mapped slices of the local store"""
+        start = self._period_start(period)
+        try:
+            self._sync_history(symbol, start, retries)
+        except Exception as e:
+            # Serve whatever the store already holds
+            logging.error(f"Error syncing historical data for {symbol}: {e}")
         
-        return top_stocks
+        columns = self.price_store.read(symbol, start=to_day(start))
+        if len(columns['timestamp']) == 0:
+            raise ValueError(f"No historical data available for {symbol}")
+        return columns
+
+    @single_flight('historical_data')
+    def get_historical_data(self, symbol, period='1mo', retries=3, orient='records'):
+        """Get historical stock data from the local store, backfilling only missing dates
+
+        orient='records' returns a list of per-day dicts; orient='columns'
+        returns {'dates': [...], 'open': [...], ...} for charting.
+        """
+        columns = self.get_history_arrays(symbol, period=period, retries=retries)
+        return serialize_history(columns, orient=orient)
+    
+    def get_top_indian_stocks(self):
+        """Get data for top Indian stocks"""
+        symbols = list(self.indian_stocks)[:10]  # Get top 10
+        return list(self.get_batch_stock_data(symbols).values())
     
     def search_indian_stocks(self, query):
         """Search for Indian stocks by name or symbol"""
-        results = []
         query_lower = query.lower()
         
-        for symbol, name in self.indian_stocks.items():
-            if (query_lower in symbol.lower() or 
-                query_lower in name.lower()):
-                try:
-                    data = self.get_stock_data(symbol)
-                    results.append(data)
-                except Exception as e:
-                    logging.warning(f"Failed to fetch data for {symbol}: {e}")
-                    continue
-                
-                if len(results) >= 10:  # Limit results
-                    break
+        matches = [
+            symbol for symbol, name in self.indian_stocks.items()
+            if query_lower in symbol.lower() or query_lower in name.lower()
+        ][:10]  # Limit results
         
-        return results
+        if not matches:
+            return []
+        return list(self.get_batch_stock_data(matches).values())
@@ -8,13 +8,17 @@ from tweepy.errors import TweepyException, HTTPException, TooManyRequests
 import urllib.parse
 import time
 from functools import lru_cache
+from services.rate_limiter import get_rate_limiter, TWITTER_API_HOST
+from services.cache import get_cache
+from services.single_flight import single_flight
 
 class TwitterService:
     def __init__(self):
         self.bearer_token = os.getenv('TWITTER_BEARER_TOKEN', '')
-        self.last_request_time = 0
         self.request_interval = 60  # Increased to 60 seconds between requests
-        self.cache = {}
+        self.rate_limiter = get_rate_limiter(TWITTER_API_HOST, rate=1 / self.request_interval)
+        self.max_rate_limit_wait = 5  # Longest we block a web request waiting for a token
+        self.cache = get_cache('twitter', max_entries=256, max_bytes=8 * 1024 * 1024)
         self.cache_timeout = 300  # 5 minutes
         self.rate_limit_reset = None
         self.client = None
@@ -66,14 +70,13 @@ class TwitterService:
             time.sleep(wait_time + 1)  # Add a small buffer
 
     def _rate_limit_check(self):
-        """Check rate limit and wait if necessary"""
-        current_time = time.time()
-        if current_time - self.last_request_time < self.request_interval:
-            wait_time = self.request_interval - (current_time - self.last_request_time)
-            logging.warning(f"Rate limit hit. Waiting {wait_time:.1f} seconds...")
-            time.sleep(wait_time)
-        self.last_request_time = current_time
+        """Take a request token without blocking; False means serve from cache"""
+        if self.rate_limiter.try_acquire():
+            return True
+        logging.warning("Twitter rate limit reached, serving cached data")
+        return False
 
+    @single_flight('trending_stocks')
     def get_trending_stocks(self):
         """Get trending stocks from Twitter"""
         if self.use_cached_only:
@@ -83,7 +86,8 @@ class TwitterService:
         try:
             # Search for stock-related tweets
             query = "$ OR stock OR market OR trading lang:en"
-            self._rate_limit_check()
+            if not self._rate_limit_check():
+                return self.cache.get('trending_stocks', [])
             
             # Get recent tweets
             tweets = self.client.search_recent_tweets(
@@ -116,31 +120,25 @@ class TwitterService:
             )[:10]
             
             # Cache the results
-            self.cache['trending_stocks'] = {
-                'data': [{
-                    'symbol': symbol,
-                    'mentions': count
-                } for symbol, count in trending_stocks],
-                'timestamp': time.time()
-            }
+            data = [{
+                'symbol': symbol,
+                'mentions': count
+            } for symbol, count in trending_stocks]
+            self.cache.set('trending_stocks', data, ttl=self.cache_timeout)
             
-            return self.cache['trending_stocks']['data']
+            return data
             
         except TooManyRequests as e:
             logging.warning("Rate limit hit while fetching trending stocks")
             self._wait_for_rate_limit()
             
             # Return cached data if available
-            if 'trending_stocks' in self.cache:
-                cached_data = self.cache['trending_stocks']
-                if time.time() - cached_data['timestamp'] < self.cache_timeout:
-                    return cached_data['data']
-            
-            return []
+            return self.cache.get('trending_stocks', [])
         except Exception as e:
             logging.error(f"Error fetching trending stocks: {str(e)}", exc_info=True)
             return []
 
+    @single_flight('tweets')
     def get_tweets(self, query, max_results=20):
         """Get tweets with rate limiting"""
         if self.use_cached_only:
@@ -148,7 +146,8 @@ class TwitterService:
             return []
             
         try:
-            self._rate_limit_check()
+            if not self._rate_limit_check():
+                return self.cache.get(f"tweets_{query}", [])
             
             tweets = self.client.search_recent_tweets(
                 query=query,
@@ -174,12 +173,8 @@ class TwitterService:
                     'quote_count': tweet.public_metrics['quote_count']
                 })
             
-            # Cache the results
-            cache_key = f"tweets_{hash(query)}"
-            self.cache[cache_key] = {
-                'data': processed_tweets,
-                'timestamp': time.time()
-            }
+            # Cache the results; keyed on the query itself so every worker shares the key
+            self.cache.set(f"tweets_{query}", processed_tweets, ttl=self.cache_timeout)
             
             return processed_tweets
             
@@ -188,70 +183,26 @@ class TwitterService:
             self._wait_for_rate_limit()
             
             # Return cached data if available
-            cache_key = f"tweets_{hash(query)}"
-            if cache_key in self.cache:
-                cached_data = self.cache[cache_key]
-                if time.time() - cached_data['timestamp'] < self.cache_timeout:
-                    return cached_data['data']
-            
-            return []
+            return self.cache.get(f"tweets_{query}", [])
         except Exception as e:
             logging.error(f"Error fetching tweets: {str(e)}", exc_info=True)
             return []
     
-    def _is_cached(self, key):
-        """Check if data is in cache and not expired"""
-        if key not in self.cache:
-            return False
-            
-        if 'timestamp' not in self.cache[key]:
-            return False
-            
-        elapsed = (datetime.now() - self.cache[key]['timestamp']).total_seconds()
-        return elapsed < self.cache_timeout
-    
-    def _get_cached(self, key, default=None):
-        """Get cached data if available"""
-        if self._is_cached(key):
-            return self.cache[key]['data']
-        return default
-    
-    def _cache_result(self, key, data):
-        """Cache data with timestamp"""
-        self.cache[key] = {
-            'data': data,
-            'timestamp': datetime.now()
-        }
-    
-    def _rate_limit(self):
-        """Ensure we don't hit rate limits by enforcing minimum interval between requests"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        if time_since_last < self.request_interval:
-            sleep_time = self.request_interval - time_since_last
-            logging.info(f"Rate limiting: Sleeping for {sleep_time:.2f} seconds")
-            time.sleep(sleep_time)
-        
-        self.last_request_time = current_time
+    def _rate_limit(self, timeout=None):
+        """Wait for a request token from the shared Twitter limiter"""
+        return self.rate_limiter.acquire(timeout=timeout)
     
     def get_stock_sentiment(self, symbol, max_retries=3):
         """Get sentiment score for a stock symbol with improved rate limiting"""
         try:
             # Check cache
-            if self._is_cached(symbol):
-                cached_data = self.cache[symbol]
-                if 'sentiment' in cached_data:
-                    return cached_data['sentiment']
-                return None
+            cached = self.cache.get(f"sentiment_{symbol}")
+            if cached is not None:
+                return cached
             
             # Rate limiting
-            current_time = time.time()
-            if hasattr(self, 'last_request_time'):
-                time_since_last = current_time - self.last_request_time
-                if time_since_last < self.request_interval:
-                    time.sleep(self.request_interval - time_since_last)
-            self.last_request_time = current_time
+            if not self._rate_limit(timeout=self.max_rate_limit_wait):
+                return 50  # Neutral sentiment
             
             # Get tweets mentioning the stock
             query = f"${symbol} lang:en"
@@ -305,10 +256,7 @@ class TwitterService:
                 total_sentiment += sentiment_score
             
             # Cache result
-            self.cache[symbol] = {
-                'sentiment': total_sentiment / len(tweets),
-                'timestamp': time.time()
-            }
+            self.cache.set(f"sentiment_{symbol}", total_sentiment / len(tweets), ttl=self.cache_timeout)
             
             return total_sentiment / len(tweets)
             
@@ -324,7 +272,7 @@ class TwitterService:
         try:
             # Check cache first
             cache_key = 'overall_sentiment'
-            cached = self._get_cached(cache_key, None)
+            cached = self.cache.get(cache_key, None)
             if cached is not None:
                 return cached
                 
@@ -368,7 +316,7 @@ class TwitterService:
             
             # Calculate average and cache
             avg_sentiment = total_sentiment / len(tweets)
-            self._cache_result(cache_key, avg_sentiment)
+            self.cache.set(cache_key, avg_sentiment, ttl=self.cache_timeout)
             
             # Return as float
             return float(avg_sentiment)
@@ -377,17 +325,9 @@ class TwitterService:
             logging.error(f"Error calculating overall sentiment: {e}", exc_info=True)
             return 50.0  # Return neutral sentiment as float on error
     
-    def _rate_limit(self):
-        """Ensure we don't hit rate limits by enforcing minimum interval between requests"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        if time_since_last < self.request_interval:
-            sleep_time = self.request_interval - time_since_last
-            logging.info(f"Rate limiting: Sleeping for {sleep_time:.2f} seconds")
-            time.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
+    def _rate_limit(self, timeout=None):
+        """Wait for a request token from the shared Twitter limiter"""
+        return self.rate_limiter.acquire(timeout=timeout)
     
     @lru_cache(maxsize=128)
     def get_user_tweets(self, username, limit=10):
@@ -415,7 +355,8 @@ class TwitterService:
             return 50  # Neutral sentiment
             
         try:
-            self._rate_limit()
+            if not self._rate_limit(timeout=self.max_rate_limit_wait):
+                return 50  # Neutral sentiment
             
             # Remove .NS suffix for search
             clean_symbol = symbol.replace('.NS', '').replace('.BO', '')
@@ -529,6 +470,7 @@ class TwitterService:
         
         return min(100, score)  # Cap at 100
     
+    @single_flight('financial_tweets')
     def get_financial_tweets(self, stock_symbol=None, limit=20):
         """Get tweets about a specific stock"""
         if not self.client:
@@ -537,6 +479,9 @@ class TwitterService:
         all_tweets = []
         
         try:
+            if not self._rate_limit(timeout=self.max_rate_limit_wait):
+                return []
+            
             # Search for tweets containing the stock symbol
             query = f"${stock_symbol} lang:en"
             tweets = self.client.search_recent_tweets(
@@ -577,12 +522,20 @@ class TwitterService:
             logging.error(f"Error fetching tweets: {e}")
             return []
     
+    @single_flight('stock_sentiment')
     def get_stock_sentiment(self, symbol):
         """Get sentiment for a specific stock"""
         if not self.client:
             return 50  # Neutral sentiment
             
         try:
+            cached = self.cache.get(f"sentiment_{symbol}")
+            if cached is not None:
+                return cached
+            
+            if not self._rate_limit(timeout=self.max_rate_limit_wait):
+                return 50  # Neutral sentiment
+            
             # Remove .NS suffix for search
             clean_symbol = symbol.replace('.NS', '').replace('.BO', '')
             query = f'${clean_symbol} OR "{clean_symbol}" (stock OR share OR market) -is:retweet lang:en'
@@ -602,8 +555,9 @@ class TwitterService:
                 count += 1
             
             if count > 0:
-                average_sentiment = total_sentiment / count
-                return round(average_sentiment, 2)
+                average_sentiment = round(total_sentiment / count, 2)
+                self.cache.set(f"sentiment_{symbol}", average_sentiment, ttl=self.cache_timeout)
+                return average_sentiment
             else:
                 return 50  # Neutral if no tweets found
                 
@@ -611,6 +565,7 @@ class TwitterService:
             logging.error(f"Error getting sentiment for {symbol}: {e}")
             return 50
     
+    @single_flight('overall_sentiment')
     def get_overall_sentiment(self):
         """Get overall market sentiment"""
         try:
@@ -99,7 +99,7 @@ async function loadStockData(symbol) {
     utils.hideError('error-state');
     
     try {
-        const data = await utils.apiCall(`${API_ENDPOINTS.stockData}/${symbol}`);
+        const data = await utils.apiCall(`${API_ENDPOINTS.stockData}/${symbol}?period=${currentTimeframe}&format=columns`);
         
         // Update stock details
         updateStockDetails(data.current);
@@ -143,17 +143,17 @@ function updateStockDetails(stock) {
 
 function createPriceChart(historicalData, symbol) {
     const ctx = document.getElementById('priceChart');
-    if (!ctx || !historicalData) return;
+    if (!ctx || !historicalData || !historicalData.dates) return;
     
     // Destroy existing chart
     if (priceChart) {
         priceChart.destroy();
     }
     
-    // Prepare chart data
-    const labels = historicalData.map(item => new Date(item.date).toLocaleDateString('en-IN', { month: 'short', day: 'numeric' }));
-    const prices = historicalData.map(item => item.close);
-    const volumes = historicalData.map(item => item.volume);
+    // Prepare chart data; the column-oriented response maps straight onto datasets
+    const labels = historicalData.dates.map(date => new Date(date).toLocaleDateString('en-IN', { month: 'short', day: 'numeric' }));
+    const prices = historicalData.close;
+    const volumes = historicalData.volume;
     
     // Determine color based on price trend
     const firstPrice = prices[0];
@@ -248,7 +248,7 @@ async function changeTimeframe(timeframe) {
     
     // Reload data with new timeframe
     try {
-        const data = await utils.apiCall(`${API_ENDPOINTS.stockData}/${currentSymbol}?period=${timeframe}`);
+        const data = await utils.apiCall(`${API_ENDPOINTS.stockData}/${currentSymbol}?period=${timeframe}&format=columns`);
         createPriceChart(data.historical, currentSymbol);
     } catch (error) {
         console.error('Failed to load data for timeframe:', error);
@@ -0,0 +1,29 @@
+import os
+import atexit
+import shutil
+import tempfile
+
+import pytest
+
+# Isolate every store the services touch before app or any service is imported
+WORK_DIR = tempfile.mkdtemp(prefix='tweetstocksense-tests-')
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORK_DIR, 'test.db')}"
+os.environ['CACHE_BACKEND'] = 'memory'
+os.environ['CACHE_PATH'] = os.path.join(WORK_DIR, 'cache.db')
+os.environ['PRICE_STORE_PATH'] = os.path.join(WORK_DIR, 'price_store')
+os.environ['PREDICTION_MODEL_PATH'] = os.path.join(WORK_DIR, 'models')
+os.environ['TWITTER_BEARER_TOKEN'] = ''
+
+
+@pytest.fixture
+def database():
+    """The app's SQLAlchemy handle inside an app context, with every table emptied afterwards"""
+    from app import app, db
+
+    with app.app_context():
+        yield db
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from services.prediction_service import PredictionService
+from services.backtest_service import BacktestService
+
+
+def columns(length=300, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, length)))
+    return {
+        'timestamp': np.arange(18000, 18000 + length, dtype=np.int64),
+        'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+        'volume': rng.integers(10**5, 10**6, length).astype(np.float64)
+    }
+
+
+@pytest.fixture
+def backtest():
+    prediction_service = PredictionService(stock_service=object())
+    prediction_service.model = None
+    return BacktestService(prediction_service)
+
+
+def test_positions_follow_the_predicted_change(backtest):
+    result = backtest.evaluate(columns())
+    entry = result['actual'] / (1 + result['realized'])
+    change = result['predicted'] / entry - 1
+    expected = np.where(np.abs(change) > backtest.flat_threshold, np.sign(change), 0)
+    np.testing.assert_array_equal(result['position'], expected)
+    assert (result['position'] > 0).any() and (result['position'] < 0).any()
+
+
+def test_weights_change_the_trades(backtest):
+    trend = backtest.evaluate(columns(), weights={'trend': 1.0, 'momentum': 0, 'mean_reversion': 0, 'sentiment': 0})
+    reversion = backtest.evaluate(columns(), weights={'trend': 0, 'momentum': 0, 'mean_reversion': 1.0, 'sentiment': 0})
+    assert (trend['position'] != reversion['position']).mean() > 0.2
+
+
+def test_sentiment_score_is_replayed_on_every_bar(backtest):
+    weights = {'trend': 0, 'momentum': 0, 'mean_reversion': 0, 'sentiment': 1.0}
+    assert not backtest.evaluate(columns(), weights=weights)['position'].any()
+    bullish = backtest.evaluate(columns(), weights=weights, sentiment_score=80)
+    assert (bullish['position'] == 1).all()
+
+
+class FakeDatabase:
+    def __init__(self, history):
+        self.history = history
+
+    def get_price_history(self, symbols=None):
+        return self.history
+
+    def get_daily_sentiment(self, symbols):
+        return {}, {}
+
+
+@pytest.mark.parametrize('refit', [True, False])
+def test_model_backtests_only_score_bars_after_its_training_window(backtest, tmp_path, monkeypatch, refit):
+    from services.model_training import train_model
+    from services.prediction_model import load_model
+
+    monkeypatch.setenv('PREDICTION_MODEL_PATH', str(tmp_path))
+    history = {f'S{i}.NS': columns(seed=i) for i in range(3)}
+    result = train_model(backtest.prediction_service, FakeDatabase(history), version='test', refit=refit)
+    backtest.prediction_service.model = model = load_model('test')
+    backtest.database_service = FakeDatabase(history)
+
+    report = backtest.run()
+    assert report['evaluated_after'] == result['training_window']['end']
+    if refit:
+        # Fitted on every day with a known outcome, so none is left to evaluate
+        assert report['overall'] is None
+    else:
+        days = np.concatenate([backtest.evaluate(c)['day'] for c in history.values()])
+        assert report['overall']['bars'] == int((days > model.trained_through).sum()) > 0
+
+    # Fixed weights are not fitted to any days and are evaluated throughout
+    assert backtest.run(weights=backtest.prediction_service.weights)['evaluated_after'] is None
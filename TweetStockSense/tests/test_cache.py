@@ -0,0 +1,88 @@
+import time
+
+from services.cache import (
+    CacheEntry, MemoryCache, SQLiteCache, TieredCache, NEGATIVE, get_cache, get_cache_stats
+)
+
+
+def worker_cache(path, namespace='quotes'):
+    """One worker's view: its own local tier in front of the shared SQLite file"""
+    return TieredCache(namespace, MemoryCache(namespace), SQLiteCache(namespace, path=path))
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache('test', max_entries=2)
+    cache.set('a', 1, ttl=60)
+    cache.set('b', 2, ttl=60)
+    cache.get('a')
+    cache.set('c', 3, ttl=60)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.info()['evictions'] == 1
+
+
+def test_memory_cache_bounds_bytes():
+    cache = MemoryCache('test', max_entries=100, max_bytes=300)
+    for i in range(10):
+        cache.set(i, 'x' * 100, ttl=60)
+    assert cache.size_bytes <= 300
+    assert len(cache) < 10
+
+
+def test_stale_entries_are_kept_until_expiry():
+    cache = MemoryCache('test')
+    cache.set_entry('a', CacheEntry('old', time.time() - 10, time.time() - 5, time.time() + 60))
+    assert cache.get('a') is None  # get() only serves fresh values
+    entry = cache.get_entry('a')
+    assert entry.value == 'old' and entry.is_stale
+
+
+def test_negative_entries_survive_the_shared_tier(tmp_path):
+    shared = SQLiteCache('test', path=str(tmp_path / 'cache.db'))
+    shared.set_negative('MISSING.NS', ttl=60)
+    assert shared.get_entry('MISSING.NS').is_negative
+    assert shared.get('MISSING.NS') is NEGATIVE
+
+
+def test_shared_tier_fills_an_empty_local_tier(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    worker_a, worker_b = worker_cache(path), worker_cache(path)
+    worker_b.set('TCS.NS', 'quote', ttl=60)
+    assert worker_a.get('TCS.NS') == 'quote'
+    assert worker_a.local.get('TCS.NS') == 'quote'
+
+
+def test_stale_local_entry_yields_to_a_fresher_shared_one(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    worker_a, worker_b = worker_cache(path), worker_cache(path)
+    now = time.time()
+    worker_a.set_entry('TCS.NS', CacheEntry('old', now - 10, now - 5, now + 60))
+
+    worker_b.set('TCS.NS', 'new', ttl=60)
+
+    entry = worker_a.get_entry('TCS.NS')
+    assert entry.value == 'new' and not entry.is_stale
+    assert worker_a.local.get('TCS.NS') == 'new'
+
+
+def test_stale_local_entry_is_kept_over_an_older_shared_one(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = worker_cache(path)
+    now = time.time()
+    cache.shared.set_entry('TCS.NS', CacheEntry('older', now - 20, now - 15, now + 60))
+    cache.local.set_entry('TCS.NS', CacheEntry('old', now - 10, now - 5, now + 60))
+    assert cache.get_entry('TCS.NS').value == 'old'
+
+
+def test_fresh_local_entry_skips_the_shared_tier(tmp_path):
+    cache = worker_cache(str(tmp_path / 'cache.db'))
+    cache.set('TCS.NS', 'quote', ttl=60)
+    cache.get_entry('TCS.NS')
+    assert cache.shared.stats.as_dict()['hits'] == 0
+
+
+def test_registered_caches_report_stats():
+    cache = get_cache('tests-registry', max_entries=4)
+    assert get_cache('tests-registry') is cache
+    cache.set('a', 1, ttl=60)
+    assert get_cache_stats()['tests-registry']['local']['sets'] == 1
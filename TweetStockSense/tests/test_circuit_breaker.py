@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError, Deadline, CLOSED, OPEN, HALF_OPEN
+
+
+def fail():
+    raise ConnectionError('upstream down')
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+
+def test_opens_after_consecutive_failures_and_rejects_calls():
+    breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=60)
+    trip(breaker)
+    assert breaker.state == OPEN
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(calls.append, 1)
+    assert calls == []
+    stats = breaker.stats()
+    assert stats['times_opened'] == 1
+    assert stats['rejected'] == 1
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker('test', failure_threshold=3)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.call(lambda: 'ok') == 'ok'
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_closes_on_success():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0.05)
+    trip(breaker)
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()  # Only one probe at a time
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = CircuitBreaker('test', failure_threshold=5, reset_timeout=0.05)
+    trip(breaker)
+    time.sleep(0.06)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+    assert breaker.stats()['times_opened'] == 2
+
+
+def test_deadline_budget():
+    deadline = Deadline(0.05)
+    assert deadline.allows(0.01)
+    assert not deadline.allows(1)
+    time.sleep(0.06)
+    assert deadline.expired
+    assert deadline.remaining() == 0.0
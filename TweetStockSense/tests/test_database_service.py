@@ -0,0 +1,234 @@
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pytest
+
+from services.database_service import DatabaseService
+from models import Prediction, PriceRollup, Stock, StockPrice
+
+
+def bars(start, count, step=timedelta(days=1), price=100.0):
+    timestamps = np.array([start + step * i for i in range(count)], dtype='datetime64[us]')
+    close = price + np.arange(count, dtype=np.float64)
+    return {
+        'timestamp': timestamps, 'open': close - 0.5, 'high': close + 1, 'low': close - 1, 'close': close,
+        'volume': np.full(count, 1000, dtype=np.int64)
+    }
+
+
+def test_rows_created_for_prices_carry_no_metadata(database):
+    service = DatabaseService()
+    service.save_stock_prices('TCS.NS', bars(datetime(2024, 1, 1), 3))
+    service.get_or_create_stock('INFY.NS', current_price=1500.0)
+    assert service.get_stock_metadata() == {}
+
+
+def test_saved_metadata_is_loaded_with_its_own_timestamp(database):
+    service = DatabaseService()
+    service.save_stock_metadata('TCS.NS', {'name': 'Tata Consultancy', 'market_cap': 10**12, 'pe_ratio': 30.5})
+    stock = Stock.query.filter_by(symbol='TCS.NS').one()
+    stock.last_updated = datetime.utcnow() + timedelta(days=3)
+    database.session.commit()
+
+    metadata = service.get_stock_metadata()['TCS.NS']
+    assert metadata['name'] == 'Tata Consultancy'
+    assert metadata['market_cap'] == 10**12
+    assert metadata['updated_at'] == stock.metadata_updated
+
+
+def test_quote_updates_keep_stored_metadata(database):
+    service = DatabaseService()
+    service.save_stock_metadata('TCS.NS', {'name': 'Tata Consultancy', 'market_cap': 10**12, 'pe_ratio': 30.5})
+    saved_at = Stock.query.filter_by(symbol='TCS.NS').one().metadata_updated
+    service.get_or_create_stock('TCS.NS', current_price=3500.0, day_high=3550.0, day_low=3480.0)
+
+    stock = Stock.query.filter_by(symbol='TCS.NS').one()
+    assert (stock.name, stock.market_cap, stock.pe_ratio) == ('Tata Consultancy', 10**12, 30.5)
+    assert stock.current_price == 3500.0
+    assert stock.metadata_updated == saved_at
+
+
+def tweet(tweet_id, text='NIFTY looks strong'):
+    return {
+        'id': tweet_id, 'text': text, 'username': 'trader', 'created_at': '2024-03-01T09:30:00Z',
+        'sentiment': {'score': 70.0, 'label': 'positive', 'polarity': 0.4}
+    }
+
+
+def test_save_tweets_counts_duplicates_and_invalid_rows(database):
+    service = DatabaseService()
+    assert service.save_tweets([tweet('1'), tweet('2')])['inserted'] == 2
+    counts = service.save_tweets([tweet('2'), tweet('3'), tweet('3'), {'id': '4'}])
+    assert counts == {'inserted': 1, 'skipped': 2, 'invalid': 1, 'failed': 0}
+
+
+def test_save_tweets_reports_a_failed_transaction(database, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(database.session, 'execute', fail)
+    counts = DatabaseService().save_tweets([tweet('1'), tweet('2'), {'id': '3'}])
+    assert counts == {'inserted': 0, 'skipped': 0, 'invalid': 1, 'failed': 2}
+
+
+def stored_closes(symbol):
+    stock = Stock.query.filter_by(symbol=symbol).one()
+    rows = StockPrice.query.filter_by(stock_id=stock.id).order_by(StockPrice.timestamp).all()
+    return [(row.timestamp, row.close_price) for row in rows]
+
+
+def rollups(symbol):
+    stock = Stock.query.filter_by(symbol=symbol).one()
+    rows = PriceRollup.query.filter_by(stock_id=stock.id).order_by(PriceRollup.resolution, PriceRollup.bucket)
+    return [
+        (row.resolution, row.bucket, row.open_price, row.high_price, row.low_price, row.close_price,
+         row.volume, row.bar_count)
+        for row in rows
+    ]
+
+
+@pytest.mark.parametrize('chunk_size', [5000, 2])
+def test_save_stock_prices_upserts_on_timestamp(database, chunk_size):
+    service = DatabaseService()
+    assert service.save_stock_prices('TCS.NS', bars(datetime(2024, 1, 1), 5), chunk_size=chunk_size) == 5
+    revised = bars(datetime(2024, 1, 4), 3, price=200.0)
+    assert service.save_stock_prices('TCS.NS', revised, chunk_size=chunk_size) == 3
+
+    closes = stored_closes('TCS.NS')
+    assert [close for _, close in closes] == [100.0, 101.0, 102.0, 200.0, 201.0, 202.0]
+    assert closes[-1][0] == datetime(2024, 1, 6)
+
+
+def test_upsert_keeps_the_stored_change_of_a_blocks_first_bar(database):
+    service = DatabaseService()
+    service.save_stock_prices('TCS.NS', bars(datetime(2024, 1, 1), 3))
+    service.save_stock_prices('TCS.NS', bars(datetime(2024, 1, 3), 1, price=110.0))
+    row = StockPrice.query.order_by(StockPrice.timestamp.desc()).first()
+    assert (row.close_price, row.price_change) == (110.0, 1.0)
+
+
+def test_rollups_aggregate_the_stored_bars(database):
+    service = DatabaseService()
+    hourly = bars(datetime(2024, 1, 1, 9), 24 * 10, step=timedelta(hours=1))
+    service.save_stock_prices('INFY.NS', hourly, interval='1h')
+
+    daily = [row for row in rollups('INFY.NS') if row[0] == '1d']
+    assert len(daily) == 11
+    # 2024-01-02 holds hours 15..38 of the block
+    _, bucket, open_price, high, low, close, volume, count = daily[1]
+    assert bucket == datetime(2024, 1, 2)
+    assert (open_price, close) == (hourly['open'][15], hourly['close'][38])
+    assert (high, low) == (hourly['high'][38], hourly['low'][15])
+    assert (volume, count) == (24 * 1000, 24)
+    assert {row[0] for row in rollups('INFY.NS')} == {'1d', '1w'}
+
+
+def test_incremental_rollups_match_a_rebuild(database):
+    service = DatabaseService()
+    hourly = bars(datetime(2024, 1, 1, 9), 24 * 20, step=timedelta(hours=1))
+    halves = [{field: values[:300] for field, values in hourly.items()},
+              {field: values[250:] for field, values in hourly.items()}]
+    for half in halves:
+        service.save_stock_prices('INFY.NS', half, interval='1h')
+    incremental = rollups('INFY.NS')
+
+    service.rebuild_rollups(['INFY.NS'], interval='1h')
+    assert rollups('INFY.NS') == incremental
+
+
+def test_cleanup_prunes_rollups_with_their_bars(database):
+    service = DatabaseService()
+    start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(days=20)
+    service.save_stock_prices('INFY.NS', bars(start, 24 * 20, step=timedelta(hours=1)), interval='1h')
+    service.save_stock_prices('TCS.NS', bars(start, 20))
+    service.cleanup_old_data(days=10)
+    pruned = {symbol: rollups(symbol) for symbol in ('INFY.NS', 'TCS.NS')}
+
+    # The day the cutoff falls in keeps only its later hours
+    first_day = pruned['INFY.NS'][0]
+    assert first_day[0] == '1d' and first_day[1] == datetime.combine(stored_closes('INFY.NS')[0][0].date(), time())
+    assert first_day[-1] < 24
+    for symbol, interval in (('INFY.NS', '1h'), ('TCS.NS', '1d')):
+        service.rebuild_rollups([symbol], interval=interval)
+        assert rollups(symbol) == pruned[symbol]
+
+
+def test_price_bars_use_the_coarsest_resolution_with_enough_points(database):
+    service = DatabaseService()
+    service.save_stock_prices('INFY.NS', bars(datetime(2024, 1, 1), 24 * 30, step=timedelta(hours=1)),
+                              interval='1h')
+    assert service.get_price_bars('INFY.NS', points=3)['resolution'] == '1w'
+    assert service.get_price_bars('INFY.NS', points=20)['resolution'] == '1d'
+    raw = service.get_price_bars('INFY.NS', points=100)
+    assert raw['resolution'] == 'raw' and len(raw['close']) == 24 * 30
+    ranged = service.get_price_bars('INFY.NS', start=datetime(2024, 1, 8), end=datetime(2024, 1, 15), points=5)
+    assert ranged['resolution'] == '1d' and len(ranged['close']) == 7
+    assert service.get_price_bars('UNKNOWN.NS') is None
+
+
+def seed_predictions(database, symbols, count=40, seed=0):
+    """Daily bars up to yesterday and predictions at odd seconds over the last 35 days"""
+    service = DatabaseService()
+    rng = np.random.default_rng(seed)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    for symbol in symbols:
+        prices = bars(today - timedelta(days=41), 41)  # Through yesterday, so today's predictions have no outcome
+        prices['close'] = 100 + np.round(rng.normal(0, 2, 41), 2)
+        prices['close'][10:12] = 100.0  # A flat stretch for the no-move rule
+        service.save_stock_prices(symbol, prices)
+        stock = Stock.query.filter_by(symbol=symbol).one()
+        # The first is made today, after the last bar
+        for i in range(count):
+            at = today - timedelta(days=int(rng.integers(0, 35)), seconds=int(rng.integers(1, 86400))) if i else today
+            current = float(rng.choice([100.0, prices['close'][0]]))
+            change = float(rng.choice([-1.5, 0.0, 2.0]))
+            database.session.add(Prediction(stock_id=stock.id, symbol=symbol, current_price=current,
+                                            predicted_price=current + change, prediction_date=at))
+        database.session.commit()  # save_stock_prices writes from its own session
+
+
+def loop_accuracy(symbol, days, horizon=None):
+    """The per-prediction lookups get_prediction_accuracy used to run, with the bars ordered"""
+    stock = Stock.query.filter_by(symbol=symbol).one()
+    predictions = Prediction.query.filter(
+        Prediction.stock_id == stock.id,
+        Prediction.prediction_date >= datetime.utcnow() - timedelta(days=days)
+    ).all()
+    evaluated = accurate = 0
+    for prediction in predictions:
+        if horizon is None:
+            after = StockPrice.timestamp > prediction.prediction_date
+        else:
+            after = StockPrice.timestamp >= prediction.prediction_date + timedelta(days=horizon)
+        price = StockPrice.query.filter(StockPrice.stock_id == stock.id, after).order_by(StockPrice.timestamp).first()
+        if price:
+            evaluated += 1
+            predicted_change = prediction.predicted_price - prediction.current_price
+            actual_change = price.close_price - prediction.current_price
+            if (predicted_change > 0 and actual_change > 0) or \
+               (predicted_change < 0 and actual_change < 0) or \
+               (abs(predicted_change) < 0.01 and abs(actual_change) < 0.01):
+                accurate += 1
+    return len(predictions), evaluated, accurate
+
+
+def test_accuracy_report_matches_the_per_prediction_loop(database):
+    seed_predictions(database, ['TCS.NS', 'INFY.NS', 'WIPRO.NS'])
+    report = DatabaseService().get_accuracy_report(['TCS.NS', 'INFY.NS'], days=30)
+    assert sorted(report) == ['INFY.NS', 'TCS.NS']
+
+    for symbol, summary in report.items():
+        total, evaluated, accurate = loop_accuracy(symbol, 30)
+        assert total == summary['total_predictions'] > evaluated
+        assert (summary['evaluated_predictions'], summary['accurate_predictions']) == (evaluated, accurate)
+        # Over evaluated predictions only; predictions without a later bar yet no longer count as misses
+        assert summary['accuracy_percent'] == round(accurate / evaluated * 100, 2)
+        for horizon in (1, 5, 20):
+            _, evaluated, accurate = loop_accuracy(symbol, 30, horizon)
+            outcome = summary['horizons'][f'{horizon}d']
+            assert (outcome['evaluated_predictions'], outcome['accurate_predictions']) == (evaluated, accurate)
+            assert outcome['accuracy_percent'] == (round(accurate / evaluated * 100, 2) if evaluated else None)
+
+    assert DatabaseService().get_prediction_accuracy('WIPRO.NS') == \
+        DatabaseService().get_accuracy_report(days=30)['WIPRO.NS']
+    assert DatabaseService().get_prediction_accuracy('UNKNOWN.NS') is None
@@ -0,0 +1,65 @@
+import json
+
+import numpy as np
+
+from services import indicators
+from services.indicator_state import IndicatorState
+
+
+def history(length=120, seed=5):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+    return {
+        'timestamp': np.arange(19000, 19000 + length, dtype=np.int64),
+        'close': close, 'high': close * 1.01, 'low': close * 0.98,
+        'volume': rng.integers(10**5, 10**6, length).astype(np.float64)
+    }
+
+
+def head(columns, end):
+    return {field: values[:end] for field, values in columns.items()}
+
+
+def assert_matches_full_recompute(state, columns):
+    series = indicators.compute_indicators(columns['close'], columns['volume'], columns['high'], columns['low'])
+    values = state.values()
+    for name, full in series.items():
+        np.testing.assert_allclose(values[name], full[-1], rtol=1e-9, equal_nan=True, err_msg=name)
+
+
+def test_bar_by_bar_updates_match_a_full_recompute():
+    columns = history()
+    state = IndicatorState()
+    for end in (1, 10, 40, 120):
+        state.extend({field: values[state.count:end] for field, values in columns.items()})
+        assert state.count == end
+        assert_matches_full_recompute(state, head(columns, end))
+
+
+def test_revising_the_last_bar_replaces_it():
+    columns = history()
+    state = IndicatorState()
+    state.extend(columns)
+    state.update(int(columns['timestamp'][-1]), 50.0, 1000, 51.0, 49.0)
+
+    revised = {field: values.copy() for field, values in columns.items()}
+    revised['close'][-1], revised['volume'][-1], revised['high'][-1], revised['low'][-1] = 50.0, 1000, 51.0, 49.0
+    assert state.count == len(columns['close'])
+    assert_matches_full_recompute(state, revised)
+
+
+def test_older_bars_are_ignored():
+    state = IndicatorState()
+    state.extend(history(10))
+    assert state.update(18000, 1.0) is False
+
+
+def test_state_survives_a_json_round_trip():
+    columns = history()
+    state = IndicatorState()
+    state.extend(head(columns, 100))
+    restored = IndicatorState.from_dict(json.loads(json.dumps(state.to_dict())))
+
+    # Revise the last stored bar, then continue with new ones
+    restored.extend({field: values[99:] for field, values in columns.items()})
+    assert_matches_full_recompute(restored, columns)
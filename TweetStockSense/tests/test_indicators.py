@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from services import indicators
+
+
+def prices(length=300, symbols=None, seed=0):
+    rng = np.random.default_rng(seed)
+    shape = (length,) if symbols is None else (length, symbols)
+    return 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, shape), axis=0))
+
+
+def reference_ema(values, alpha, seed):
+    out, prev = [], seed
+    for value in values:
+        prev = alpha * value + (1 - alpha) * prev
+        out.append(prev)
+    return np.array(out)
+
+
+def reference_rsi(close, window=14):
+    deltas = np.diff(close)
+    gains, losses = np.clip(deltas, 0, None), np.clip(-deltas, 0, None)
+    avg_gain, avg_loss = gains[:window].mean(), losses[:window].mean()
+    out = [np.nan] * window + [100 - 100 / (1 + avg_gain / avg_loss)]
+    for gain, loss in zip(gains[window:], losses[window:]):
+        avg_gain = (avg_gain * (window - 1) + gain) / window
+        avg_loss = (avg_loss * (window - 1) + loss) / window
+        out.append(100 - 100 / (1 + avg_gain / avg_loss))
+    return np.array(out)
+
+
+@pytest.mark.parametrize('alpha', [1.0, 0.5, 2 / 13, 1 / 14, 0.001])
+@pytest.mark.parametrize('length', [0, 1, 7, 5000])
+def test_recursive_matches_the_row_by_row_recursion(alpha, length):
+    x = prices(length) if length else np.empty(0)
+    seed = x[0] if length else 0.0
+    np.testing.assert_allclose(indicators._recursive(x, alpha, seed), reference_ema(x, alpha, seed), rtol=1e-12)
+
+
+def test_recursive_handles_signed_input():
+    x = np.diff(prices(1000))
+    np.testing.assert_allclose(indicators._recursive(x, 0.2, 0.0), reference_ema(x, 0.2, 0.0), atol=1e-12)
+
+
+def test_sma_matches_a_window_mean():
+    close = prices()
+    expected = [close[i - 19:i + 1].mean() for i in range(19, len(close))]
+    result = indicators.sma(close, 20)
+    assert np.isnan(result[:19]).all()
+    np.testing.assert_allclose(result[19:], expected, rtol=1e-12)
+
+
+def test_ema_is_seeded_with_the_first_value():
+    close = prices()
+    np.testing.assert_allclose(indicators.ema(close, 12), reference_ema(close, 2 / 13, close[0]), rtol=1e-12)
+
+
+def test_rsi_matches_wilder_smoothing():
+    close = prices()
+    np.testing.assert_allclose(indicators.rsi(close), reference_rsi(close), rtol=1e-9, equal_nan=True)
+
+
+def test_rsi_of_a_flat_series_is_neutral():
+    assert indicators.rsi(np.full(30, 50.0))[-1] == 50.0
+
+
+def test_rolling_std_matches_numpy():
+    close = prices()
+    expected = [close[i - 19:i + 1].std() for i in range(19, len(close))]
+    np.testing.assert_allclose(indicators.rolling_std(close, 20)[19:], expected, rtol=1e-9)
+
+
+def test_macd_histogram_is_line_minus_signal():
+    line, signal, histogram = indicators.macd(prices())
+    np.testing.assert_allclose(histogram, line - signal)
+    np.testing.assert_allclose(signal, reference_ema(line, 0.2, line[0]), rtol=1e-9)
+
+
+def test_true_range_uses_gaps_from_the_previous_close():
+    high, low, close = np.array([10.0, 12.0]), np.array([9.0, 11.5]), np.array([9.5, 12.0])
+    np.testing.assert_array_equal(indicators.true_range(high, low, close), [1.0, 2.5])
+
+
+def test_matrix_columns_match_single_series():
+    matrix = prices(400, symbols=6)
+    result = indicators.compute_indicators(matrix, np.abs(matrix) * 1000, matrix * 1.01, matrix * 0.99)
+    for j in range(matrix.shape[1]):
+        column = matrix[:, j]
+        single = indicators.compute_indicators(column, np.abs(column) * 1000, column * 1.01, column * 0.99)
+        for name, series in single.items():
+            np.testing.assert_allclose(result[name][:, j], series, rtol=1e-10, equal_nan=True, err_msg=name)
+
+
+def test_pivots_and_levels():
+    high = np.array([1, 2, 5, 2, 1, 2, 5.05, 2, 1], dtype=np.float64)
+    low = high - 0.5
+    is_high, is_low = indicators.pivot_points(high, low, order=2)
+    assert np.flatnonzero(is_high).tolist() == [2, 6]
+    levels = indicators.support_resistance_levels(high, low, price=3.0, order=2, tolerance=0.02)
+    assert levels['resistance'][0]['touches'] == 2
+    assert levels['resistance'][0]['bars_ago'] == 2
@@ -0,0 +1,190 @@
+import numpy as np
+import pytest
+
+from services.prediction_service import PredictionService
+from services.batch_executor import BatchPredictExecutor
+from services.cache import MemoryCache
+from services.forecast import MonteCarloForecaster
+
+# Histories of different lengths, as for symbols listed at different times
+LENGTHS = {'TCS.NS': 63, 'INFY.NS': 63, 'ZOMATO.NS': 41, 'NEWCO.NS': 34}
+
+
+def history(length, seed):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.001, 0.02, length)))
+    return {
+        'timestamp': np.arange(19000, 19000 + length, dtype=np.int64),
+        'open': close * (1 + rng.normal(0, 0.005, length)),
+        'high': close * 1.01,
+        'low': close * 0.99,
+        'close': close,
+        'volume': rng.integers(10**5, 10**6, length).astype(np.float64)
+    }
+
+
+class FakeStockService:
+    def __init__(self):
+        self.histories = {symbol: history(length, seed) for seed, (symbol, length) in enumerate(LENGTHS.items())}
+
+    def get_batch_stock_data(self, symbols):
+        return {symbol: {'price': float(self.histories[symbol]['close'][-1]) * 1.002} for symbol in symbols}
+
+    def get_history_arrays(self, symbol, period='1mo'):
+        return self.histories[symbol]
+
+
+@pytest.fixture
+def service():
+    service = PredictionService(FakeStockService())
+    service.model = None  # Score with the fixed weights
+    return service
+
+
+def single_predictions(service, sentiments):
+    quotes = service.stock_service.get_batch_stock_data(list(LENGTHS))
+    return {
+        symbol: service.predict_price(symbol, quotes[symbol], sentiments.get(symbol, 50))
+        for symbol in LENGTHS
+    }
+
+
+def test_batch_predict_matches_predict_price_for_ragged_histories(service):
+    sentiments = {'TCS.NS': 70.0, 'ZOMATO.NS': 35.0}
+    batch = service.batch_predict(list(LENGTHS), sentiments)
+    expected = single_predictions(service, sentiments)
+
+    assert [prediction.pop('symbol') for prediction in batch] == list(LENGTHS)
+    assert batch == list(expected.values())
+
+
+def test_batch_executor_matches_predict_price_for_ragged_histories(service):
+    executor = BatchPredictExecutor(service, workers=1, io_workers=2)
+    result = executor.run(list(LENGTHS))
+    expected = single_predictions(service, {})
+
+    predictions = result['predictions']
+    assert [prediction.pop('symbol') for prediction in predictions] == list(LENGTHS)
+    assert predictions == list(expected.values())
+
+
+def test_batch_executor_workers_match_in_process_scoring(service):
+    executor = BatchPredictExecutor(service, workers=2, io_workers=2)
+    executor.min_symbols_per_worker = 1  # Send even this small batch to the process pool
+    try:
+        result = executor.run(list(LENGTHS))
+    finally:
+        if executor._process_pool is not None:
+            executor._process_pool.shutdown()
+    expected = single_predictions(service, {})
+
+    assert executor.start_method in ('forkserver', 'spawn')
+    predictions = result['predictions']
+    assert [prediction.pop('symbol') for prediction in predictions] == list(LENGTHS)
+    assert predictions == list(expected.values())
+
+
+def assert_ordered_bands(forecast, horizons=('1d', '5d', '20d')):
+    assert list(forecast['horizons']) == list(horizons)
+    for horizon in forecast['horizons'].values():
+        bands = list(horizon['percentiles'].values())
+        assert list(horizon['percentiles']) == ['p5', 'p25', 'p50', 'p75', 'p95']
+        assert bands == sorted(bands)
+        assert 0 <= horizon['prob_up'] <= 1
+
+
+@pytest.mark.parametrize('method', ['bootstrap', 'gbm'])
+def test_forecast_bands_are_ordered_and_reproducible(method):
+    close = history(250, seed=7)['close']
+    forecaster = MonteCarloForecaster(paths=500, method=method)
+    forecast = forecaster.forecast(close, seed=42)
+
+    assert forecast['method'] == method
+    assert forecast['paths'] == 500
+    assert forecast['returns_sampled'] == 249
+    assert_ordered_bands(forecast)
+    # Bands widen with the horizon
+    spreads = [h['percentiles']['p95'] - h['percentiles']['p5'] for h in forecast['horizons'].values()]
+    assert spreads == sorted(spreads)
+
+    assert forecaster.forecast(close, seed=42) == forecast
+    assert forecaster.forecast(close, seed=43) != forecast
+
+
+def test_forecast_simulates_every_path_at_every_horizon():
+    forecaster = MonteCarloForecaster(paths=300, horizons=(10, 1, 3))
+    returns = forecaster.log_returns(history(100, seed=1)['close'])
+    assert forecaster.simulate(returns, seed=0).shape == (300, 3)
+    assert list(forecaster.forecast(history(100, seed=1)['close'], seed=0)['horizons']) == ['1d', '3d', '10d']
+
+
+def test_forecast_needs_enough_history(service):
+    assert MonteCarloForecaster().forecast(history(15, seed=0)['close']) is None
+    service.stock_service.histories['EMPTY.NS'] = history(0, seed=0)
+    assert service.forecast('EMPTY.NS', 100.0) is None
+
+
+def test_prediction_service_forecast_is_seeded_per_symbol_and_day(service):
+    forecast = service.forecast('TCS.NS', 150.0)
+    assert_ordered_bands(forecast)
+    assert service.forecast('TCS.NS', 150.0) == forecast
+    # The current price anchors the bands
+    assert forecast['horizons']['1d']['percentiles']['p5'] < 150.0 < forecast['horizons']['1d']['percentiles']['p95']
+
+    # A new bar reseeds the simulation
+    bars = service.stock_service.histories['TCS.NS']
+    bars['timestamp'] = bars['timestamp'] + 1
+    assert service.forecast('TCS.NS', 150.0) != forecast
+
+
+def test_predictions_route_adds_the_forecast_on_request(database, monkeypatch):
+    import routes
+
+    fake = FakeStockService()
+    price = float(fake.histories['TCS.NS']['close'][-1])
+    monkeypatch.setattr(routes.stock_service, 'get_stock_data', lambda symbol: {'price': price})
+    monkeypatch.setattr(routes.stock_service, 'get_history_arrays', fake.get_history_arrays)
+    monkeypatch.setattr(routes.prediction_service, 'get_prediction',
+                        lambda symbol, current_data, sentiment: ({'predicted_price': price}, True))
+    client = routes.app.test_client()
+
+    response = client.get('/api/predictions-data/TCS.NS')
+    assert response.status_code == 200
+    assert 'forecast' not in response.get_json()
+
+    response = client.get('/api/predictions-data/TCS.NS?forecast=true')
+    assert response.status_code == 200
+    expected = routes.prediction_service.forecast('TCS.NS', price)
+    assert_ordered_bands(expected)
+    assert response.get_json()['forecast'] == expected
+
+
+def test_prediction_memo_hits_only_on_identical_inputs(service, monkeypatch):
+    service.result_cache = MemoryCache('test_predictions')
+    calls = []
+    predict_price = service.predict_price
+
+    def counted(*args, **kwargs):
+        calls.append(args)
+        return predict_price(*args, **kwargs)
+
+    monkeypatch.setattr(service, 'predict_price', counted)
+    quote = {'price': 150.0}
+
+    prediction, cached = service.get_prediction('TCS.NS', quote, 70.0)
+    assert not cached and prediction['predicted_price']
+    assert service.get_prediction('TCS.NS', dict(quote), 70.0) == (prediction, True)
+    # Same sentiment bucket
+    assert service.get_prediction('TCS.NS', quote, 70.3) == (prediction, True)
+    assert len(calls) == 1
+
+    assert service.get_prediction('TCS.NS', quote, 71.0)[1] is False
+    assert service.get_prediction('TCS.NS', {'price': 150.5}, 70.0)[1] is False
+    assert service.get_prediction('INFY.NS', quote, 70.0)[1] is False
+    service.model_version = f'{service.model_version}+retrained'
+    assert service.get_prediction('TCS.NS', quote, 70.0)[1] is False
+    # A new bar changes the indicators
+    bars = service.stock_service.histories['TCS.NS']
+    bars['timestamp'] = bars['timestamp'] + 1
+    assert service.get_prediction('TCS.NS', quote, 70.0)[1] is False
+    assert len(calls) == 6
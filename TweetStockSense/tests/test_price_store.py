@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from services.price_store import PriceStore, frame_to_columns, to_day, from_day, COLUMNS
+
+
+def bars(start, count, price=100.0):
+    days = np.arange(start, start + count, dtype=np.int64)
+    close = price + np.arange(count, dtype=np.float64)
+    return {
+        'timestamp': days,
+        'open': close - 0.5,
+        'high': close + 1,
+        'low': close - 1,
+        'close': close,
+        'volume': np.full(count, 1000, dtype=np.int64),
+    }
+
+
+def test_day_conversion_round_trips():
+    day = to_day(pd.Timestamp('2024-02-29').date())
+    assert from_day(day).isoformat() == '2024-02-29'
+
+
+def test_empty_symbol_reads_empty_columns(tmp_path):
+    columns = PriceStore(str(tmp_path)).read('NONE.NS')
+    assert set(columns) == set(COLUMNS)
+    assert all(len(values) == 0 for values in columns.values())
+
+
+def test_append_overwrites_from_the_first_new_day(tmp_path):
+    store = PriceStore(str(tmp_path))
+    with store.lock('TCS.NS'):
+        store.append('TCS.NS', bars(100, 10))
+        # Today's partial bar is refetched with its final values, plus one new day
+        store.append('TCS.NS', bars(109, 2, price=500.0))
+
+    columns = store.read('TCS.NS')
+    np.testing.assert_array_equal(columns['timestamp'], np.arange(100, 111))
+    assert columns['close'][8] == 108.0
+    np.testing.assert_array_equal(columns['close'][9:], [500.0, 501.0])
+
+
+def test_append_with_fewer_bars_than_stored_rebuilds(tmp_path):
+    store = PriceStore(str(tmp_path))
+    store.append('TCS.NS', bars(100, 10))
+    store.append('TCS.NS', bars(103, 2, price=500.0))
+    columns = store.read('TCS.NS')
+    np.testing.assert_array_equal(columns['timestamp'], np.arange(100, 105))
+    np.testing.assert_array_equal(columns['close'][3:], [500.0, 501.0])
+
+
+def test_merge_head_prepends_older_history(tmp_path):
+    store = PriceStore(str(tmp_path))
+    store.rewrite('TCS.NS', bars(100, 5))
+    store.merge_head('TCS.NS', bars(95, 7, price=1.0))  # Overlaps the stored days 100 and 101
+    columns = store.read('TCS.NS')
+    np.testing.assert_array_equal(columns['timestamp'], np.arange(95, 105))
+    assert columns['close'][5] == 100.0  # Stored bars win over the overlap
+
+
+def test_read_slices_by_day(tmp_path):
+    store = PriceStore(str(tmp_path))
+    store.rewrite('TCS.NS', bars(100, 10))
+    columns = store.read('TCS.NS', start=103, end=105)
+    np.testing.assert_array_equal(columns['timestamp'], [103, 104, 105])
+    assert not columns['close'].flags.writeable
+
+
+def test_coverage_round_trips(tmp_path):
+    store = PriceStore(str(tmp_path))
+    assert store.coverage('TCS.NS') is None
+    store.rewrite('TCS.NS', bars(100, 1))
+    store.mark_synced('TCS.NS', 90, 100, 123.0)
+    assert store.coverage('TCS.NS') == {'start': 90, 'end': 100, 'synced_at': 123.0}
+
+
+def test_frame_to_columns_keeps_exchange_local_dates():
+    index = pd.DatetimeIndex(['2024-01-02 00:00', '2024-01-03 00:00'], tz='Asia/Kolkata')
+    frame = pd.DataFrame({
+        'Open': [1.0, 2.0], 'High': [1.0, 2.0], 'Low': [1.0, 2.0], 'Close': [1.0, 2.0], 'Volume': [10, np.nan]
+    }, index=index)
+    columns = frame_to_columns(frame)
+    assert [from_day(day).isoformat() for day in columns['timestamp']] == ['2024-01-02', '2024-01-03']
+    np.testing.assert_array_equal(columns['volume'], [10, 0])
@@ -0,0 +1,82 @@
+from datetime import datetime
+
+from sqlalchemy import inspect
+
+from services.database_service import DatabaseService
+from models import Prediction, Stock, StockPrice
+
+
+def plans_by_name(plans):
+    grouped = {}
+    for result in plans:
+        grouped.setdefault(result['name'], []).append(result)
+    return grouped
+
+
+def test_hot_reads_use_indexes(database):
+    plans = DatabaseService().query_plans()
+    scans = {result['sql']: result['plan'] for result in plans if not result['uses_index']}
+    assert not scans
+    for result in plans:
+        assert not any(line.startswith('SCAN ') and ' USING ' not in line for line in result['plan'])
+
+
+def test_plans_cover_the_statements_the_methods_issue(database):
+    grouped = plans_by_name(DatabaseService().query_plans())
+
+    bar_statements = ' '.join(result['sql'] for result in grouped['price_bars'])
+    assert 'count(*)' in bar_statements
+    assert 'FROM price_rollup' in bar_statements and 'FROM stock_price' in bar_statements
+    assert any('FROM prediction' in result['sql'] for result in grouped['stock_predictions'])
+
+    # The next-bar outcome plus one correlated subquery per accuracy horizon
+    (report,) = [result for result in grouped['accuracy_report'] if 'FROM prediction' in result['sql']]
+    assert sum(line.startswith('CORRELATED SCALAR SUBQUERY') for line in report['plan']) == 4
+    assert all('USING' in line for line in report['plan'] if line.startswith(('SEARCH', 'SCAN')))
+
+
+def test_missing_index_is_reported(database):
+    index = next(index for index in Prediction.__table__.indexes if index.name == 'ix_prediction_prediction_date')
+    index.drop(bind=database.engine)
+    try:
+        plans = DatabaseService().query_plans()
+    finally:
+        index.create(bind=database.engine)
+    assert [result['name'] for result in plans if not result['uses_index']] == ['accuracy_report_all']
+
+
+def test_probe_stock_is_rolled_back(database):
+    DatabaseService().query_plans()
+    assert Stock.query.count() == 0
+
+
+def test_duplicate_rows_are_only_removed_on_request(database):
+    import cli  # Registers the commands; app.py's own import runs before the services are importable here
+
+    stock = Stock(symbol='TCS.NS', name='TCS.NS')
+    database.session.add(stock)
+    database.session.commit()
+    index = next(index for index in StockPrice.__table__.indexes if index.name == 'uq_stock_price_stock_id_timestamp')
+    index.drop(bind=database.engine)
+    try:
+        for close in (100.0, 101.0, 102.0):
+            database.session.add(StockPrice(stock_id=stock.id, timestamp=datetime(2024, 1, 2), open_price=close,
+                                            high_price=close, low_price=close, close_price=close, volume=1))
+        database.session.commit()
+        runner = cli.app.test_cli_runner()
+
+        # Startup and the plain command leave the rows, and the index, alone
+        result = runner.invoke(args=['upgrade-schema'])
+        assert result.exit_code == 1 and 'uq_stock_price_stock_id_timestamp' in result.output
+        assert StockPrice.query.count() == 3
+
+        result = runner.invoke(args=['upgrade-schema', '--remove-duplicates'])
+        assert result.exit_code == 0
+        assert [price.close_price for price in StockPrice.query.all()] == [102.0]
+    finally:
+        if index.name not in {index['name'] for index in inspect(database.engine).get_indexes('stock_price')}:
+            database.session.rollback()
+            StockPrice.query.delete()
+            database.session.commit()
+            index.create(bind=database.engine)
+    assert index.name in {index['name'] for index in inspect(database.engine).get_indexes('stock_price')}
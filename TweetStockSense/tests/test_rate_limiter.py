@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.rate_limiter import TokenBucket, get_rate_limiter
+
+
+def test_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket('test', rate=0)
+
+
+def test_try_acquire_spends_capacity_then_refuses():
+    bucket = TokenBucket('test', rate=0.1, capacity=2)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.stats()['rejected'] == 1
+
+
+def test_acquire_refuses_when_wait_exceeds_timeout():
+    bucket = TokenBucket('test', rate=1, capacity=1)
+    assert bucket.acquire()
+    started = time.monotonic()
+    assert not bucket.acquire(timeout=0.1)
+    assert time.monotonic() - started < 0.1  # Refused up front, not after sleeping
+
+
+def test_concurrent_callers_queue_behind_each_other():
+    bucket = TokenBucket('test', rate=50, capacity=1)
+    finished = []
+
+    def worker():
+        bucket.acquire()
+        finished.append(time.monotonic())
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # One token up front, then five more at 50 per second
+    assert max(finished) - started >= 0.09
+    stats = bucket.stats()
+    assert stats['acquired'] == 6
+    assert stats['waited'] == 5
+
+
+def test_acquire_async_waits_without_blocking_the_loop():
+    bucket = TokenBucket('test', rate=20, capacity=1)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        assert await bucket.acquire_async()
+        assert await bucket.acquire_async()
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(run()) > 1
+
+
+def test_limiters_are_shared_per_host():
+    first = get_rate_limiter('tests.example.com', rate=1)
+    assert get_rate_limiter('tests.example.com', rate=100) is first
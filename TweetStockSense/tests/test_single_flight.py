@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from services.single_flight import SingleFlight, single_flight
+
+
+def run_concurrently(count, fn):
+    results = [None] * count
+    errors = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = fn()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    group = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'quote'
+
+    results, errors = run_concurrently(8, lambda: group.do(('quote', 'TCS.NS'), fetch))
+    assert results == ['quote'] * 8
+    assert errors == [None] * 8
+    assert len(calls) == 1
+    stats = group.stats()
+    assert stats['executed'] == 1
+    assert stats['coalesced'] == 7
+    assert stats['in_flight'] == 0
+
+
+def test_waiters_receive_the_leaders_error():
+    group = SingleFlight()
+
+    def fail():
+        time.sleep(0.1)
+        raise RuntimeError('upstream down')
+
+    _, errors = run_concurrently(4, lambda: group.do('history', fail))
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert group.stats()['executed'] == 1
+
+
+def test_sequential_calls_are_not_coalesced():
+    group = SingleFlight()
+    assert group.do('key', lambda: 1) == 1
+    assert group.do('key', lambda: 2) == 2
+    assert group.stats()['executed'] == 2
+
+
+def test_decorator_keys_on_arguments_not_instance_or_deadline():
+    group = SingleFlight()
+    calls = []
+
+    class Service:
+        @single_flight('history', group=group)
+        def fetch(self, symbol, deadline=None):
+            calls.append(symbol)
+            time.sleep(0.1)
+            return symbol
+
+    # A new service object and deadline per caller
+    results, _ = run_concurrently(4, lambda: Service().fetch('INFY.NS', deadline=object()))
+    assert results == ['INFY.NS'] * 4
+    assert calls == ['INFY.NS']
+
+
+def test_decorator_runs_unhashable_arguments_directly():
+    group = SingleFlight()
+
+    class Service:
+        @single_flight('batch', group=group)
+        def fetch(self, symbols):
+            return len(symbols)
+
+    assert Service().fetch(['A', 'B']) == 2
+    assert group.stats()['executed'] == 0
+
+
+def test_errors_propagate_to_the_leader():
+    group = SingleFlight()
+    with pytest.raises(ValueError):
+        group.do('key', lambda: (_ for _ in ()).throw(ValueError('bad')))
+    assert group.stats()['in_flight'] == 0
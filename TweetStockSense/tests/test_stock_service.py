@@ -0,0 +1,162 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services import stock_service as stock_module
+from services.cache import CacheEntry, MemoryCache, TieredCache
+from services.circuit_breaker import CircuitBreaker, OPEN, CLOSED
+from services.rate_limiter import TokenBucket
+from services.price_store import frame_to_columns, from_day
+
+
+def history(close=(100.0, 102.0)):
+    index = pd.DatetimeIndex(['2024-01-02', '2024-01-03'][-len(close):])
+    close = np.asarray(close, dtype=np.float64)
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Volume': [1000] * len(close)}, index=index)
+
+
+def batch_frame(frames):
+    return pd.concat(frames, axis=1) if frames else pd.DataFrame()
+
+
+class FakeTicker:
+    def __init__(self, frames, symbol):
+        self.frames = frames
+        self.symbol = symbol
+
+    def history(self, **kwargs):
+        self.frames['calls'].append(self.symbol)
+        return self.frames.get(self.symbol, pd.DataFrame())
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """StockService with its own quote cache, breaker and limiter, and no metadata lookups"""
+    service = stock_module.StockService()
+    service.last_fetch = TieredCache('quotes', MemoryCache('quotes'))
+    service.circuit_breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=60)
+    service.rate_limiter = TokenBucket('test', rate=1000, capacity=1000)
+    service.refresher.submit = lambda symbols, fn: None
+    monkeypatch.setattr(service, 'get_symbol_metadata', lambda symbol: {})
+    return service
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Per-symbol frames served by the patched yf.Ticker and yf.download"""
+    frames = {'calls': []}
+    monkeypatch.setattr(stock_module.yf, 'Ticker', lambda symbol: FakeTicker(frames, symbol))
+
+    def download(tickers, **kwargs):
+        frames['calls'].append(tuple(tickers))
+        return batch_frame({symbol: frames[symbol] for symbol in tickers if symbol in frames})
+
+    monkeypatch.setattr(stock_module.yf, 'download', download)
+    return frames
+
+
+def test_empty_batch_downloads_open_the_breaker(service, upstream):
+    for _ in range(3):
+        assert service.get_batch_stock_data(['TCS.NS', 'INFY.NS'], retries=1, delay=0) == {}
+    assert service.circuit_breaker.state == OPEN
+
+
+def test_empty_batches_of_unknown_symbols_leave_the_breaker_closed(service, upstream):
+    for _ in range(3):
+        assert service.get_batch_stock_data(['JUNK0', 'JUNK1'], retries=1, delay=0) == {}
+    assert service.circuit_breaker.state == CLOSED
+
+
+def test_unknown_symbols_leave_the_breaker_closed(service, upstream):
+    upstream['RELIANCE.NS'] = history()
+    for i in range(5):
+        assert service.get_stock_data(f'JUNK{i}', retries=3, delay=0) is None
+    # Not retried either
+    assert upstream['calls'] == [f'JUNK{i}' for i in range(5)]
+    assert service.circuit_breaker.state == CLOSED
+    assert service.get_stock_data('RELIANCE.NS', retries=1, delay=0)['price'] == 102.0
+
+
+def test_batch_with_some_data_is_a_success(service, upstream):
+    upstream['TCS.NS'] = history()
+    results = service.get_batch_stock_data(['TCS.NS', 'GONE.NS'], retries=1, delay=0)
+    assert results['TCS.NS']['price'] == 102.0
+    assert results['TCS.NS']['change'] == 2.0
+    assert service.circuit_breaker.state == CLOSED
+    assert service.circuit_breaker.stats()['successes'] == 1
+
+
+def cache_stale_quote(service, symbol, price):
+    now = time.time()
+    quote = {'symbol': symbol, 'price': price}
+    service.last_fetch.set_entry(symbol, CacheEntry(quote, now - 600, now - 300, now + 3600))
+
+
+def test_outage_keeps_serving_the_stale_quote(service, upstream):
+    cache_stale_quote(service, 'TCS.NS', 3500.0)
+    quote = service.get_stock_data('TCS.NS', retries=1, delay=0, serve_stale=False)
+    assert quote['price'] == 3500.0 and quote['stale']
+    assert not service.last_fetch.get_entry('TCS.NS').is_negative
+
+
+def test_background_batch_refresh_keeps_stale_quotes(service, upstream):
+    cache_stale_quote(service, 'TCS.NS', 3500.0)
+    cache_stale_quote(service, 'INFY.NS', 1500.0)
+    upstream['TCS.NS'] = history()  # INFY.NS comes back empty
+
+    results = service.get_batch_stock_data(['TCS.NS', 'INFY.NS'], retries=1, delay=0, serve_stale=False)
+    assert results['TCS.NS']['price'] == 102.0
+    assert results['INFY.NS']['price'] == 1500.0 and results['INFY.NS']['stale']
+    assert not service.last_fetch.get_entry('INFY.NS').is_negative
+
+
+def test_symbols_without_a_quote_are_negative_cached(service, upstream):
+    upstream['TCS.NS'] = history()
+    service.get_batch_stock_data(['TCS.NS', 'GONE.NS'], retries=1, delay=0)
+    assert service.get_stock_data('NOPE.NS', retries=1, delay=0) is None
+    assert service.last_fetch.get_entry('GONE.NS').is_negative
+    assert service.last_fetch.get_entry('NOPE.NS').is_negative
+
+
+def row_wise_history(columns):
+    """The per-row loop get_historical_data used before serialize_history"""
+    data = []
+    for i, day in enumerate(columns['timestamp']):
+        data.append({
+            'date': from_day(day).strftime('%Y-%m-%d'),
+            'open': round(float(columns['open'][i]), 2),
+            'high': round(float(columns['high'][i]), 2),
+            'low': round(float(columns['low'][i]), 2),
+            'close': round(float(columns['close'][i]), 2),
+            'volume': int(columns['volume'][i])
+        })
+    return data
+
+
+def test_serialize_history_matches_the_row_wise_json():
+    rng = np.random.default_rng(0)
+    count = 500
+    # NSE bars are stamped at midnight IST, the evening before in UTC
+    index = pd.date_range('2023-01-02', periods=count, freq='D', tz='Asia/Kolkata')
+    close = np.round(rng.uniform(10, 5000, count), 3)
+    close[::7] += 0.005  # Half-cent ties, where np.round alone differs from round()
+    frame = pd.DataFrame({'Open': close - 0.125, 'High': close + 1.005, 'Low': close - 2.675, 'Close': close,
+                          'Volume': rng.integers(0, 10**7, count).astype(np.float64)}, index=index)
+    frame.iloc[3, frame.columns.get_loc('High')] = np.nan
+    frame.iloc[5, frame.columns.get_loc('Volume')] = np.nan
+    columns = frame_to_columns(frame)
+
+    records = stock_module.serialize_history(columns)
+    expected = row_wise_history(columns)
+    assert json.dumps(records) == json.dumps(expected)
+    assert records[0]['date'] == '2023-01-02'
+    assert json.dumps(records[3]['high']) == 'NaN' and records[5]['volume'] == 0
+
+    by_column = stock_module.serialize_history(columns, orient='columns')
+    assert by_column['dates'] == [row['date'] for row in expected]
+    for field in stock_module.HISTORY_FIELDS:
+        assert json.dumps(by_column[field]) == json.dumps([row[field] for row in expected])